@@ -0,0 +1,519 @@
+import os
+import sys
+import mmap
+import time
+import array
+import random
+import struct
+import argparse
+import tempfile
+from bitboard import Bitboard, STARTING_FEN
+from pgn import read_games, parse_game, format_pgn
+
+# file header: magic, number of games and offset of the index, 0 until the archive is closed
+MAGIC = b"CGA1"
+HEADER = struct.Struct("<4sIQ")
+
+# every game is a header of plies, result code and length of the tags, the tags as UTF-8
+# name and value pairs separated by null bytes, and the moves as 16-bit encoded moves.
+# the index after the last game holds the offset of every game and the offset of the index itself
+GAME_HEADER = struct.Struct("<IBH")
+OFFSET = struct.Struct("<Q")
+MOVE = struct.Struct("<H")
+
+RESULTS = ["*", "1-0", "0-1", "1/2-1/2"]
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+# longest tags of a game that fit the length field
+MAX_TAGS_LENGTH = 0xFFFF
+
+
+def encode_tags(tags):
+    """
+        Returns tag pairs as UTF-8 bytes, names and values separated by null bytes
+    """
+
+    return "\0".join(part for pair in tags.items() for part in pair).encode("utf-8")
+
+
+def decode_tags(data):
+    """
+        Returns dict of tag pairs from encode_tags bytes
+    """
+
+    if not data:
+        return {}
+    parts = bytes(data).decode("utf-8").split("\0")
+    return dict(zip(parts[::2], parts[1::2]))
+
+
+def read_header(data, path):
+    """
+        Checks the magic of an archive. Raises ValueError if data is not an archive.
+
+        Returns (number of games, index offset)
+    """
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a game archive, file too short")
+    magic, count, index_offset = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a game archive")
+
+    return count, index_offset
+
+
+def scan_games(data):
+    """
+        Finds the games of an archive that was not closed by walking the game records from the start,
+        leaving out a last record that was only partly written, and the index if the writer stopped after writing it
+        but before the header.
+
+        Returns (array of game offsets, offset after the last complete game)
+    """
+
+    offsets = array.array("Q")
+    offset = HEADER.size
+    while offset + GAME_HEADER.size <= len(data):
+        if is_index(data, offset, offsets):
+            break
+        plies, result, tags_length = GAME_HEADER.unpack_from(data, offset)
+        end = offset + GAME_HEADER.size + tags_length + plies * MOVE.size
+        if end > len(data) or result >= len(RESULTS):
+            break
+        offsets.append(offset)
+        offset = end
+
+    return offsets, offset
+
+
+def is_index(data, offset, offsets):
+    """
+        Checks if data from offset to the end is the index of the games at offsets, as written by ArchiveWriter.close.
+
+        Returns True if it is, False if not
+    """
+
+    if len(data) - offset != (len(offsets) + 1) * OFFSET.size:
+        return False
+
+    index = array.array("Q")
+    index.frombytes(data[offset:])
+    if sys.byteorder == "big":
+        index.byteswap()
+    return index[-1] == offset and index[:-1] == offsets
+
+
+class ArchiveWriter:
+    """
+        Writes games to an archive one at a time. The index and game count are written on close,
+        an archive that was not closed, e.g. after a crash, is recovered by opening it again with append=True.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.offsets = array.array("Q")
+
+        if append and os.path.exists(path) and os.path.getsize(path):
+            self.file = open(path, "r+b")
+            count, index_offset = read_header(self.file.read(HEADER.size), path)
+            if index_offset:
+                self.file.seek(index_offset)
+                self.offsets.frombytes(self.file.read(count * OFFSET.size))
+                if sys.byteorder == "big":
+                    self.offsets.byteswap()
+                end = index_offset
+            else:
+                self.file.seek(0)
+                self.offsets, end = scan_games(self.file.read())
+
+            # the index is written again on close, after the games added now. Until then the header
+            # marks the archive as not closed, so it is recovered by scanning the games after a crash
+            self.file.seek(0)
+            self.file.write(HEADER.pack(MAGIC, 0, 0))
+            self.file.seek(end)
+            self.file.truncate()
+        else:
+            self.file = open(path, "w+b")
+            self.file.write(HEADER.pack(MAGIC, 0, 0))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_game(self, moves, result="*", tags=None):
+        """
+            Appends a game of encoded moves, with its result and tag pairs, e.g. {"White": ..., "FEN": ...}.
+            Games starting from another position than the start need its FEN-string as the FEN tag.
+
+            Returns number of the game in the archive, counted from 0
+        """
+
+        encoded_tags = encode_tags(tags) if tags else b""
+        if len(encoded_tags) > MAX_TAGS_LENGTH:
+            raise ValueError(f"tags of {len(encoded_tags)} bytes do not fit in {MAX_TAGS_LENGTH} bytes")
+
+        codes = array.array("H", moves)
+        if sys.byteorder == "big":
+            codes.byteswap()
+
+        self.offsets.append(self.file.tell())
+        self.file.write(GAME_HEADER.pack(len(codes), RESULT_CODES.get(result, 0), len(encoded_tags)))
+        self.file.write(encoded_tags)
+        self.file.write(codes.tobytes())
+
+        return len(self.offsets) - 1
+
+    def flush(self):
+        """
+            Writes buffered games to the file, so they can be recovered if the archive is never closed.
+        """
+
+        self.file.flush()
+
+    def close(self):
+        """
+            Writes the index of all games and the header, and closes the file.
+        """
+
+        if self.file.closed:
+            return
+
+        index_offset = self.file.tell()
+        offsets = array.array("Q", self.offsets)
+        offsets.append(index_offset)
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        self.file.write(offsets.tobytes())
+
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, len(self.offsets), index_offset))
+        self.file.close()
+
+
+class GameArchive:
+    """
+        Archive file opened with mmap. The index gives the offset of every game, and moves are fixed-size,
+        so game N and ply K of it are found without reading anything before them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(self.file.fileno()).st_size else b""
+
+        try:
+            self.count, self.index_offset = read_header(self.data, path)
+            if not self.index_offset:
+                raise ValueError(f"{path} was not closed, recover it by opening it with ArchiveWriter(path, append=True)")
+        except ValueError:
+            self.close()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+            Unmaps and closes the archive file.
+        """
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def game_header(self, number):
+        """
+            Looks up game number, counted from 0, in the index. Raises IndexError if there is no such game.
+
+            Returns (plies, result, offset of the tags, tags length)
+        """
+
+        if not 0 <= number < self.count:
+            raise IndexError(f"no game {number} in {self.path}, it holds {self.count} games")
+
+        offset = OFFSET.unpack_from(self.data, self.index_offset + number * OFFSET.size)[0]
+        plies, result, tags_length = GAME_HEADER.unpack_from(self.data, offset)
+
+        return plies, RESULTS[result], offset + GAME_HEADER.size, tags_length
+
+    def plies(self, number):
+        """
+            Returns number of moves of game number
+        """
+
+        return self.game_header(number)[0]
+
+    def result(self, number):
+        """
+            Returns "1-0", "0-1", "1/2-1/2" or "*"
+        """
+
+        return self.game_header(number)[1]
+
+    def tags(self, number):
+        """
+            Returns dict of tag pairs of game number
+        """
+
+        _, _, tags_offset, tags_length = self.game_header(number)
+        return decode_tags(self.data[tags_offset:tags_offset + tags_length])
+
+    def moves(self, number):
+        """
+            Returns array of the encoded moves of game number
+        """
+
+        plies, _, tags_offset, tags_length = self.game_header(number)
+        start = tags_offset + tags_length
+        codes = array.array("H")
+        codes.frombytes(self.data[start:start + plies * MOVE.size])
+        if sys.byteorder == "big":
+            codes.byteswap()
+
+        return codes
+
+    def move(self, number, ply):
+        """
+            Reads a single move, ply counted from 0, without reading the rest of the game.
+            Raises IndexError if the game has no such ply.
+
+            Returns encoded move
+        """
+
+        plies, _, tags_offset, tags_length = self.game_header(number)
+        if not 0 <= ply < plies:
+            raise IndexError(f"game {number} has {plies} plies, no ply {ply}")
+
+        return MOVE.unpack_from(self.data, tags_offset + tags_length + ply * MOVE.size)[0]
+
+    def position(self, number, ply=None):
+        """
+            Sets up the position of game number after its first ply moves, all moves if ply is None.
+            Moves are made without checking, they were legal when written. Raises IndexError if the game
+            has fewer moves than ply.
+
+            Returns Bitboard object
+        """
+
+        position = Bitboard(self.tags(number).get("FEN", STARTING_FEN))
+        moves = self.moves(number)
+        if ply is None:
+            ply = len(moves)
+        elif not 0 <= ply <= len(moves):
+            raise IndexError(f"game {number} has {len(moves)} plies, no ply {ply}")
+        for move in moves[:ply]:
+            position.make_move(move)
+
+        return position
+
+    def pgn(self, number):
+        """
+            Returns game number as PGN text
+        """
+
+        tags = self.tags(number)
+        position = Bitboard(tags.get("FEN", STARTING_FEN))
+        san_moves = []
+        for move in self.moves(number):
+            san_moves.append(position.san(move))
+            position.make_move(move)
+
+        return format_pgn(tags, san_moves, self.result(number))
+
+
+def replay_pgn_game(text, strict=False):
+    """
+        Parses a game and replays its moves, up to the first illegal move.
+        If strict, an illegal move or FEN tag raises ValueError instead, naming the move and its move number.
+
+        Returns (dict of tag pairs, list of encoded moves, list of moves in chess notation, result)
+    """
+
+    tags, notations, result = parse_game(text)
+    result = result or tags.get("Result", "*")
+    moves = []
+    san_moves = []
+    try:
+        position = Bitboard(tags.get("FEN", STARTING_FEN))
+    except ValueError as error:
+        if strict:
+            raise ValueError(f"FEN tag: {error}") from None
+        return tags, moves, san_moves, result
+
+    for notation in notations:
+        try:
+            move = position.parse_san(notation)
+        except ValueError as error:
+            if not strict:
+                break
+            dots = "." if position.side_to_move == "w" else "..."
+            raise ValueError(f"move {position.fullmove_counter}{dots} {error}") from None
+        moves.append(move)
+        san_moves.append(notation)
+        position.make_move(move)
+
+    return tags, moves, san_moves, result
+
+
+def import_pgn(pgn_paths, output_path, append=False, quiet=False):
+    """
+        Converts the games of PGN files to an archive. A game with an illegal move is reported with its number
+        in the file and the move, and left out.
+
+        Returns (number of games written, number of games left out)
+    """
+
+    with ArchiveWriter(output_path, append) as writer:
+        games = 0
+        errors = 0
+        for path in pgn_paths:
+            for number, text in enumerate(read_games(path), 1):
+                try:
+                    tags, moves, _, result = replay_pgn_game(text, strict=True)
+                except ValueError as error:
+                    errors += 1
+                    if not quiet:
+                        sys.stderr.write(f"{path}: game {number}: {error}, left out\n")
+                    continue
+                tags.pop("Result", None)
+                writer.add_game(moves, result, tags)
+                games += 1
+
+    if not quiet:
+        sys.stderr.write(f"{games} games written to {output_path}" + (f", {errors} left out" if errors else "") + "\n")
+    return games, errors
+
+
+def export_pgn(archive_path, output):
+    """
+        Writes every game of an archive as PGN text to output.
+    """
+
+    with GameArchive(archive_path) as archive:
+        for number in range(len(archive)):
+            output.write(archive.pgn(number) + "\n")
+
+
+def run_benchmark(pgn_path, lookups=1000, seed=0):
+    """
+        Compares an archive with PGN text for the games of a PGN file: file size, writing all games,
+        reading all moves back and looking up a ply of a random game. Writing PGN starts from moves in
+        chess notation, reading PGN includes replaying the moves, as both are needed to get moves
+        the program can make.
+    """
+
+    games = [replay_pgn_game(text) for text in read_games(pgn_path)]
+    plies = sum(len(moves) for _, moves, _, _ in games)
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        pgn_copy = os.path.join(directory, "games.pgn")
+        archive_path = os.path.join(directory, "games.cga")
+
+        start = time.perf_counter()
+        with open(pgn_copy, "w") as f:
+            for tags, _, san_moves, result in games:
+                f.write(format_pgn(tags, san_moves, result) + "\n")
+        pgn_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ArchiveWriter(archive_path) as writer:
+            for tags, moves, _, result in games:
+                writer.add_game(moves, result, {name: value for name, value in tags.items() if name != "Result"})
+        archive_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pgn_plies = sum(len(replay_pgn_game(text)[1]) for text in read_games(pgn_copy))
+        pgn_read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with GameArchive(archive_path) as archive:
+            archive_plies = sum(len(archive.moves(number)) for number in range(len(archive)))
+        archive_read = time.perf_counter() - start
+
+        if pgn_plies != plies or archive_plies != plies:
+            raise AssertionError(f"read back {pgn_plies} plies from PGN and {archive_plies} from the archive, not {plies}")
+
+        # ply of a random game, PGN text has to be read up to the game
+        targets = [number for number, (_, moves, _, _) in enumerate(games) if moves]
+        lookups = [(number, rng.randrange(len(games[number][1]))) for number in rng.choices(targets, k=lookups)] if targets else []
+
+        start = time.perf_counter()
+        with GameArchive(archive_path) as archive:
+            for number, ply in lookups:
+                archive.move(number, ply)
+        archive_lookup = time.perf_counter() - start
+
+        pgn_lookups = lookups[:max(1, len(lookups) // 100)] if lookups else []
+        start = time.perf_counter()
+        for number, ply in pgn_lookups:
+            for index, text in enumerate(read_games(pgn_copy)):
+                if index == number:
+                    replay_pgn_game(text)[1][ply]
+                    break
+        pgn_lookup = time.perf_counter() - start
+
+        pgn_size = os.path.getsize(pgn_copy)
+        archive_size = os.path.getsize(archive_path)
+
+    print(f"Games: {len(games)}, plies: {plies}")
+    print(f"{'':10} {'Size':>12} {'Write':>12} {'Read':>12} {'Lookup':>12}")
+    print(f"{'PGN':10} {pgn_size:>12} {pgn_write:>11.3f}s {pgn_read:>11.3f}s "
+          f"{pgn_lookup / max(1, len(pgn_lookups)) * 1e6:>10.1f}us")
+    print(f"{'Archive':10} {archive_size:>12} {archive_write:>11.3f}s {archive_read:>11.3f}s "
+          f"{archive_lookup / max(1, len(lookups)) * 1e6:>10.1f}us")
+    print(f"Archive is {pgn_size / max(1, archive_size):.1f}x smaller, writes {pgn_write / max(archive_write, 1e-9):.1f}x "
+          f"and reads {pgn_read / max(archive_read, 1e-9):.1f}x faster")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store games in a compact binary archive, read back by game and ply.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="convert PGN files to an archive")
+    import_parser.add_argument("pgn", nargs="+", help="PGN files, - for stdin")
+    import_parser.add_argument("-o", "--output", required=True, help="archive file to write")
+    import_parser.add_argument("--append", action="store_true", help="add to the games of an existing archive")
+    import_parser.add_argument("--quiet", action="store_true", help="do not report the number of games")
+
+    export_parser = subparsers.add_parser("export", help="write the games of an archive as PGN")
+    export_parser.add_argument("archive", help="archive file")
+
+    show_parser = subparsers.add_parser("show", help="show a game of an archive, or its position at a ply")
+    show_parser.add_argument("archive", help="archive file")
+    show_parser.add_argument("game", type=int, help="game number, counted from 0")
+    show_parser.add_argument("--ply", type=int, default=None, help="show the FEN-string after this many moves instead")
+
+    bench_parser = subparsers.add_parser("bench", help="compare size and speed with PGN text")
+    bench_parser.add_argument("pgn", help="PGN file of games to compare with")
+    bench_parser.add_argument("--lookups", type=int, default=1000, help="random plies looked up")
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == "import":
+            import_pgn(args.pgn, args.output, args.append, args.quiet)
+        elif args.command == "export":
+            export_pgn(args.archive, sys.stdout)
+        elif args.command == "show":
+            with GameArchive(args.archive) as archive:
+                if args.ply is None:
+                    print(archive.pgn(args.game))
+                else:
+                    print(archive.position(args.game, args.ply).fen())
+        else:
+            run_benchmark(args.pgn, args.lookups)
+    except (OSError, ValueError, IndexError) as error:
+        sys.exit(f"error: {error}")
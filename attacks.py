@@ -0,0 +1,276 @@
+import os
+import pickle
+
+# squares are numbered row by row from a8 (0) to h1 (63), matching the (row, file) board indices
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+NOT_FILE_AB = FULL ^ (FILE_A | FILE_B)
+NOT_FILE_GH = FULL ^ (FILE_G | FILE_H)
+
+CACHE_VERSION = 1
+
+# the sliding piece tables are stored on disk between runs, building them takes most of the startup time.
+# set CHESS_ATTACK_CACHE to another file path, or to an empty string to always build them
+CACHE_PATH = os.environ.get("CHESS_ATTACK_CACHE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__",
+                                         f"attack_tables.v{CACHE_VERSION}.pickle")) or None
+
+
+# single-step shifts, masking off bits that would wrap around to the other side of the board
+def shift_up(bitboard):
+    return bitboard >> 8
+
+def shift_down(bitboard):
+    return (bitboard << 8) & FULL
+
+def shift_left(bitboard):
+    return (bitboard >> 1) & NOT_FILE_H
+
+def shift_right(bitboard):
+    return (bitboard << 1) & NOT_FILE_A
+
+
+def knight_attacks(bitboard):
+    """
+        Finds all squares attacked by knights on the given bitboard.
+
+        Returns attack bitboard
+    """
+
+    return (((bitboard >> 17) & NOT_FILE_H) | ((bitboard >> 15) & NOT_FILE_A)
+            | ((bitboard >> 10) & NOT_FILE_GH) | ((bitboard >> 6) & NOT_FILE_AB)
+            | ((bitboard << 6) & NOT_FILE_GH) | ((bitboard << 10) & NOT_FILE_AB)
+            | ((bitboard << 15) & NOT_FILE_H) | ((bitboard << 17) & NOT_FILE_A)) & FULL
+
+
+def king_attacks(bitboard):
+    """
+        Finds all squares attacked by kings on the given bitboard.
+
+        Returns attack bitboard
+    """
+
+    sideways = shift_left(bitboard) | shift_right(bitboard)
+    row = bitboard | sideways
+    return sideways | shift_up(row) | shift_down(row)
+
+
+def pawn_attacks(bitboard, color):
+    """
+        Finds all squares attacked diagonally by pawns of the given color.
+
+        Returns attack bitboard
+    """
+
+    if color == "w":
+        forward = shift_up(bitboard)
+    else:
+        forward = shift_down(bitboard)
+
+    return shift_left(forward) | shift_right(forward)
+
+
+def ray(square, shift, mask):
+    """
+        Walks from square in one direction until the edge of the board.
+
+        Returns bitboard of all squares on the ray, excluding square itself
+    """
+
+    squares = 0
+    bit = 1 << square
+    while True:
+        if shift > 0:
+            bit = (bit << shift) & mask & FULL
+        else:
+            bit = (bit >> -shift) & mask
+        if not bit:
+            return squares
+        squares |= bit
+
+
+# (shift, wrap mask) per ray direction. Positive shifts walk towards h1, so the first blocker on
+# those rays is the lowest set bit, negative shifts walk towards a8 and hit the highest set bit first
+LINEAR_DIRECTIONS = [(-8, FULL), (8, FULL), (-1, NOT_FILE_H), (1, NOT_FILE_A)]
+DIAGONAL_DIRECTIONS = [(-9, NOT_FILE_H), (-7, NOT_FILE_A), (7, NOT_FILE_H), (9, NOT_FILE_A)]
+
+KNIGHT_ATTACKS = [knight_attacks(1 << sq) for sq in range(64)]
+KING_ATTACKS = [king_attacks(1 << sq) for sq in range(64)]
+PAWN_ATTACKS = {color: [pawn_attacks(1 << sq, color) for sq in range(64)] for color in ("w", "b")}
+PAWN_PUSHES = {"w": [shift_up(1 << sq) for sq in range(64)], "b": [shift_down(1 << sq) for sq in range(64)]}
+LINEAR_RAYS = [([ray(sq, shift, mask) for sq in range(64)], shift > 0) for shift, mask in LINEAR_DIRECTIONS]
+DIAGONAL_RAYS = [([ray(sq, shift, mask) for sq in range(64)], shift > 0) for shift, mask in DIAGONAL_DIRECTIONS]
+
+
+def iterate_squares(bitboard):
+    """
+        Yields index of every set bit.
+    """
+
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
+def between_squares():
+    """
+        Finds the squares strictly between every pair of squares on the same rank, file or diagonal.
+
+        Returns 64x64 list of bitboards, 0 for squares that are not on a line
+    """
+
+    between = [[0] * 64 for _ in range(64)]
+    for rays, _ in LINEAR_RAYS + DIAGONAL_RAYS:
+        for square in range(64):
+            for target in iterate_squares(rays[square]):
+                # the ray from square, without target and the part of the ray beyond it
+                between[square][target] = rays[square] ^ rays[target] ^ (1 << target)
+
+    return between
+
+
+BETWEEN = between_squares()
+
+
+def sliding_attacks(square, occupied, rays):
+    """
+        Finds all squares a sliding piece on square can reach, stopping at (and including) the first blocker in every direction.
+        Only used to fill the lookup tables, move generation goes through rook_attacks and bishop_attacks.
+
+        Returns attack bitboard
+    """
+
+    attacks = 0
+    for squares, positive in rays:
+        attacks |= squares[square]
+        blockers = squares[square] & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            attacks ^= squares[blocker]
+
+    return attacks
+
+
+def relevant_occupancy(square, rays):
+    """
+        Finds the squares whose occupancy can change the attacks of a slider on square.
+        The last square of every ray is left out, a piece there never blocks anything behind it.
+
+        Returns mask bitboard
+    """
+
+    mask = 0
+    for squares, positive in rays:
+        squares = squares[square]
+        if squares:
+            if positive:
+                last = 1 << (squares.bit_length() - 1)
+            else:
+                last = squares & -squares
+            mask |= squares ^ last
+
+    return mask
+
+
+def build_slider_table(rays):
+    """
+        Enumerates every subset of the relevant occupancy of every square and stores the resulting attacks.
+        Works like magic bitboards, with a dict standing in for the magic multiplication as a perfect hash.
+
+        Returns list of occupancy masks and list of dicts mapping masked occupancy to attack bitboard
+    """
+
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = relevant_occupancy(square, rays)
+        table = {}
+
+        # carry-rippler trick, walks all subsets of mask and ends when it wraps back to 0
+        subset = 0
+        while True:
+            table[subset] = sliding_attacks(square, subset, rays)
+            subset = (subset - mask) & mask
+            if not subset:
+                break
+
+        masks.append(mask)
+        tables.append(table)
+
+    return masks, tables
+
+
+def load_slider_tables(cache_path=None):
+    """
+        Loads the rook and bishop tables from cache_path if it holds tables of the current version,
+        otherwise builds them and, if a path is given, writes them there for the next run.
+
+        Returns rook masks, rook tables, bishop masks, bishop tables
+    """
+
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached[0] == CACHE_VERSION:
+                return cached[1:]
+        except (OSError, pickle.UnpicklingError, EOFError, IndexError, TypeError):
+            pass
+
+    rook_masks, rook_tables = build_slider_table(LINEAR_RAYS)
+    bishop_masks, bishop_tables = build_slider_table(DIAGONAL_RAYS)
+
+    if cache_path is not None:
+        # written to a temporary file first, so processes starting at the same time never read half a file
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            with open(temporary_path, "wb") as f:
+                pickle.dump((CACHE_VERSION, rook_masks, rook_tables, bishop_masks, bishop_tables), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            pass
+
+    return rook_masks, rook_tables, bishop_masks, bishop_tables
+
+
+ROOK_MASKS, ROOK_TABLES, BISHOP_MASKS, BISHOP_TABLES = load_slider_tables(CACHE_PATH)
+
+
+def rook_attacks(square, occupied):
+    """
+        Looks up the squares attacked by a rook on square.
+
+        Returns attack bitboard
+    """
+
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def bishop_attacks(square, occupied):
+    """
+        Looks up the squares attacked by a bishop on square.
+
+        Returns attack bitboard
+    """
+
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+
+def queen_attacks(square, occupied):
+    """
+        Looks up the squares attacked by a queen on square.
+
+        Returns attack bitboard
+    """
+
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]] | BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
@@ -0,0 +1,150 @@
+import os
+import time
+import queue
+import threading
+from profiler import PROFILER
+
+SOUND_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds")
+SOUNDS = {"move": "move.mp3", "failed_move": "failed_move.mp3"}
+
+# sounds waiting to be played, more are dropped so sounds never lag behind the game
+QUEUE_SIZE = 2
+
+
+def load_mixer():
+    """
+        Imports and starts the pygame mixer when a game with sound starts, so games without sound never load it.
+
+        Returns pygame.mixer module, or None if pygame is not installed or there is no audio device
+    """
+
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    try:
+        import pygame.mixer
+        pygame.mixer.init()
+    except Exception:
+        return None
+    return pygame.mixer
+
+
+def load_playsound():
+    """
+        Imports playsound when a game with sound starts, so games without sound never load it.
+
+        Returns playsound function, or None if playsound is not installed
+    """
+
+    try:
+        from playsound import playsound
+    except ImportError:
+        return None
+    return playsound
+
+
+class Audio:
+    """
+        Plays sounds on a background thread so moves never wait for playback.
+        With pygame every sound is decoded once into memory and played from there, with only playsound the file
+        is played, and decoded, every time. Without either, without the sound files or without a working
+        audio device, sounds are silently skipped.
+    """
+
+    def __init__(self, enabled=True, sounds=SOUNDS, directory=SOUND_DIRECTORY):
+        self.mixer = load_mixer() if enabled else None
+        self.playsound = load_playsound() if enabled and self.mixer is None else None
+        self.enabled = self.mixer is not None or self.playsound is not None
+
+        # sound files are looked up once, by name
+        self.sounds = {}
+        if self.enabled:
+            for name, filename in sounds.items():
+                path = os.path.join(directory, filename)
+                if os.path.isfile(path):
+                    self.sounds[name] = path
+
+        # decoded sounds by name, made by the worker before it plays the first sound
+        self.buffers = {}
+
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.worker = None
+        self.dropped = 0
+
+    def play(self, name):
+        """
+            Queues sound for playing and returns at once. The sound is dropped if the queue is full.
+        """
+
+        if not self.enabled or name not in self.sounds:
+            return
+
+        # the worker is started by the first sound, so games without sound never start a thread
+        if self.worker is None:
+            self.worker = threading.Thread(target=self.play_queued, daemon=True)
+            self.worker.start()
+
+        try:
+            self.queue.put_nowait(name)
+        except queue.Full:
+            self.dropped += 1
+
+    def decode(self):
+        """
+            Decodes every sound once into memory with pygame. playsound can only play files, then the paths are kept.
+        """
+
+        for name, path in self.sounds.items():
+            self.buffers[name] = self.mixer.Sound(path) if self.mixer is not None else path
+
+    def play_sound(self, name):
+        """
+            Plays a sound and returns when it has finished.
+        """
+
+        sound = self.buffers[name]
+        if self.mixer is not None:
+            sound.play()
+            time.sleep(sound.get_length())
+        else:
+            self.playsound(sound)
+
+    def play_queued(self):
+        """
+            Worker loop, decodes the sounds and then plays queued sounds one at a time until close is called.
+            Audio is turned off on the first decoding or playback error, e.g. when there is no audio device.
+        """
+
+        try:
+            self.decode()
+        except Exception:
+            self.enabled = False
+            return
+
+        while True:
+            name = self.queue.get()
+            if name is None:
+                break
+
+            try:
+                self.play_sound(name)
+            except Exception:
+                self.enabled = False
+                break
+
+    def close(self):
+        """
+            Stops the worker after the sound being played.
+        """
+
+        self.enabled = False
+        if self.worker is not None:
+            # make room for the stop signal, queued sounds are not played
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.queue.put(None)
+            self.worker = None
+
+
+PROFILER.register("Audio.play_sound", Audio, "play_sound")
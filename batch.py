@@ -0,0 +1,158 @@
+import sys
+import time
+import argparse
+from bitboard import Bitboard, move_to_uci
+
+# file buffer size and how often progress is reported, in positions
+BUFFER_SIZE = 1 << 20
+PROGRESS_INTERVAL = 100000
+
+
+def read_lines(path):
+    """
+        Yields (line number, line) for every non-empty line, reading "-" from stdin.
+        Lines are read lazily, so memory stays bounded by the longest line.
+    """
+
+    f = sys.stdin if path == "-" else open(path, "r", buffering=BUFFER_SIZE)
+    try:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line_number, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def split_record(line):
+    """
+        Splits a FEN or EPD line into position and EPD operations.
+        FEN has 6 fields ending with the two move clocks, EPD has 4 fields followed by operations like 'bm Nf3; id "x";'.
+
+        Returns (FEN-string, operations string)
+    """
+
+    fields = line.split(None, 6)
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return " ".join(fields[:6]), " ".join(fields[6:])
+
+    fields = line.split(None, 4)
+    return " ".join(fields[:4]), fields[4] if len(fields) > 4 else ""
+
+
+def parse_positions(lines):
+    """
+        Parses and validates every line.
+
+        Yields (line number, line, Bitboard object or None, operations, error message or None)
+    """
+
+    for line_number, line in lines:
+        fen, operations = split_record(line)
+        try:
+            position = Bitboard(fen)
+            position.validate()
+        except ValueError as error:
+            yield line_number, line, None, operations, str(error)
+            continue
+
+        yield line_number, line, position, operations, None
+
+
+def format_results(records, normalize=False, moves=False, san=False):
+    """
+        Builds an output line for every valid position: the input line, or the full FEN-string followed by any
+        EPD operations if normalize, and optionally the number of legal moves and the moves themselves.
+        A position that is rejected while formatting, with ValueError or KeyError, is reported as an error
+        like an invalid line, so one bad record does not stop the stream. Other exceptions are bugs and propagate.
+
+        Yields (line number, output line or None, error message or None)
+    """
+
+    for line_number, line, position, operations, error in records:
+        if error is not None:
+            yield line_number, None, f"line {line_number}: {error}: {line}"
+            continue
+
+        try:
+            if normalize:
+                output = position.fen()
+                if operations:
+                    output += " " + operations
+            else:
+                output = line
+
+            if moves:
+                legal_moves = position.generate_legal_moves()
+                if san:
+                    notation = [position.san(move) for move in legal_moves]
+                else:
+                    notation = [move_to_uci(move) for move in legal_moves]
+                output += "\t" + str(len(legal_moves)) + "\t" + " ".join(notation)
+        except (ValueError, KeyError) as error:
+            yield line_number, None, f"line {line_number}: {type(error).__name__}: {error}: {line}"
+            continue
+
+        yield line_number, output, None
+
+
+def run(input_path, output_path="-", errors_path=None, normalize=False, moves=False, san=False, skip_invalid=False, quiet=False):
+    """
+        Streams input_path through parsing, validation and formatting, writing one line per position to output_path.
+        Invalid lines go to errors_path (stderr by default), and are kept as "invalid" lines in the output unless skip_invalid.
+
+        Returns (number of positions, number of invalid positions, seconds elapsed)
+    """
+
+    output = sys.stdout if output_path == "-" else open(output_path, "w", buffering=BUFFER_SIZE)
+    errors = sys.stderr if errors_path is None else open(errors_path, "w", buffering=BUFFER_SIZE)
+
+    count = 0
+    invalid = 0
+    start = time.perf_counter()
+    results = format_results(parse_positions(read_lines(input_path)), normalize, moves, san)
+
+    try:
+        for line_number, line, error in results:
+            count += 1
+            if error is not None:
+                invalid += 1
+                errors.write(error + "\n")
+                if not skip_invalid:
+                    output.write("invalid\n")
+            else:
+                output.write(line + "\n")
+
+            if not quiet and count % PROGRESS_INTERVAL == 0:
+                elapsed = time.perf_counter() - start
+                sys.stderr.write(f"{count} positions, {int(count / elapsed)} positions/second\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+        if errors is not sys.stderr:
+            errors.close()
+
+    elapsed = time.perf_counter() - start
+    if not quiet:
+        sys.stderr.write(f"{count} positions ({invalid} invalid) in {elapsed:.2f}s, "
+                         f"{int(count / elapsed) if elapsed > 0 else 0} positions/second\n")
+
+    return count, invalid, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a FEN or EPD file through parsing, validation and move generation.")
+    parser.add_argument("input", help="FEN or EPD file, one position per line, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--errors", default=None, help="file for invalid lines, stderr by default")
+    parser.add_argument("--normalize", action="store_true", help="write positions as full normalized FEN-strings")
+    parser.add_argument("--moves", action="store_true", help="append the number of legal moves and the moves")
+    parser.add_argument("--san", action="store_true", help="write moves in algebraic notation instead of from-to squares")
+    parser.add_argument("--skip-invalid", action="store_true", help="leave invalid lines out of the output")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress and throughput")
+    args = parser.parse_args()
+
+    run(args.input, args.output, args.errors, args.normalize, args.moves, args.san, args.skip_invalid, args.quiet)
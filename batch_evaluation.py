@@ -0,0 +1,252 @@
+import sys
+import time
+import argparse
+from itertools import islice
+import numpy as np
+from bitboard import Bitboard, PIECE_TYPES
+from compact import CompactPosition, PIECE_CODES
+from evaluation import PIECE_SQUARE_SCORES
+
+# lines scored at once when streaming a file
+CHUNK_SIZE = 100000
+
+# material plus square bonus by piece code + 6 and square, positive for white, row 6 is an empty square
+CODE_SCORES = np.zeros((13, 64), dtype=np.int32)
+for piece_type, code in PIECE_CODES.items():
+    CODE_SCORES[code + 6] = PIECE_SQUARE_SCORES[piece_type]
+
+# the same scores by plane, in PIECE_TYPES order
+PLANE_SCORES = np.array([PIECE_SQUARE_SCORES[piece_type] for piece_type in PIECE_TYPES], dtype=np.int32)
+
+# piece code of every FEN character, "." marks an empty square after expanding the digits
+FEN_CODES = np.zeros(256, dtype=np.int8)
+for piece_type, code in PIECE_CODES.items():
+    FEN_CODES[ord(piece_type)] = code
+
+# characters allowed on a square after expanding the digits, a "." in the FEN-string itself becomes invalid
+SQUARE_CHARACTERS = "pnbrqkPNBRQK."
+VALID_SQUARES = np.zeros(256, dtype=bool)
+VALID_SQUARES[np.frombuffer(SQUARE_CHARACTERS.encode("ascii"), dtype=np.uint8)] = True
+EXPAND_DIGITS = str.maketrans({**{str(n): "." * n for n in range(1, 9)}, ".": "?"})
+
+# an expanded piece placement is 8 ranks of 8 squares separated by "/", 71 characters
+PLACEMENT_LENGTH = 71
+RANK_SEPARATORS = np.arange(8, PLACEMENT_LENGTH, 9)
+SQUARE_COLUMNS = np.array([column for column in range(PLACEMENT_LENGTH) if column % 9 != 8])
+
+
+def evaluate_boards(boards, white_to_move=None):
+    """
+        Scores a stack of boards of int8 piece codes, shape (N, 64) or (N, 8, 8) with a8 first, by material and
+        piece-square tables with whole-array operations. Scores equal evaluation.evaluate of every position.
+
+        Returns int32 array of N scores in centipawns, from white's point of view,
+        or from the side to move's if white_to_move, an array of N booleans, is given
+    """
+
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    scores = CODE_SCORES[boards.astype(np.intp) + 6, np.arange(64)].sum(axis=1, dtype=np.int32)
+
+    if white_to_move is not None:
+        scores = np.where(white_to_move, scores, -scores)
+
+    return scores
+
+
+def evaluate_planes(planes, white_to_move=None):
+    """
+        Scores a stack of piece planes, shape (N, 12, 64) of 0 or 1 in PIECE_TYPES order with a8 first.
+
+        Returns int32 array of N scores in centipawns, from white's point of view,
+        or from the side to move's if white_to_move is given
+    """
+
+    planes = np.asarray(planes).reshape(-1, 12, 64)
+    scores = np.einsum("npk,pk->n", planes.astype(np.int32), PLANE_SCORES)
+
+    if white_to_move is not None:
+        scores = np.where(white_to_move, scores, -scores)
+
+    return scores
+
+
+def boards_to_planes(boards):
+    """
+        Returns (N, 12, 64) array of 0 or 1 in PIECE_TYPES order from (N, 64) board codes
+    """
+
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    codes = np.array([PIECE_CODES[piece_type] for piece_type in PIECE_TYPES], dtype=np.int8)
+    return (boards[:, None, :] == codes[None, :, None]).astype(np.int8)
+
+
+def placement_error(fen):
+    """
+        Checks the piece placement of a FEN-string, 8 ranks of 8 squares of pieces and digits.
+
+        Returns error message, None if the placement is valid
+    """
+
+    fields = fen.split(None, 1)
+    ranks = fields[0].split("/") if fields else []
+    if len(ranks) != 8:
+        return "does not have 8 ranks"
+
+    for rank in ranks:
+        for character in rank:
+            if character not in "pnbrqkPNBRQK12345678":
+                return f"has invalid character '{character}'"
+        if len(rank.translate(EXPAND_DIGITS)) != 8:
+            return f"has rank '{rank}' without 8 squares"
+
+    return None
+
+
+def raise_first_error(fens):
+    """
+        Raises ValueError naming the first FEN-string with an invalid piece placement.
+    """
+
+    for fen in fens:
+        error = placement_error(fen)
+        if error is not None:
+            raise ValueError(f"FEN '{fen}' {error}")
+    raise ValueError("invalid piece placement")
+
+
+def boards_from_fens(fens):
+    """
+        Parses the piece placement and side to move of FEN-strings without building positions.
+        Raises ValueError naming the first FEN-string whose placement is not 8 ranks of 8 squares
+        or has characters other than pieces and digits.
+
+        Returns (N x 64 int8 array of piece codes, array of N booleans, True if white to move)
+    """
+
+    placements = []
+    white_to_move = []
+    for fen in fens:
+        fields = fen.split(None, 2)
+        placements.append(fields[0].translate(EXPAND_DIGITS) if fields else "")
+        white_to_move.append(len(fields) < 2 or fields[1] == "w")
+
+    text = "".join(placements)
+    if len(text) != PLACEMENT_LENGTH * len(placements) or not text.isascii():
+        raise_first_error(fens)
+
+    # ranks are checked for the separators between them and every square for a piece or an empty square
+    characters = np.frombuffer(text.encode("ascii"), dtype=np.uint8).reshape(-1, PLACEMENT_LENGTH)
+    squares = characters[:, SQUARE_COLUMNS]
+    if not (characters[:, RANK_SEPARATORS] == ord("/")).all() or not VALID_SQUARES[squares].all():
+        raise_first_error(fens)
+
+    return FEN_CODES[squares], np.array(white_to_move, dtype=bool)
+
+
+def boards_from_positions(positions):
+    """
+        Collects the boards of FEN-strings, Chess, Bitboard or CompactPosition objects.
+
+        Returns (N x 64 int8 array of piece codes, array of N booleans, True if white to move)
+    """
+
+    boards = []
+    white_to_move = []
+    for position in positions:
+        if isinstance(position, str):
+            position = CompactPosition.from_fen(position)
+        elif isinstance(position, Bitboard):
+            position = CompactPosition.from_bitboard(position)
+        elif not isinstance(position, CompactPosition):
+            position = CompactPosition.from_chess(position)
+        boards.append(position.board)
+        white_to_move.append(position.side_to_move == "w")
+
+    return np.frombuffer(b"".join(boards), dtype=np.int8).reshape(-1, 64), np.array(white_to_move, dtype=bool)
+
+
+def evaluate_batch(positions):
+    """
+        Scores a list of FEN-strings, or of Chess, Bitboard or CompactPosition objects.
+        A list of only FEN-strings is parsed directly into arrays.
+
+        Returns int32 array of scores in centipawns from the point of view of the side to move, as evaluation.evaluate
+    """
+
+    positions = list(positions)
+    if all(isinstance(position, str) for position in positions):
+        boards, white_to_move = boards_from_fens(positions)
+    else:
+        boards, white_to_move = boards_from_positions(positions)
+
+    return evaluate_boards(boards, white_to_move)
+
+
+def run(input_path, output_path="-", chunk_size=CHUNK_SIZE, quiet=False):
+    """
+        Scores every FEN-string in input_path, one per line, chunk_size lines at a time,
+        and writes one score per line to output_path. Blank lines are skipped. Lines with an invalid
+        piece placement are written as "invalid" and reported on stderr, the rest of their chunk is still scored.
+
+        Returns (number of positions, number of invalid positions, seconds elapsed)
+    """
+
+    source = sys.stdin if input_path == "-" else open(input_path, "r")
+    output = sys.stdout if output_path == "-" else open(output_path, "w")
+
+    count = 0
+    invalid = 0
+    line_number = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            lines = list(islice(source, chunk_size))
+            if not lines:
+                break
+
+            numbered = [(line_number + index, line.strip()) for index, line in enumerate(lines, 1) if line.strip()]
+            line_number += len(lines)
+            fens = [fen for _, fen in numbered]
+            try:
+                scores = evaluate_batch(fens).tolist()
+            except ValueError:
+                # the valid lines of the chunk are still scored together
+                errors = [placement_error(fen) for fen in fens]
+                valid_scores = iter(evaluate_batch([fen for fen, error in zip(fens, errors) if error is None]).tolist())
+                scores = []
+                for (number, fen), error in zip(numbered, errors):
+                    if error is None:
+                        scores.append(next(valid_scores))
+                    else:
+                        scores.append("invalid")
+                        invalid += 1
+                        sys.stderr.write(f"line {number}: FEN {error}: {fen}\n")
+
+            if scores:
+                output.write("\n".join(map(str, scores)) + "\n")
+            count += len(fens)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+
+    elapsed = time.perf_counter() - start
+    if not quiet:
+        sys.stderr.write(f"{count} positions ({invalid} invalid) in {elapsed:.2f}s, "
+                         f"{int(count / elapsed) if elapsed > 0 else 0} positions/second\n")
+
+    return count, invalid, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score FEN-strings by material and piece-square tables with NumPy.")
+    parser.add_argument("input", help="file of FEN-strings, one per line, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="lines scored at once")
+    parser.add_argument("--quiet", action="store_true", help="do not report throughput")
+    args = parser.parse_args()
+
+    run(args.input, args.output, args.chunk_size, args.quiet)
@@ -0,0 +1,1136 @@
+from attacks import FULL, BETWEEN, KNIGHT_ATTACKS, pawn_attacks, KING_ATTACKS, PAWN_ATTACKS, PAWN_PUSHES, rook_attacks, bishop_attacks, queen_attacks
+from zobrist import PIECE_KEYS, CASTLING_KEYS, EN_PASSANT_KEYS, SIDE_KEY, compute_hash, en_passant_capturable
+from profiler import PROFILER
+
+FILES = ["a","b","c","d","e","f","g","h"]
+
+# squares are numbered row by row from a8 (0) to h1 (63), matching the (row, file) board indices
+SQUARE_NAMES = [FILES[sq % 8] + str(8 - sq // 8) for sq in range(64)]
+SQUARE_BITS = {name: 1 << sq for sq, name in enumerate(SQUARE_NAMES)}
+
+# rank 2 for white pawns and rank 7 for black pawns
+PAWN_START_RANK = {"w": 0xFF << 48, "b": 0xFF << 8}
+
+PIECE_TYPES = ["P","N","B","R","Q","K","p","n","b","r","q","k"]
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# moves are encoded in a single int: from square in bits 0-5, to square in bits 6-11, flag in bits 12-15
+QUIET = 0
+DOUBLE_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+EN_PASSANT = 4
+PROMOTION = 8
+PROMOTION_PIECES = {"w": ["N","B","R","Q"], "b": ["n","b","r","q"]}
+
+# castling rights are kept as bits, K, Q, k, q
+CASTLING_BITS = {"K": 1, "Q": 2, "k": 4, "q": 8}
+
+# castling rights left after a move from or to each square, moving the king or a rook or capturing a rook clears them
+CASTLING_MASKS = [15] * 64
+CASTLING_MASKS[0] = 15 ^ CASTLING_BITS["q"]
+CASTLING_MASKS[4] = 15 ^ (CASTLING_BITS["k"] | CASTLING_BITS["q"])
+CASTLING_MASKS[7] = 15 ^ CASTLING_BITS["k"]
+CASTLING_MASKS[56] = 15 ^ CASTLING_BITS["Q"]
+CASTLING_MASKS[60] = 15 ^ (CASTLING_BITS["K"] | CASTLING_BITS["Q"])
+CASTLING_MASKS[63] = 15 ^ CASTLING_BITS["K"]
+
+# per side: rights bit, king from, king to, rook from, rook to, squares that must be empty, squares the king passes,
+# which must not be attacked
+CASTLING = {
+    KING_CASTLE: {
+        "w": (CASTLING_BITS["K"], 60, 62, 63, 61, (1 << 61) | (1 << 62), (1 << 60) | (1 << 61) | (1 << 62)),
+        "b": (CASTLING_BITS["k"], 4, 6, 7, 5, (1 << 5) | (1 << 6), (1 << 4) | (1 << 5) | (1 << 6)),
+    },
+    QUEEN_CASTLE: {
+        "w": (CASTLING_BITS["Q"], 60, 58, 56, 59, (1 << 57) | (1 << 58) | (1 << 59), (1 << 60) | (1 << 59) | (1 << 58)),
+        "b": (CASTLING_BITS["q"], 4, 2, 0, 3, (1 << 1) | (1 << 2) | (1 << 3), (1 << 4) | (1 << 3) | (1 << 2)),
+    },
+}
+
+
+def square_index(pos):
+    """
+        Maps position in board indices to square index.
+
+        Returns square index
+    """
+
+    return pos[0] * 8 + pos[1]
+
+
+def iterate_bits(bitboard):
+    """
+        Yields the square index of every set bit, from a8 towards h1.
+    """
+
+    while bitboard:
+        lsb = bitboard & -bitboard
+        yield lsb.bit_length() - 1
+        bitboard ^= lsb
+
+
+def encode_move(from_square, to_square, flag=QUIET):
+    """
+        Packs a move into a single int.
+
+        Returns encoded move
+    """
+
+    return from_square | (to_square << 6) | (flag << 12)
+
+
+def move_to_uci(move):
+    """
+        Maps encoded move to from and to squares in chess notation, e.g. "e2e4" or "e7e8q".
+
+        Returns move string
+    """
+
+    notation = SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63]
+    flag = move >> 12
+    if flag & PROMOTION:
+        notation += PROMOTION_PIECES["b"][flag & 3]
+
+    return notation
+
+
+def normalize_san(notation):
+    """
+        Removes check and annotation suffixes, and writes castling with letters and promotion with "=",
+        so notation matches the keys of Bitboard.san_index, e.g. "0-0+" becomes "O-O" and "e8Q" becomes "e8=Q".
+
+        Returns notation
+    """
+
+    notation = notation.rstrip("+#!?")
+    if notation[:1] == "0":
+        notation = notation.replace("0", "O")
+    elif len(notation) > 2 and notation[-1] in "NBRQ" and notation[-2] in "18":
+        notation = notation[:-1] + "=" + notation[-1]
+
+    return notation
+
+
+def popcount(bitboard):
+    """
+        Counts set bits.
+
+        Returns number of squares in bitboard
+    """
+
+    return bin(bitboard).count("1")
+
+
+class SquareSet:
+
+    __slots__ = ("bitboard",)
+
+    def __init__(self, bitboard):
+        self.bitboard = bitboard
+
+    def __contains__(self, notation):
+        """
+            Checks if square given in chess notation is in the set, e.g. "e4" in piece.legal_moves.
+        """
+
+        return bool(self.bitboard & SQUARE_BITS[notation])
+
+    def __iter__(self):
+        """
+            Yields squares in chess notation.
+        """
+
+        for square in iterate_bits(self.bitboard):
+            yield SQUARE_NAMES[square]
+
+    def __len__(self):
+        return popcount(self.bitboard)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class Bitboard:
+
+    def __init__(self, FEN=None):
+        # one 64-bit integer per piece type and color, keyed by FEN letter
+        self.bitboards = {piece_type: 0 for piece_type in PIECE_TYPES}
+        self.occupancy = {"w": 0, "b": 0}
+
+        # piece letter on every square, for finding what is captured
+        self.squares = [None] * 64
+
+        self.side_to_move = "w"
+        self.castling = 0
+        self.en_passant_square = None
+        self.halfmove_clock = 0
+        self.fullmove_counter = 1
+
+        # Zobrist key of the position, updated incrementally by make_move
+        self.hash = 0
+
+        # undo records of moves made, (move, captured piece, castling, en passant square, halfmove clock, hash)
+        self.history = []
+
+        # attack maps of this position by color, computed on demand. make_move saves them on attack_stack
+        # and starts empty maps, unmake_move restores them, so a position never computes its maps twice
+        self.attack_maps = {}
+        self.attack_stack = []
+
+        if FEN is not None:
+            self.set_fen(FEN)
+
+    @classmethod
+    def from_pieces(cls, pieces):
+        """
+            Builds bitboards from the piece lists of a Chess object, {"b": [...], "w": [...]}.
+
+            Returns Bitboard object
+        """
+
+        bitboard = cls()
+        bitboards = bitboard.bitboards
+        squares = bitboard.squares
+        for color in ("w", "b"):
+            occupancy = 0
+            for piece in pieces[color]:
+                square = piece.pos[0] * 8 + piece.pos[1]
+                bit = 1 << square
+                bitboards[piece.piece_type] |= bit
+                squares[square] = piece.piece_type
+                occupancy |= bit
+            bitboard.occupancy[color] = occupancy
+
+        bitboard.hash = compute_hash(bitboard)
+        return bitboard
+
+    @classmethod
+    def from_chess(cls, chess):
+        """
+            Builds a full position, pieces and game state, from a Chess object.
+
+            Returns Bitboard object
+        """
+
+        bitboard = cls.from_pieces(chess.pieces)
+        bitboard.side_to_move = chess.side_to_move
+        bitboard.castling = sum(CASTLING_BITS[ch] for ch in chess.castling_ability if ch in CASTLING_BITS)
+        if chess.en_passant_target_square != "-":
+            bitboard.en_passant_square = SQUARE_NAMES.index(chess.en_passant_target_square)
+        bitboard.halfmove_clock = int(chess.halfmove_clock)
+        bitboard.fullmove_counter = int(chess.fullmove_counter)
+        bitboard.hash = compute_hash(bitboard)
+
+        return bitboard
+
+    @classmethod
+    def from_board(cls, board):
+        """
+            Builds bitboards from an 8x8 board of Piece objects.
+
+            Returns Bitboard object
+        """
+
+        bitboard = cls()
+        for i in range(8):
+            for j in range(8):
+                piece = board[i][j]
+                if piece is not None:
+                    bit = 1 << (i * 8 + j)
+                    bitboard.bitboards[piece.piece_type] |= bit
+                    bitboard.occupancy[piece.color] |= bit
+                    bitboard.squares[i * 8 + j] = piece.piece_type
+
+        bitboard.hash = compute_hash(bitboard)
+        return bitboard
+
+    def set_fen(self, FEN):
+        """
+            Sets pieces and game state from FEN-string. Missing clocks default to "0 1".
+        """
+
+        fields = FEN.split()
+        if len(fields) < 4:
+            raise ValueError(f"FEN '{FEN}' needs at least 4 fields")
+
+        self.bitboards = {piece_type: 0 for piece_type in PIECE_TYPES}
+        self.occupancy = {"w": 0, "b": 0}
+        self.squares = [None] * 64
+        self.history = []
+        self.attack_maps = {}
+        self.attack_stack = []
+
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError(f"FEN '{FEN}' needs 8 ranks")
+
+        for i, part in enumerate(rows):
+            j = 0
+            for piece_type in part:
+                if piece_type.isdigit():
+                    j += int(piece_type)
+                elif piece_type in self.bitboards and j < 8:
+                    square = i * 8 + j
+                    self.bitboards[piece_type] |= 1 << square
+                    self.occupancy["b" if piece_type.islower() else "w"] |= 1 << square
+                    self.squares[square] = piece_type
+                    j += 1
+                else:
+                    raise ValueError(f"FEN '{FEN}' has invalid rank '{part}'")
+            if j != 8:
+                raise ValueError(f"FEN '{FEN}' has invalid rank '{part}'")
+
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"FEN '{FEN}' has invalid side to move")
+        self.side_to_move = fields[1]
+
+        self.castling = 0
+        for ch in fields[2]:
+            if ch in CASTLING_BITS:
+                self.castling |= CASTLING_BITS[ch]
+            elif ch != "-":
+                raise ValueError(f"FEN '{FEN}' has invalid castling ability")
+
+        if fields[3] == "-":
+            self.en_passant_square = None
+        elif fields[3] in SQUARE_BITS:
+            self.en_passant_square = SQUARE_NAMES.index(fields[3])
+        else:
+            raise ValueError(f"FEN '{FEN}' has invalid en passant square")
+
+        try:
+            self.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+            self.fullmove_counter = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError(f"FEN '{FEN}' has invalid move clocks")
+
+        self.hash = compute_hash(self)
+
+    def fen(self):
+        """
+            Builds FEN-string from pieces and game state.
+
+            Returns FEN-string
+        """
+
+        rows = []
+        for i in range(8):
+            row = ""
+            empty = 0
+            for piece_type in self.squares[i * 8:i * 8 + 8]:
+                if piece_type is None:
+                    empty += 1
+                else:
+                    if empty != 0:
+                        row += str(empty)
+                    row += piece_type
+                    empty = 0
+            if empty != 0:
+                row += str(empty)
+            rows.append(row)
+
+        castling = "".join(ch for ch in "KQkq" if self.castling & CASTLING_BITS[ch]) or "-"
+        en_passant = "-" if self.en_passant_square is None else SQUARE_NAMES[self.en_passant_square]
+
+        return "/".join(rows) + " " + self.side_to_move + " " + castling + " " + en_passant + " " \
+                + str(self.halfmove_clock) + " " + str(self.fullmove_counter)
+
+    def is_square_attacked(self, square, color):
+        """
+            Checks if any piece of the given color attacks square.
+
+            Returns True if square is attacked, False if not
+        """
+
+        attack_map = self.attack_maps.get(color)
+        if attack_map is not None:
+            return bool(attack_map >> square & 1)
+
+        bitboards = self.bitboards
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+
+        if color == "w":
+            pawn, knight, bishop, rook, queen, king = "P", "N", "B", "R", "Q", "K"
+        else:
+            pawn, knight, bishop, rook, queen, king = "p", "n", "b", "r", "q", "k"
+
+        # a pawn of color attacks square if a pawn of the other color on square would attack the pawn
+        if PAWN_ATTACKS["b" if color == "w" else "w"][square] & bitboards[pawn]:
+            return True
+        if KNIGHT_ATTACKS[square] & bitboards[knight]:
+            return True
+        if KING_ATTACKS[square] & bitboards[king]:
+            return True
+        if bishop_attacks(square, occupied) & (bitboards[bishop] | bitboards[queen]):
+            return True
+        if rook_attacks(square, occupied) & (bitboards[rook] | bitboards[queen]):
+            return True
+
+        return False
+
+    def attack_map(self, color):
+        """
+            Finds every square attacked by a piece of the given color. The map is kept until the next move,
+            after which is_square_attacked and in_check are answered from it with a single bit test.
+
+            Returns attack bitboard
+        """
+
+        attack_map = self.attack_maps.get(color)
+        if attack_map is None:
+            attack_map = self.attacked_squares(color, self.occupancy["w"] | self.occupancy["b"])
+            self.attack_maps[color] = attack_map
+
+        return attack_map
+
+    def attacked_squares(self, color, occupied):
+        """
+            Finds every square attacked by a piece of the given color, with sliders blocked by the occupied squares given.
+
+            Returns attack bitboard
+        """
+
+        bitboards = self.bitboards
+        if color == "w":
+            pawn, knight, bishop, rook, queen, king = "P", "N", "B", "R", "Q", "K"
+        else:
+            pawn, knight, bishop, rook, queen, king = "p", "n", "b", "r", "q", "k"
+
+        attack_map = pawn_attacks(bitboards[pawn], color)
+        for square in iterate_bits(bitboards[knight]):
+            attack_map |= KNIGHT_ATTACKS[square]
+        for square in iterate_bits(bitboards[king]):
+            attack_map |= KING_ATTACKS[square]
+        for square in iterate_bits(bitboards[bishop] | bitboards[queen]):
+            attack_map |= bishop_attacks(square, occupied)
+        for square in iterate_bits(bitboards[rook] | bitboards[queen]):
+            attack_map |= rook_attacks(square, occupied)
+
+        return attack_map
+
+    def in_check(self, color=None):
+        """
+            Checks if the king of the given color, default side to move, is attacked.
+
+            Returns True if king is in check, False if not
+        """
+
+        if color is None:
+            color = self.side_to_move
+
+        king = self.bitboards["K" if color == "w" else "k"]
+        if not king:
+            return False
+
+        return self.is_square_attacked(king.bit_length() - 1, "b" if color == "w" else "w")
+
+    def validate(self):
+        """
+            Checks that the position can occur in a game: one king per side, no pawns on the first or last rank,
+            the side not to move is not in check, castling rights have their king and rook on their squares
+            and the en passant square is behind a pawn that just double pushed.
+            Raises ValueError describing the first problem found.
+        """
+
+        bitboards = self.bitboards
+        if popcount(bitboards["K"]) != 1 or popcount(bitboards["k"]) != 1:
+            raise ValueError("each side needs exactly one king")
+
+        if (bitboards["P"] | bitboards["p"]) & (0xFF | (0xFF << 56)):
+            raise ValueError("pawns on first or last rank")
+
+        if self.in_check("b" if self.side_to_move == "w" else "w"):
+            raise ValueError("side not to move is in check")
+
+        for flag in (KING_CASTLE, QUEEN_CASTLE):
+            for color in ("w", "b"):
+                rights, king_from, _, rook_from, _, _, _ = CASTLING[flag][color]
+                king, rook = ("K", "R") if color == "w" else ("k", "r")
+                if self.castling & rights and (self.squares[king_from] != king or self.squares[rook_from] != rook):
+                    raise ValueError("castling rights without king and rook on their squares")
+
+        if self.en_passant_square is not None:
+            if self.side_to_move == "w":
+                rank_ok = self.en_passant_square // 8 == 2
+                pawn_square = self.en_passant_square + 8
+            else:
+                rank_ok = self.en_passant_square // 8 == 5
+                pawn_square = self.en_passant_square - 8
+            if not rank_ok or self.squares[pawn_square] != ("p" if self.side_to_move == "w" else "P") \
+                    or self.squares[self.en_passant_square] is not None:
+                raise ValueError("invalid en passant square")
+
+    def generate_moves(self, color):
+        """
+            Generates moves for every piece of the given color, using the same movement rules as Piece.generate_legal_moves.
+
+            Returns dict mapping square index of each piece to a bitboard of target squares
+        """
+
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        opponent = self.occupancy["b" if color == "w" else "w"]
+        occupied = own | opponent
+        empty = FULL ^ occupied
+        not_own = FULL ^ own
+        moves = {}
+
+        if color == "w":
+            pawn, knight, bishop, rook, queen, king = "P", "N", "B", "R", "Q", "K"
+        else:
+            pawn, knight, bishop, rook, queen, king = "p", "n", "b", "r", "q", "k"
+
+        # pawn pushes and captures
+        pawn_captures = PAWN_ATTACKS[color]
+        pawn_pushes = PAWN_PUSHES[color]
+        start_rank = PAWN_START_RANK[color]
+        for square in iterate_bits(bitboards[pawn]):
+            targets = pawn_captures[square] & opponent
+            single = pawn_pushes[square] & empty
+            if single:
+                targets |= single
+                if (1 << square) & start_rank:
+                    targets |= pawn_pushes[single.bit_length() - 1] & empty
+            moves[square] = targets
+
+        for square in iterate_bits(bitboards[knight]):
+            moves[square] = KNIGHT_ATTACKS[square] & not_own
+
+        for square in iterate_bits(bitboards[bishop]):
+            moves[square] = bishop_attacks(square, occupied) & not_own
+
+        for square in iterate_bits(bitboards[rook]):
+            moves[square] = rook_attacks(square, occupied) & not_own
+
+        for square in iterate_bits(bitboards[queen]):
+            moves[square] = queen_attacks(square, occupied) & not_own
+
+        for square in iterate_bits(bitboards[king]):
+            moves[square] = KING_ATTACKS[square] & not_own
+
+        return moves
+
+    def generate_pseudo_legal_moves(self, captures_only=False):
+        """
+            Generates encoded moves for the side to move, including castling, en passant and promotions.
+            Moves may leave the own king in check. With captures_only, only captures and promotions are generated.
+
+            Returns list of encoded moves
+        """
+
+        color = self.side_to_move
+        opponent_color = "b" if color == "w" else "w"
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        opponent = self.occupancy[opponent_color]
+        occupied = own | opponent
+        empty = FULL ^ occupied
+        not_own = opponent if captures_only else FULL ^ own
+        moves = []
+        append = moves.append
+
+        if color == "w":
+            pawn, knight, bishop, rook, queen, king = "P", "N", "B", "R", "Q", "K"
+            promotion_rank = 0xFF
+        else:
+            pawn, knight, bishop, rook, queen, king = "p", "n", "b", "r", "q", "k"
+            promotion_rank = 0xFF << 56
+
+        if captures_only:
+            # pushes are only kept when they promote
+            empty &= promotion_rank
+
+        # pawn pushes, captures, promotions and en passant
+        pawn_captures = PAWN_ATTACKS[color]
+        pawn_pushes = PAWN_PUSHES[color]
+        start_rank = PAWN_START_RANK[color]
+        en_passant = 0 if self.en_passant_square is None else 1 << self.en_passant_square
+        for square in iterate_bits(bitboards[pawn]):
+            targets = pawn_captures[square] & opponent
+            single = pawn_pushes[square] & empty
+            if single:
+                targets |= single
+                if (1 << square) & start_rank and not captures_only:
+                    double = pawn_pushes[single.bit_length() - 1] & empty
+                    if double:
+                        append(square | ((double.bit_length() - 1) << 6) | (DOUBLE_PUSH << 12))
+
+            if targets & promotion_rank:
+                for target in iterate_bits(targets):
+                    for flag in (PROMOTION | 3, PROMOTION | 2, PROMOTION | 1, PROMOTION):
+                        append(square | (target << 6) | (flag << 12))
+            else:
+                for target in iterate_bits(targets):
+                    append(square | (target << 6))
+
+            if pawn_captures[square] & en_passant:
+                append(square | (self.en_passant_square << 6) | (EN_PASSANT << 12))
+
+        for square in iterate_bits(bitboards[knight]):
+            for target in iterate_bits(KNIGHT_ATTACKS[square] & not_own):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[bishop]):
+            for target in iterate_bits(bishop_attacks(square, occupied) & not_own):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[rook]):
+            for target in iterate_bits(rook_attacks(square, occupied) & not_own):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[queen]):
+            for target in iterate_bits(queen_attacks(square, occupied) & not_own):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[king]):
+            for target in iterate_bits(KING_ATTACKS[square] & not_own):
+                append(square | (target << 6))
+
+        # castling, king may not be in check or pass through an attacked square. Rights from a FEN-string
+        # may be stale, so the king and rook must still be on their squares
+        if self.castling and not captures_only:
+            rook = "R" if color == "w" else "r"
+            for flag in (KING_CASTLE, QUEEN_CASTLE):
+                rights, king_from, king_to, rook_from, _, between, passing = CASTLING[flag][color]
+                if (self.castling & rights) and not (occupied & between) and self.squares[king_from] == king \
+                        and self.squares[rook_from] == rook:
+                    if not self.attack_map(opponent_color) & passing:
+                        append(king_from | (king_to << 6) | (flag << 12))
+
+        return moves
+
+    def generate_legal_moves(self):
+        """
+            Generates encoded moves for the side to move that do not leave the own king in check.
+            Checking pieces and pinned pieces are found once, then every piece's targets are masked:
+            in check, moves must capture the checking piece or block it, pinned pieces only move along the pin,
+            and the king only moves to squares the opponent does not attack. En passant, which can uncover
+            an attack along the rank of both pawns, is made and tested.
+
+            Returns list of encoded moves
+        """
+
+        color = self.side_to_move
+        opponent_color = "b" if color == "w" else "w"
+        bitboards = self.bitboards
+        own = self.occupancy[color]
+        opponent = self.occupancy[opponent_color]
+        occupied = own | opponent
+        empty = FULL ^ occupied
+        moves = []
+        append = moves.append
+
+        if color == "w":
+            pawn, knight, bishop, rook, queen, king = "P", "N", "B", "R", "Q", "K"
+            opponent_pawn, opponent_knight, opponent_bishop, opponent_rook, opponent_queen = "p", "n", "b", "r", "q"
+            promotion_rank = 0xFF
+        else:
+            pawn, knight, bishop, rook, queen, king = "p", "n", "b", "r", "q", "k"
+            opponent_pawn, opponent_knight, opponent_bishop, opponent_rook, opponent_queen = "P", "N", "B", "R", "Q"
+            promotion_rank = 0xFF << 56
+
+        king_bitboard = bitboards[king]
+        if king_bitboard & (king_bitboard - 1) or not king_bitboard:
+            # without exactly one king there is nothing to pin against
+            return self.generate_legal_moves_by_testing()
+        king_square = king_bitboard.bit_length() - 1
+
+        diagonal_sliders = bitboards[opponent_bishop] | bitboards[opponent_queen]
+        linear_sliders = bitboards[opponent_rook] | bitboards[opponent_queen]
+
+        checkers = (PAWN_ATTACKS[color][king_square] & bitboards[opponent_pawn]) \
+            | (KNIGHT_ATTACKS[king_square] & bitboards[opponent_knight]) \
+            | (bishop_attacks(king_square, occupied) & diagonal_sliders) \
+            | (rook_attacks(king_square, occupied) & linear_sliders)
+
+        # squares the king may not move to, the king itself does not block attacks along the line it moves on
+        danger = self.attacked_squares(opponent_color, occupied ^ king_bitboard)
+        for target in iterate_bits(KING_ATTACKS[king_square] & ~own & ~danger):
+            append(king_square | (target << 6))
+
+        # in double check only the king can move
+        if checkers & (checkers - 1):
+            return moves
+
+        # squares other pieces may move to, capturing the checking piece or blocking a sliding one
+        if checkers:
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+
+        # a piece is pinned if it is the only piece between the king and an opponent slider on the same line,
+        # it may only move between the king and the slider, or capture the slider
+        pinned = 0
+        pin_rays = {}
+        snipers = (bishop_attacks(king_square, opponent) & diagonal_sliders) \
+            | (rook_attacks(king_square, opponent) & linear_sliders)
+        for sniper in iterate_bits(snipers):
+            between = BETWEEN[king_square][sniper]
+            blockers = between & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pin_rays[blockers.bit_length() - 1] = between | (1 << sniper)
+
+        not_own = (FULL ^ own) & check_mask
+
+        # pawn pushes, captures, promotions and en passant
+        pawn_captures = PAWN_ATTACKS[color]
+        pawn_pushes = PAWN_PUSHES[color]
+        start_rank = PAWN_START_RANK[color]
+        en_passant = 0 if self.en_passant_square is None else 1 << self.en_passant_square
+        for square in iterate_bits(bitboards[pawn]):
+            allowed = check_mask
+            if pinned >> square & 1:
+                allowed &= pin_rays[square]
+
+            targets = pawn_captures[square] & opponent
+            single = pawn_pushes[square] & empty
+            if single:
+                targets |= single
+                if (1 << square) & start_rank:
+                    double = pawn_pushes[single.bit_length() - 1] & empty & allowed
+                    if double:
+                        append(square | ((double.bit_length() - 1) << 6) | (DOUBLE_PUSH << 12))
+            targets &= allowed
+
+            if targets & promotion_rank:
+                for target in iterate_bits(targets):
+                    for flag in (PROMOTION | 3, PROMOTION | 2, PROMOTION | 1, PROMOTION):
+                        append(square | (target << 6) | (flag << 12))
+            else:
+                for target in iterate_bits(targets):
+                    append(square | (target << 6))
+
+            if pawn_captures[square] & en_passant:
+                move = square | (self.en_passant_square << 6) | (EN_PASSANT << 12)
+                if self.is_legal(move):
+                    append(move)
+
+        # pinned knights can never move along the pin
+        for square in iterate_bits(bitboards[knight] & ~pinned):
+            for target in iterate_bits(KNIGHT_ATTACKS[square] & not_own):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[bishop]):
+            targets = bishop_attacks(square, occupied) & not_own
+            if pinned >> square & 1:
+                targets &= pin_rays[square]
+            for target in iterate_bits(targets):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[rook]):
+            targets = rook_attacks(square, occupied) & not_own
+            if pinned >> square & 1:
+                targets &= pin_rays[square]
+            for target in iterate_bits(targets):
+                append(square | (target << 6))
+
+        for square in iterate_bits(bitboards[queen]):
+            targets = queen_attacks(square, occupied) & not_own
+            if pinned >> square & 1:
+                targets &= pin_rays[square]
+            for target in iterate_bits(targets):
+                append(square | (target << 6))
+
+        # castling, king may not be in check or pass through an attacked square, and the rook must be on its square
+        if self.castling and not checkers:
+            rook = "R" if color == "w" else "r"
+            for flag in (KING_CASTLE, QUEEN_CASTLE):
+                rights, king_from, king_to, rook_from, _, between, passing = CASTLING[flag][color]
+                if (self.castling & rights) and not (occupied & between) and king_square == king_from \
+                        and self.squares[rook_from] == rook:
+                    if not danger & passing:
+                        append(king_from | (king_to << 6) | (flag << 12))
+
+        return moves
+
+    def generate_legal_moves_by_testing(self):
+        """
+            Generates encoded moves for the side to move that do not leave the own king in check.
+            Each pseudo-legal move is made, tested and unmade. Slower than generate_legal_moves,
+            kept for positions without exactly one king and for checking the faster generator.
+
+            Returns list of encoded moves
+        """
+
+        color = self.side_to_move
+        legal_moves = []
+        for move in self.generate_pseudo_legal_moves():
+            self.make_move(move)
+            if not self.in_check(color):
+                legal_moves.append(move)
+            self.unmake_move()
+
+        return legal_moves
+
+    def is_legal(self, move):
+        """
+            Checks if a pseudo-legal move leaves the own king out of check by making and unmaking it.
+
+            Returns True if move is legal, False if not
+        """
+
+        color = self.side_to_move
+        self.make_move(move)
+        legal = not self.in_check(color)
+        self.unmake_move()
+
+        return legal
+
+    def san(self, move):
+        """
+            Maps legal encoded move to standard algebraic notation, e.g. "Nf3", "exd5", "Rad1", "e8=Q+" or "O-O".
+
+            Returns move in chess notation
+        """
+
+        notation = self.san_base(move, self.move_origins(self.generate_legal_moves()))
+
+        self.make_move(move)
+        if self.in_check():
+            notation += "#" if not self.generate_legal_moves() else "+"
+        self.unmake_move()
+
+        return notation
+
+    def move_origins(self, legal_moves):
+        """
+            Collects the squares legal moves start from, by piece and target square, for disambiguating notation.
+
+            Returns dict {(piece letter, to square): list of from squares}
+        """
+
+        origins = {}
+        squares = self.squares
+        for move in legal_moves:
+            key = (squares[move & 63], (move >> 6) & 63)
+            if key in origins:
+                origins[key].append(move & 63)
+            else:
+                origins[key] = [move & 63]
+
+        return origins
+
+    def san_base(self, move, origins):
+        """
+            Maps legal encoded move to standard algebraic notation without the check or checkmate suffix.
+
+            Returns move in chess notation
+        """
+
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        flag = move >> 12
+        piece = self.squares[from_square]
+
+        if flag == KING_CASTLE:
+            return "O-O"
+        if flag == QUEEN_CASTLE:
+            return "O-O-O"
+
+        if piece in ("P", "p"):
+            notation = ""
+            if self.squares[to_square] is not None or flag == EN_PASSANT:
+                notation = FILES[from_square % 8] + "x"
+            notation += SQUARE_NAMES[to_square]
+            if flag & PROMOTION:
+                notation += "=" + PROMOTION_PIECES["w"][flag & 3]
+            return notation
+
+        notation = piece.upper()
+
+        # other pieces of the same type that can move to the same square
+        others = [other for other in origins[(piece, to_square)] if other != from_square]
+        if others:
+            if all(other % 8 != from_square % 8 for other in others):
+                notation += FILES[from_square % 8]
+            elif all(other // 8 != from_square // 8 for other in others):
+                notation += str(8 - from_square // 8)
+            else:
+                notation += SQUARE_NAMES[from_square]
+
+        if self.squares[to_square] is not None:
+            notation += "x"
+
+        return notation + SQUARE_NAMES[to_square]
+
+    def san_index(self, legal_moves=None):
+        """
+            Maps the notation of every legal move, without check or checkmate suffix, to the move.
+            Looking up normalize_san of a move typed or read from a file finds it, or tells it is not legal, in one step.
+            The legal moves are generated unless given.
+
+            Returns dict {notation: encoded move}
+        """
+
+        if legal_moves is None:
+            legal_moves = self.generate_legal_moves()
+        origins = self.move_origins(legal_moves)
+        return {self.san_base(move, origins): move for move in legal_moves}
+
+    def resolve_san(self, notation, index=None):
+        """
+            Finds legal move in chess notation through the index of this position, built if not given.
+            Notation that is valid but not in the index, e.g. with needless disambiguation, is parsed instead.
+
+            Returns encoded move, None if notation is not a legal move
+        """
+
+        if index is None:
+            index = self.san_index()
+
+        move = index.get(normalize_san(notation))
+        if move is not None:
+            return move
+
+        try:
+            return self.parse_san(notation)
+        except ValueError:
+            return None
+
+    def parse_san(self, notation):
+        """
+            Finds the legal move written in standard algebraic notation, e.g. "Nf3", "exd5", "R1e2", "e8=Q", "O-O".
+            Check and annotation suffixes are ignored. Raises ValueError if no single legal move matches.
+
+            Returns encoded move
+        """
+
+        san = notation.rstrip("+#!?")
+        # only the moves matching the notation are tested for legality
+        moves = self.generate_pseudo_legal_moves()
+
+        if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            flag = KING_CASTLE if len(san) == 3 else QUEEN_CASTLE
+            for move in moves:
+                if move >> 12 == flag and self.is_legal(move):
+                    return move
+            raise ValueError(f"illegal move '{notation}'")
+
+        # promotion, "e8=Q" or "e8Q"
+        promotion = None
+        if "=" in san:
+            san, promotion = san.split("=", 1)
+        elif len(san) > 2 and san[-1].upper() in "NBRQ" and san[-2].isdigit():
+            san, promotion = san[:-1], san[-1]
+        if promotion is not None:
+            if promotion.upper() not in "NBRQ" or len(promotion) != 1:
+                raise ValueError(f"invalid promotion in '{notation}'")
+            promotion = PROMOTION | PROMOTION_PIECES["w"].index(promotion.upper())
+
+        if len(san) < 2 or san[-2:] not in SQUARE_BITS:
+            raise ValueError(f"invalid move '{notation}'")
+        to_square = SQUARE_NAMES.index(san[-2:])
+
+        if san[0] in "NBRQK":
+            piece = san[0] if self.side_to_move == "w" else san[0].lower()
+            disambiguation = san[1:-2].replace("x", "")
+        else:
+            piece = "P" if self.side_to_move == "w" else "p"
+            disambiguation = san[:-2].replace("x", "")
+
+        from_file = from_rank = None
+        for ch in disambiguation:
+            if ch in FILES:
+                from_file = FILES.index(ch)
+            elif ch in "12345678":
+                from_rank = 8 - int(ch)
+            else:
+                raise ValueError(f"invalid move '{notation}'")
+
+        candidates = []
+        for move in moves:
+            from_square = move & 63
+            if (move >> 6) & 63 != to_square or self.squares[from_square] != piece:
+                continue
+            if from_file is not None and from_square % 8 != from_file:
+                continue
+            if from_rank is not None and from_square // 8 != from_rank:
+                continue
+            flag = move >> 12
+            if (flag & PROMOTION and flag != promotion) or (promotion is not None and not flag & PROMOTION):
+                continue
+            if self.is_legal(move):
+                candidates.append(move)
+
+        if len(candidates) == 1:
+            return candidates[0]
+        if not candidates:
+            raise ValueError(f"illegal move '{notation}'")
+        raise ValueError(f"ambiguous move '{notation}'")
+
+    def is_repetition(self):
+        """
+            Checks if the current position occurred before since the last capture or pawn move.
+
+            Returns True if position is repeated, False if not
+        """
+
+        history = self.history
+        key = self.hash
+        oldest = max(0, len(history) - self.halfmove_clock)
+        for i in range(len(history) - 2, oldest - 1, -2):
+            if history[i][5] == key:
+                return True
+
+        return False
+
+    def make_move(self, move):
+        """
+            Performs encoded move and pushes an undo record so unmake_move can restore the position.
+            The move is assumed to be pseudo-legal in the current position.
+        """
+
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        flag = move >> 12
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        squares = self.squares
+        color = self.side_to_move
+        opponent = "b" if color == "w" else "w"
+
+        piece = squares[from_square]
+        captured = squares[to_square]
+        key = self.hash
+        self.history.append((move, captured, self.castling, self.en_passant_square, self.halfmove_clock, key))
+        self.attack_stack.append(self.attack_maps)
+        self.attack_maps = {}
+
+        # the en passant file is only in the key if a pawn of the side to move could capture, checked before it moves
+        if self.en_passant_square is not None:
+            if en_passant_capturable(PAWN_ATTACKS[opponent][self.en_passant_square], bitboards["P" if color == "w" else "p"]):
+                key ^= EN_PASSANT_KEYS[self.en_passant_square & 7]
+            self.en_passant_square = None
+
+        from_bit = 1 << from_square
+        to_bit = 1 << to_square
+        bitboards[piece] ^= from_bit | to_bit
+        occupancy[color] ^= from_bit | to_bit
+        squares[from_square] = None
+        squares[to_square] = piece
+        piece_keys = PIECE_KEYS[piece]
+        key ^= piece_keys[from_square] ^ piece_keys[to_square]
+
+        if captured is not None:
+            bitboards[captured] ^= to_bit
+            occupancy[opponent] ^= to_bit
+            key ^= PIECE_KEYS[captured][to_square]
+
+        if flag:
+            if flag == DOUBLE_PUSH:
+                self.en_passant_square = (from_square + to_square) >> 1
+                if en_passant_capturable(PAWN_ATTACKS[color][self.en_passant_square], bitboards["p" if color == "w" else "P"]):
+                    key ^= EN_PASSANT_KEYS[from_square & 7]
+            elif flag == EN_PASSANT:
+                # captured pawn is behind the target square
+                captured_square = to_square + 8 if color == "w" else to_square - 8
+                captured_pawn = squares[captured_square]
+                captured_bit = 1 << captured_square
+                bitboards[captured_pawn] ^= captured_bit
+                occupancy[opponent] ^= captured_bit
+                squares[captured_square] = None
+                key ^= PIECE_KEYS[captured_pawn][captured_square]
+            elif flag & PROMOTION:
+                promoted = PROMOTION_PIECES[color][flag & 3]
+                bitboards[piece] ^= to_bit
+                bitboards[promoted] |= to_bit
+                squares[to_square] = promoted
+                key ^= piece_keys[to_square] ^ PIECE_KEYS[promoted][to_square]
+            else:
+                _, _, _, rook_from, rook_to, _, _ = CASTLING[flag][color]
+                rook = squares[rook_from]
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                bitboards[rook] ^= rook_bits
+                occupancy[color] ^= rook_bits
+                squares[rook_from] = None
+                squares[rook_to] = rook
+                key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+
+        castling = self.castling & CASTLING_MASKS[from_square] & CASTLING_MASKS[to_square]
+        if castling != self.castling:
+            key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+            self.castling = castling
+
+        self.hash = key ^ SIDE_KEY
+
+        if captured is not None or piece == "P" or piece == "p":
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        if color == "b":
+            self.fullmove_counter += 1
+
+        self.side_to_move = opponent
+
+    def unmake_move(self):
+        """
+            Takes back the last move made with make_move, restoring captured pieces, promotions, castling ability,
+            en passant square and clocks from the undo record.
+
+            Returns the encoded move that was taken back
+        """
+
+        move, captured, castling, en_passant_square, halfmove_clock, key = self.history.pop()
+        self.attack_maps = self.attack_stack.pop()
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        flag = move >> 12
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        squares = self.squares
+        opponent = self.side_to_move
+        color = "b" if opponent == "w" else "w"
+
+        piece = squares[to_square]
+        from_bit = 1 << from_square
+        to_bit = 1 << to_square
+
+        if flag & PROMOTION:
+            # turn the promoted piece back into a pawn before moving it back
+            bitboards[piece] ^= to_bit
+            piece = "P" if color == "w" else "p"
+            bitboards[piece] |= to_bit
+
+        bitboards[piece] ^= from_bit | to_bit
+        occupancy[color] ^= from_bit | to_bit
+        squares[from_square] = piece
+        squares[to_square] = captured
+
+        if captured is not None:
+            bitboards[captured] |= to_bit
+            occupancy[opponent] |= to_bit
+
+        if flag == EN_PASSANT:
+            captured_square = to_square + 8 if color == "w" else to_square - 8
+            captured_pawn = "p" if color == "w" else "P"
+            bitboards[captured_pawn] |= 1 << captured_square
+            occupancy[opponent] |= 1 << captured_square
+            squares[captured_square] = captured_pawn
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            _, _, _, rook_from, rook_to, _, _ = CASTLING[flag][color]
+            rook = squares[rook_to]
+            rook_bits = (1 << rook_from) | (1 << rook_to)
+            bitboards[rook] ^= rook_bits
+            occupancy[color] ^= rook_bits
+            squares[rook_to] = None
+            squares[rook_from] = rook
+
+        self.castling = castling
+        self.en_passant_square = en_passant_square
+        self.halfmove_clock = halfmove_clock
+        self.hash = key
+        if color == "b":
+            self.fullmove_counter -= 1
+        self.side_to_move = color
+
+        return move
+
+
+PROFILER.register("Bitboard.generate_legal_moves", Bitboard, "generate_legal_moves")
+PROFILER.register("Bitboard.parse_san", Bitboard, "parse_san")
+PROFILER.register("Bitboard.resolve_san", Bitboard, "resolve_san")
+PROFILER.register("Bitboard.san_index", Bitboard, "san_index")
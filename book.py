@@ -0,0 +1,231 @@
+import os
+import sys
+import mmap
+import random
+import struct
+import argparse
+from bitboard import Bitboard, STARTING_FEN
+from pgn import read_games, parse_game
+
+# entries are 16 bytes as in Polyglot books: position key, encoded move, weight and an unused learn field,
+# big-endian and sorted by key. Keys are this program's Zobrist keys, so Polyglot books can not be read.
+# As in Polyglot the en passant file is only in the key when a pawn can capture, so transpositions share entries
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+
+# plies of every game added to a book
+MAX_PLIES = 24
+
+# largest weight of an entry, weights are scaled down to fit
+MAX_WEIGHT = 0xFFFF
+
+# weight of a move by the result for the side that played it
+RESULT_WEIGHTS = {"win": 2, "draw": 1, "loss": 0}
+
+
+class OpeningBook:
+    """
+        Opening book file opened with mmap and searched by binary search on the position key,
+        so lookups read a few pages of the file instead of loading it into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY.size:
+            self.file.close()
+            raise ValueError(f"{path} is not an opening book, size is not a multiple of {ENTRY.size} bytes")
+
+        self.count = size // ENTRY.size
+        # an empty file can not be mapped
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+            Unmaps and closes the book file.
+        """
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def first_entry(self, key):
+        """
+            Binary search for the first entry of key.
+
+            Returns index of the first entry with key, or of the first larger key
+        """
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, middle * ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def entries(self, key):
+        """
+            Returns list of (encoded move, weight) stored for position key, in file order
+        """
+
+        entries = []
+        index = self.first_entry(key)
+        while index < self.count:
+            entry_key, move, weight, _ = ENTRY.unpack_from(self.data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+            index += 1
+
+        return entries
+
+    def moves(self, position, validate=True):
+        """
+            Looks up the book moves of a Bitboard object. Moves are checked against the legal moves of
+            the position unless validate is False, guarding against key collisions and books of other positions.
+
+            Returns list of (encoded move, weight), heaviest first
+        """
+
+        entries = self.entries(position.hash)
+        if validate and entries:
+            legal_moves = set(position.generate_legal_moves())
+            entries = [(move, weight) for move, weight in entries if move in legal_moves]
+
+        return sorted(entries, key=lambda entry: -entry[1])
+
+    def choose(self, position, rng=random):
+        """
+            Picks a book move at random, in proportion to the weights.
+
+            Returns encoded move, None if the position is not in the book
+        """
+
+        entries = [(move, weight) for move, weight in self.moves(position) if weight > 0]
+        if not entries:
+            return None
+
+        return rng.choices([move for move, _ in entries], weights=[weight for _, weight in entries])[0]
+
+
+def add_game(counts, tags, moves, result, max_plies=MAX_PLIES):
+    """
+        Replays the first max_plies moves of a game from the starting position and adds the weight of every move
+        to counts, by (position key, encoded move). Games from another position than the start are skipped,
+        and a game stops at its first illegal move.
+
+        Returns number of moves added
+    """
+
+    if tags.get("FEN", STARTING_FEN) != STARTING_FEN:
+        return 0
+
+    result = result or tags.get("Result", "*")
+    position = Bitboard(STARTING_FEN)
+    added = 0
+    for notation in moves[:max_plies]:
+        try:
+            move = position.parse_san(notation)
+        except ValueError:
+            break
+
+        if result == "1/2-1/2":
+            weight = RESULT_WEIGHTS["draw"]
+        elif result == ("1-0" if position.side_to_move == "w" else "0-1"):
+            weight = RESULT_WEIGHTS["win"]
+        elif result in ("1-0", "0-1"):
+            weight = RESULT_WEIGHTS["loss"]
+        else:
+            # unfinished games count as draws
+            weight = RESULT_WEIGHTS["draw"]
+
+        entry = (position.hash, move)
+        counts[entry] = counts.get(entry, 0) + weight
+        position.make_move(move)
+        added += 1
+
+    return added
+
+
+def write_book(counts, path, min_weight=1):
+    """
+        Writes entries with at least min_weight, sorted by key and heaviest move first,
+        scaling weights down if the heaviest entry does not fit.
+
+        Returns number of entries written
+    """
+
+    entries = sorted(((key, move, weight) for (key, move), weight in counts.items() if weight >= min_weight),
+                     key=lambda entry: (entry[0], -entry[2], entry[1]))
+
+    heaviest = max((weight for _, _, weight in entries), default=0)
+    scale = MAX_WEIGHT / heaviest if heaviest > MAX_WEIGHT else 1
+
+    with open(path, "wb") as f:
+        for key, move, weight in entries:
+            f.write(ENTRY.pack(key, move, max(1, int(weight * scale)), 0))
+
+    return len(entries)
+
+
+def build_book(pgn_paths, output_path, max_plies=MAX_PLIES, min_weight=1, quiet=False):
+    """
+        Builds an opening book from the games of PGN files.
+
+        Returns (number of games read, number of entries written)
+    """
+
+    counts = {}
+    games = 0
+    for path in pgn_paths:
+        for text in read_games(path):
+            tags, moves, result = parse_game(text)
+            add_game(counts, tags, moves, result, max_plies)
+            games += 1
+
+    entries = write_book(counts, output_path, min_weight)
+    if not quiet:
+        sys.stderr.write(f"{games} games, {entries} book entries written to {output_path}\n")
+
+    return games, entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an opening book from PGN files, or look up a position in one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="build a book from PGN files")
+    build_parser.add_argument("pgn", nargs="+", help="PGN files, - for stdin")
+    build_parser.add_argument("-o", "--output", required=True, help="book file to write")
+    build_parser.add_argument("--plies", type=int, default=MAX_PLIES, help="plies of every game added")
+    build_parser.add_argument("--min-weight", type=int, default=1, help="leave out moves weighing less")
+    build_parser.add_argument("--quiet", action="store_true", help="do not report the number of entries")
+
+    probe_parser = subparsers.add_parser("probe", help="list the book moves of a position")
+    probe_parser.add_argument("book", help="book file")
+    probe_parser.add_argument("--fen", default=STARTING_FEN)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_book(args.pgn, args.output, args.plies, args.min_weight, args.quiet)
+    else:
+        position = Bitboard(args.fen)
+        with OpeningBook(args.book) as book:
+            moves = book.moves(position)
+            total = sum(weight for _, weight in moves)
+            for move, weight in moves:
+                print(f"{position.san(move)}: {weight} ({100 * weight / total:.1f}%)")
@@ -1,41 +1,115 @@
 import re
-import numpy as np
+import io
+import sys
+import argparse
+from contextlib import redirect_stdout
 from piece import Piece
-from playsound import playsound
+from bitboard import Bitboard, SquareSet, KING_CASTLE, QUEEN_CASTLE, EN_PASSANT, PROMOTION, PROMOTION_PIECES, CASTLING
+from game_io import ConsoleInput, ConsoleOutput, ScriptedInput
+from audio import Audio
+from renderer import Renderer, format_board, EMPTY_SQUARE
+from profiler import PROFILER
+from incremental import MoveTracker
+
+# the engine, opening book, tablebases, perft and UCI are imported when first used, so games and scripts
+# that do not use them start faster
 
 STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
-EMPTY_SQUARE = "\u26AC"
 FILE_TO_NUM = {"a":0,"b":1,"c":2,"d":3,"e":4,"f":5,"g":6,"h":7}
 FILES = ["a","b","c","d","e","f","g","h"]
 
+# castling ability lost when a piece leaves or is captured on these squares
+CASTLING_SQUARES = {(7,4): "KQ", (7,7): "K", (7,0): "Q", (0,4): "kq", (0,7): "k", (0,0): "q"}
+
+
+class Board(list):
+    """
+        8x8 board of pieces, None for empty squares. Indexed by row, board[i][j], or by position tuple, board[(i, j)].
+    """
+
+    def __init__(self):
+        super().__init__([None] * 8 for _ in range(8))
+
+    def __getitem__(self, index):
+        if type(index) is tuple:
+            return list.__getitem__(self, index[0])[index[1]]
+        return list.__getitem__(self, index)
+
+    def __setitem__(self, index, value):
+        if type(index) is tuple:
+            list.__getitem__(self, index[0])[index[1]] = value
+        else:
+            list.__setitem__(self, index, value)
+
+
 class Chess:
 
-    def __init__(self, FEN=None):
+    def __init__(self, FEN=None, use_bitboards=True, engine="", engine_time=1.0, engine_nodes=None,
+                 input_source=None, output=None, render=True, sound=True, full_redraw=False, book=None,
+                 tablebase=None, start=True):
+        self.use_bitboards = use_bitboards
+
+        # moves are read from input_source and everything is written to output, the terminal by default.
+        # render and sound can be turned off to run scripted games without drawing the board or playing sounds
+        self.input_source = input_source if input_source is not None else ConsoleInput()
+        self.output = output if output is not None else ConsoleOutput()
+        self.render = render
+        self.renderer = Renderer(self.output, ansi=False if full_redraw else None) if render else None
+        self.audio = Audio(enabled=sound)
+
+        # messages shown below the board the next time it is drawn
+        self.messages = []
+
+        # sides played by the engine, "w", "b", "wb" or "" for two players
+        self.engine_sides = engine
+        self.engine_time = engine_time
+        self.engine_nodes = engine_nodes
+        self.engine_info = None
+
+        # opening book played by the engine before searching, a path or an OpeningBook object
+        if isinstance(book, str):
+            from book import OpeningBook
+            book = OpeningBook(book)
+        self.book = book
+
+        # tablebases probed by the engine and for showing the result of endgames, a path or a Tablebase object
+        if isinstance(tablebase, str):
+            from tablebase import Tablebase
+            tablebase = Tablebase(tablebase)
+        self.tablebase = tablebase
+
+        self.engine = None
+        if engine:
+            from search import Search
+            self.engine = Search(tablebase=self.tablebase)
+
+        # legal moves of the current position by notation, built by generate_legal_moves when using bitboards
+        self.position = None
+        self.san_index = None
+
+        # position and attacks of every piece kept from move to move, made on the first generate_legal_moves
+        self.tracker = None
+
         self.init_board_and_piece_rep(FEN)
         self.generate_legal_moves()
-        self.game_loop()
+
+        # with start=False the game is only set up and game_loop() is called later, e.g. after changing the input source
+        if start:
+            self.game_loop()
     
     def __repr__(self):
         """
             Generates string representation of board.
         """
 
-        board_repr = "  \u250F" + "\u2501"*17 + "\u2513" + "\n"
-        for i in range(8):
-            board_repr += str(8-i) + " \u2503 "
-            for j in range(8):
-                if self.board[i][j] is None:
-                    board_repr += EMPTY_SQUARE
-                else:
-                    board_repr += repr(self.board[i][j])
-                
-                board_repr += " "
+        return format_board(self.square_symbols())
 
-            board_repr += "\u2503\n"
+    def square_symbols(self):
+        """
+            Returns list of the symbols on all 64 squares, a8 first
+        """
 
-        board_repr += "  \u2517" + "\u2501"*17 + "\u251B" + "\n"
-        board_repr += "    a b c d e f g h"
-        return board_repr
+        return [EMPTY_SQUARE if self.board[i][j] is None else repr(self.board[i][j]) for i in range(8) for j in range(8)]
 
     def init_board_and_piece_rep(self, FEN):
         """
@@ -44,7 +118,7 @@ class Chess:
 
         black_pieces = []
         white_pieces = []
-        board = np.full((8,8), None)
+        board = Board()
 
         if FEN is None:
             fen_split = STARTING_FEN.replace(' ', '/').split('/')
@@ -88,54 +162,155 @@ class Chess:
         # number of full moves, incremented after black's moves
         self.fullmove_counter = fen_split[12] #number of full moves
 
+        # squares attacked by each side, and kings in check, updated by generate_legal_moves
+        self.attacks = {"w": 0, "b": 0}
         self.white_king_check = False
         self.black_king_check = False
 
     def generate_legal_moves(self):
         """
             Iterates list of pieces of the side to move next, and generates all legal moves.
-        """
-
+            Uses the bitboard move generator unless use_bitboards is False, then each piece generates its own moves.
+            Also updates the squares attacked by each side, and if a king is in check.
+            With bitboards only pieces affected by the last move are recomputed, see MoveTracker.
+        """
+
+        if not self.use_bitboards:
+            position = Bitboard.from_chess(self)
+            self.attacks = {"w": position.attack_map("w"), "b": position.attack_map("b")}
+            self.white_king_check = bool(self.attacks["b"] & position.bitboards["K"])
+            self.black_king_check = bool(self.attacks["w"] & position.bitboards["k"])
+            for piece in self.pieces[self.side_to_move]:
+                piece.generate_legal_moves(self.board)
+            return
+
+        if self.tracker is None:
+            self.tracker = MoveTracker(Bitboard.from_chess(self))
+        position = self.tracker.position
+        self.attacks = {"w": self.tracker.attack_map("w"), "b": self.tracker.attack_map("b")}
+        self.white_king_check = bool(self.attacks["b"] & position.bitboards["K"])
+        self.black_king_check = bool(self.attacks["w"] & position.bitboards["k"])
+
+        self.position = position
+        self.san_index = position.san_index(self.tracker.generate_legal_moves())
+
+        targets = [0] * 64
+        for move in self.san_index.values():
+            targets[move & 63] |= 1 << ((move >> 6) & 63)
         for piece in self.pieces[self.side_to_move]:
-            piece.generate_legal_moves(self.board)
+            piece.legal_moves = SquareSet(targets[piece.pos[0] * 8 + piece.pos[1]])
 
     def game_loop(self):
         """
-            Game loop
+            Game loop, reads and performs moves until "q" or until the input source has no more moves.
         """
 
-        # print board
-        print(self)
+        while True:
+            # draw board, only the squares changed since the last frame are redrawn
+            if self.render:
+                self.renderer.draw(self.square_symbols(), self.messages)
+                self.messages = []
 
-        # get move from player
-        move = input(":")
-        if move == "q":
-            self.quit_sequence()
+            # get move from engine or player
+            if self.side_to_move in self.engine_sides:
+                move = self.engine_move()
+            else:
+                move = self.input_source.read_move()
+
+            if move is None:
+                break
+
+            if move == "q":
+                self.quit_sequence()
+                break
+
+            # count leaf nodes from current position, e.g. "perft 4" or "perft divide 4"
+            if move.startswith("perft"):
+                self.perft_sequence(move)
+                continue
+
+            # perform move if possbile
+            moved = self.move(move)
+
+            if self.engine_info is not None:
+                self.message(self.engine_info + "\n")
+                self.engine_info = None
+
+            # plays move-sound if successful, or error-sound if not
+            # generates legal moves for next side to move
+            if moved:
+                self.audio.play("move")
+                if self.side_to_move == "b":
+                    self.side_to_move = "w"
+                    self.fullmove_counter = str(int(self.fullmove_counter) + 1)
+                else:
+                    self.side_to_move = "b"
+
+                self.generate_legal_moves()
+                if self.san_index == {}:
+                    self.message("Checkmate\n" if self.white_king_check or self.black_king_check else "Stalemate\n")
+                elif self.white_king_check or self.black_king_check:
+                    self.message("Check\n")
+
+                # exact result once the position is in the tablebases
+                if self.tablebase is not None and self.san_index != {}:
+                    result = self.tablebase.probe_pieces(self.pieces, self.side_to_move, self.castling_ability)
+                    if result is not None:
+                        from tablebase import format_result
+                        self.message("Tablebase: " + format_result(result, self.side_to_move) + "\n")
+            else:
+                self.message(f"Move '{move}' is not legal\n")
+                self.audio.play("failed_move")
 
+        self.audio.close()
+        self.output.flush()
 
-        # perform move if possbile
-        moved = self.move(move)
+    def show(self, text):
+        """
+            Writes a line of text to the output.
+        """
 
-        # refresh terminal
-        print("\n"*50)
+        self.output.write(text + "\n")
 
-        # plays move-sound if successful, or error-sound if not
-        # generates legal moves for next side to move
-        if moved:
-            playsound("sounds/move.mp3")
-            if self.side_to_move == "b":
-                self.side_to_move = "w"
-            else:
-                self.side_to_move = "b"
+    def message(self, text):
+        """
+            Shows text below the board the next time it is drawn, or at once if not rendering.
+        """
 
-            self.generate_legal_moves()
+        if self.render:
+            self.messages.append(text)
         else:
-            print(f"Move '{move}' is not legal\n")
-            playsound("sounds/failed_move.mp3")
+            self.show(text)
+
+    def engine_move(self):
+        """
+            Lets the engine search the current position within its time and node budget.
+
+            Returns move in chess notation, "q" if the side to move has no legal moves
+        """
+
+        position = Bitboard.from_chess(self)
+
+        if self.book is not None:
+            book_move = self.book.choose(position)
+            if book_move is not None:
+                move = position.san(book_move)
+                self.engine_info = f"Engine: {move} (book)"
+                return move
+
+        best_move = self.engine.search(position, max_time=self.engine_time, max_nodes=self.engine_nodes)
+
+        if best_move is None:
+            self.show("Checkmate" if position.in_check() else "Stalemate")
+            return "q"
+
+        from search import format_score
+        move = position.san(best_move)
+        self.engine_info = f"Engine: {move} (depth {self.engine.depth}, score {format_score(self.engine.score)}, " \
+                           f"{self.engine.nodes} nodes, {self.engine.nodes_per_second()} nodes/second, {self.engine.elapsed:.2f}s)"
+
+        return move
 
-        # repeat
-        self.game_loop()
-        
     def move(self, move):
         """
             Performs the move given as argument. 
@@ -143,15 +318,18 @@ class Chess:
 
             Returns True if move was successful, False if not.
         """
-        # checkmate
-        if "#" in move:
-            #TODO
-            pass
+        # check and checkmate suffixes are not needed to find the move
+        move = move.rstrip("+#")
 
-        # check
-        if "+" in move:
-            #TODO
-            pass
+        # legal moves of the position are looked up by notation
+        if self.san_index is not None:
+            encoded_move = self.position.resolve_san(move, self.san_index)
+            if encoded_move is None:
+                return False
+
+            self.make_encoded_move(encoded_move)
+            self.tracker.make_move(encoded_move)
+            return True
 
         # castling
         if "O-" in move:
@@ -166,6 +344,35 @@ class Chess:
 
         return False
 
+    def make_encoded_move(self, move):
+        """
+            Performs a legal move encoded by the bitboard move generator on the board of pieces.
+        """
+
+        from_pos = divmod(move & 63, 8)
+        pos_to_move = divmod((move >> 6) & 63, 8)
+        flag = move >> 12
+
+        if flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            self.castle("O-O" if flag == KING_CASTLE else "O-O-O", validate=False)
+            return
+
+        piece_to_move = self.board[from_pos]
+
+        # the pawn captured en passant is beside the capturing pawn
+        captured_pos = (from_pos[0], pos_to_move[1]) if flag == EN_PASSANT else pos_to_move
+        captured_piece = self.board[captured_pos]
+        if captured_piece is not None:
+            self.pieces[captured_piece.color].remove(captured_piece)
+            if flag == EN_PASSANT:
+                self.board[captured_pos] = None
+
+        self.move_piece_and_update_pos(piece_to_move, pos_to_move)
+
+        if flag & PROMOTION:
+            piece_to_move.piece_type = PROMOTION_PIECES[self.side_to_move][flag & 3]
+            piece_to_move.update_piece_symbol()
+
     def chess_notation_to_indices(self, notation):
         """
             Maps position in chess notation to board indices.
@@ -201,6 +408,11 @@ class Chess:
         # pawn move
         if (len(move) == 2) or ("=" in move) or (move[0].islower()):
 
+            # promotion piece must be given after "=", e.g. e8=Q
+            promotion = move.split("=")[1] if "=" in move else None
+            if (promotion is not None) and (promotion.upper() not in ("N", "B", "R", "Q")):
+                return False
+
             # find pawn to move
             piece_to_move = self.find_pawn_to_move(move, pos_to_move)
 
@@ -212,8 +424,8 @@ class Chess:
             self.move_piece_and_update_pos(piece_to_move, pos_to_move)
 
             # check special case of promotion
-            if "=" in move:
-                piece_to_move.piece_type = move[3]
+            if promotion is not None:
+                piece_to_move.piece_type = promotion.upper() if self.side_to_move == "w" else promotion.lower()
                 piece_to_move.update_piece_symbol()
 
             return True
@@ -245,6 +457,10 @@ class Chess:
         move_square = re.findall("([a-h][1-8])", move)[0]
         pos_to_move = self.chess_notation_to_indices(move_square)
 
+        # en passant, pawn captures onto the empty square behind a pawn that just double pushed
+        if (self.board[pos_to_move] is None) and move[0].islower() and (move_square == self.en_passant_target_square):
+            return self.en_passant_move(move, pos_to_move)
+
         # check if there a piece to capture
         if self.board[pos_to_move] is None:
             return False
@@ -262,6 +478,27 @@ class Chess:
 
         return False
 
+    def en_passant_move(self, move, pos_to_move):
+        """
+            Performs en passant capture and removes the captured pawn, which is beside the capturing pawn.
+
+            Returns True if capture was successful, False if not.
+        """
+
+        piece_to_move = self.find_pawn_to_move(move, pos_to_move)
+        if (piece_to_move is None) or (piece_to_move.piece_type.upper() != "P") or (piece_to_move.color != self.side_to_move) \
+                or (abs(piece_to_move.pos[1] - pos_to_move[1]) != 1):
+            return False
+
+        captured_pos = (piece_to_move.pos[0], pos_to_move[1])
+        captured_piece = self.board[captured_pos]
+        self.board[captured_pos] = None
+        self.pieces[captured_piece.color].remove(captured_piece)
+
+        self.move_piece_and_update_pos(piece_to_move, pos_to_move)
+
+        return True
+
     def find_pawn_to_move(self, move, pos_to_move):
         """
             Finds correct pawn to move. Faster to directly access via logic rather than iterating over all pieces.
@@ -315,7 +552,7 @@ class Chess:
         if ((len(move) == 4) and ("x" not in move)) or ((len(move) == 5) and ("x" in move)):
             # is in same file
             if move[1].isdigit():
-                rank_idx = int(move[1])
+                rank_idx = 8 - int(move[1])
             # can move to same square
             else: 
                 file_idx = FILE_TO_NUM[move[1]]
@@ -346,6 +583,10 @@ class Chess:
             Moves piece to square and updates the position of the piece.
         """
 
+        from_pos = piece_to_move.pos
+        is_capture = self.board[pos_to_move] is not None
+        is_pawn = piece_to_move.piece_type.upper() == "P"
+
         # move pawn
         self.board[pos_to_move] = piece_to_move
         self.board[piece_to_move.pos] = None
@@ -353,10 +594,37 @@ class Chess:
         # update pos
         piece_to_move.pos = pos_to_move
 
-    def castle(self, move):
+        # pawn has left its initial rank and can no longer double push
+        piece_to_move.initial_rank = False
+
+        self.update_castling_ability(from_pos)
+        self.update_castling_ability(pos_to_move)
+
+        # en passant target square is behind a pawn that double pushed
+        if is_pawn and abs(pos_to_move[0] - from_pos[0]) == 2:
+            self.en_passant_target_square = self.indices_to_chess_notation(((pos_to_move[0] + from_pos[0]) // 2, pos_to_move[1]))
+        else:
+            self.en_passant_target_square = "-"
+
+        # half move clock is reset by captures and pawn moves
+        if is_pawn or is_capture:
+            self.halfmove_clock = "0"
+        else:
+            self.halfmove_clock = str(int(self.halfmove_clock) + 1)
+
+    def update_castling_ability(self, pos):
+        """
+            Removes castling ability when the king or a rook leaves its initial square, or a rook is captured there.
+        """
+
+        if pos in CASTLING_SQUARES:
+            lost = CASTLING_SQUARES[pos]
+            self.castling_ability = "".join(ch for ch in self.castling_ability if ch not in lost and ch != "-") or "-"
+
+    def castle(self, move, validate=True):
         """
             Performs castling move, either kingside or queenside. 
-            Checks if castling is allowed, performs move, and updates castling_ability.
+            Checks if castling is allowed unless validate is False, performs move, and updates castling_ability.
 
             Returns True if successful, False if not.
         """
@@ -367,7 +635,7 @@ class Chess:
             rank = 7 if castling_notation.isupper() else 0
 
             # check if castling is possible
-            if self.castling_is_legal(move, castling_notation, rank):
+            if (not validate) or self.castling_is_legal(move, castling_notation, rank):
 
                 # get pieces
                 king = self.board[rank][4]
@@ -392,7 +660,7 @@ class Chess:
             rank = 7 if castling_notation.isupper() else 0
 
             # check if castling is possible
-            if self.castling_is_legal(move, castling_notation, rank):
+            if (not validate) or self.castling_is_legal(move, castling_notation, rank):
 
                 # get pieces
                 king = self.board[rank][4]
@@ -413,9 +681,12 @@ class Chess:
 
         # remove white or black castling ability
         if castling_notation.isupper():
-            self.castling_ability = ''.join(ch for ch in self.castling_ability if not ch.isupper())
+            self.castling_ability = ''.join(ch for ch in self.castling_ability if not ch.isupper()) or "-"
         else:
-            self.castling_ability = ''.join(ch for ch in self.castling_ability if not ch.islower())
+            self.castling_ability = ''.join(ch for ch in self.castling_ability if not ch.islower()) or "-"
+
+        self.en_passant_target_square = "-"
+        self.halfmove_clock = str(int(self.halfmove_clock) + 1)
     
 
         return True
@@ -455,41 +726,52 @@ class Chess:
 
     def castle_threatened(self, move, rank):
         """
-            Checks if squares between king and rook is threatened by any of the opponent's pieces.
+            Checks if the king is in check or passes a square threatened by any of the opponent's pieces.
 
             Return True if any sqaure is threatened, False if not.
         """
-        
-        pieces = self.pieces["b"] if self.side_to_move == "w" else self.pieces["w"]
 
-        if move == "O-O":
-            f_square = self.indices_to_chess_notation((rank,5))
-            g_square = self.indices_to_chess_notation((rank,6))
-            for piece in pieces:
-                if (f_square in piece.legal_moves) or (g_square in piece.legal_moves):
-                    return True
+        opponent = "b" if self.side_to_move == "w" else "w"
+        flag = KING_CASTLE if move == "O-O" else QUEEN_CASTLE
+        passing = CASTLING[flag][self.side_to_move][6]
 
-        elif move == "O-O-O":
-            b_square = self.indices_to_chess_notation((rank,1))
-            c_square = self.indices_to_chess_notation((rank,2))
-            d_square = self.indices_to_chess_notation((rank,3))
-            for piece in pieces:
-                if (b_square in piece.legal_moves) or (c_square in piece.legal_moves) or (d_square in piece.legal_moves):
-                    return True
+        return bool(self.attacks[opponent] & passing)
 
-        return False
+    def perft_sequence(self, command):
+        """
+            Runs perft from the current position and prints nodes, time and nodes/second.
+        """
+
+        args = command.split()[1:]
+        show_divide = "divide" in args
+        depths = [int(arg) for arg in args if arg.isdigit()]
+        depth = depths[0] if depths else 3
+
+        from perft import print_perft
+        text = io.StringIO()
+        with redirect_stdout(text):
+            print_perft(Bitboard.from_chess(self), depth, show_divide)
+        self.message(text.getvalue())
 
     def quit_sequence(self):
         """
-            Quit sequence. Prints the FEN-string and exits.
+            Quit sequence. Prints the FEN-string, the game loop ends after it.
         """
 
         self.print_FEN()
-        exit(0)
 
     def print_FEN(self):
         """
-            Parses board, builds FEN-string and prints it.
+            Prints the FEN-string of the current position.
+        """
+
+        self.show("FEN: " + self.fen())
+
+    def fen(self):
+        """
+            Parses board and builds FEN-string.
+
+            Returns FEN-string
         """
 
         fen = ""
@@ -515,7 +797,46 @@ class Chess:
         fen += self.side_to_move + " " + self.castling_ability + " " + self.en_passant_target_square + " " \
                 + self.halfmove_clock + " " + self.fullmove_counter
 
-        print("FEN: " + fen)
+        return fen
+
+
+PROFILER.register("Chess.generate_legal_moves", Chess, "generate_legal_moves")
+PROFILER.register("Chess.move", Chess, "move")
+PROFILER.register("Chess.make_encoded_move", Chess, "make_encoded_move")
 
 if __name__ == "__main__":
-    a = Chess()
+    parser = argparse.ArgumentParser(description="Chess in the terminal.")
+    parser.add_argument("--uci", action="store_true", help="speak the UCI protocol over stdin and stdout, for chess GUIs")
+    parser.add_argument("--fen", default=None, help="start from FEN-string instead of the starting position")
+    parser.add_argument("--engine", default="", choices=["", "w", "b", "wb"], help="side(s) played by the engine")
+    parser.add_argument("--time", type=float, default=1.0, help="engine time per move in seconds")
+    parser.add_argument("--nodes", type=int, default=None, help="engine node budget per move")
+    parser.add_argument("--book", default=None, help="opening book played by the engine, built with book.py")
+    parser.add_argument("--tablebase", default=None, help="tablebase file, generated with tablebase.py")
+    parser.add_argument("--script", default=None, help="file of moves to play, separated by whitespace, instead of typing them")
+    parser.add_argument("--no-render", action="store_true", help="do not draw the board")
+    parser.add_argument("--no-sound", action="store_true", help="do not play sounds")
+    parser.add_argument("--profile", action="store_true", help="time move generation, parsing, rendering and sound, shown on exit")
+    parser.add_argument("--full-redraw", action="store_true", help="redraw the whole board every move instead of changed squares")
+    args = parser.parse_args()
+
+    if args.profile:
+        PROFILER.enable()
+
+    try:
+        if args.uci:
+            from uci import UCIEngine
+            UCIEngine(book=args.book, tablebase=args.tablebase).run()
+        else:
+            input_source = None
+            if args.script is not None:
+                with open(args.script) as f:
+                    input_source = ScriptedInput(f.read().split())
+
+            a = Chess(args.fen, engine=args.engine, engine_time=args.time, engine_nodes=args.nodes,
+                      input_source=input_source, render=not args.no_render, sound=not args.no_sound,
+                      full_redraw=args.full_redraw, book=args.book, tablebase=args.tablebase)
+    finally:
+        # however the program ends, quit, end of script, end of input or interrupt
+        if args.profile:
+            print(PROFILER.summary(), file=sys.stderr if args.uci else sys.stdout)
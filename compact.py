@@ -0,0 +1,194 @@
+import sys
+import argparse
+import random
+import tracemalloc
+from bitboard import Bitboard, STARTING_FEN, CASTLING_BITS, SQUARE_NAMES
+from zobrist import compute_hash
+
+# signed piece codes, positive for white and negative for black, 0 is an empty square
+PIECE_CODES = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6, "p": -1, "n": -2, "b": -3, "r": -4, "q": -5, "k": -6}
+
+# piece letter of every code as stored in a byte, index 0 is an empty square
+CODE_PIECES = [None] * 256
+for piece_type, code in PIECE_CODES.items():
+    CODE_PIECES[code & 0xFF] = piece_type
+
+# en passant square stored when there is none
+NO_SQUARE = 64
+
+
+class CompactPosition:
+    """
+        Position stored in as little memory as possible, for holding many positions at once.
+        The board is 64 bytes of int8 piece codes, a8 first, and the game state is small integers.
+    """
+
+    __slots__ = ("board", "side_to_move", "castling", "en_passant_square", "halfmove_clock", "fullmove_counter")
+
+    def __init__(self, board, side_to_move="w", castling=0, en_passant_square=NO_SQUARE, halfmove_clock=0, fullmove_counter=1):
+        self.board = board
+        self.side_to_move = side_to_move
+        self.castling = castling
+        self.en_passant_square = en_passant_square
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_counter = fullmove_counter
+
+    @classmethod
+    def from_bitboard(cls, position):
+        """
+            Returns CompactPosition object of a Bitboard object
+        """
+
+        board = bytes(0 if piece is None else PIECE_CODES[piece] & 0xFF for piece in position.squares)
+        en_passant_square = NO_SQUARE if position.en_passant_square is None else position.en_passant_square
+        return cls(board, position.side_to_move, position.castling, en_passant_square,
+                   position.halfmove_clock, position.fullmove_counter)
+
+    @classmethod
+    def from_chess(cls, chess):
+        """
+            Returns CompactPosition object of the current position of a Chess object
+        """
+
+        board = bytes(0 if chess.board[i][j] is None else PIECE_CODES[chess.board[i][j].piece_type] & 0xFF
+                      for i in range(8) for j in range(8))
+        castling = sum(CASTLING_BITS[ch] for ch in chess.castling_ability if ch in CASTLING_BITS)
+        en_passant_square = NO_SQUARE if chess.en_passant_target_square == "-" \
+            else SQUARE_NAMES.index(chess.en_passant_target_square)
+        return cls(board, chess.side_to_move, castling, en_passant_square,
+                   int(chess.halfmove_clock), int(chess.fullmove_counter))
+
+    @classmethod
+    def from_fen(cls, FEN):
+        """
+            Returns CompactPosition object of FEN-string
+        """
+
+        return cls.from_bitboard(Bitboard(FEN))
+
+    def to_bitboard(self):
+        """
+            Returns Bitboard object of the position, for generating moves or searching
+        """
+
+        position = Bitboard()
+        for square, code in enumerate(self.board):
+            if code:
+                piece_type = CODE_PIECES[code]
+                position.bitboards[piece_type] |= 1 << square
+                position.occupancy["b" if piece_type.islower() else "w"] |= 1 << square
+                position.squares[square] = piece_type
+
+        position.side_to_move = self.side_to_move
+        position.castling = self.castling
+        position.en_passant_square = None if self.en_passant_square == NO_SQUARE else self.en_passant_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_counter = self.fullmove_counter
+        position.hash = compute_hash(position)
+
+        return position
+
+    def fen(self):
+        """
+            Returns FEN-string of the position
+        """
+
+        return self.to_bitboard().fen()
+
+    def array(self):
+        """
+            Returns the board as an 8x8 NumPy int8 array, sharing memory with the board bytes
+        """
+
+        # imported here, NumPy is only needed for arrays and takes longer to import than the rest of the program
+        import numpy as np
+
+        return np.frombuffer(self.board, dtype=np.int8).reshape(8, 8)
+
+    def key(self):
+        """
+            Returns tuple of all fields, equal for equal positions
+        """
+
+        return (self.board, self.side_to_move, self.castling, self.en_passant_square, self.halfmove_clock, self.fullmove_counter)
+
+    def __eq__(self, other):
+        return isinstance(other, CompactPosition) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"CompactPosition('{self.fen()}')"
+
+
+def random_fens(count, seed=0, max_plies=80):
+    """
+        Plays random legal moves from the starting position.
+
+        Returns list of count FEN-strings
+    """
+
+    rng = random.Random(seed)
+    fens = []
+    position = Bitboard(STARTING_FEN)
+    while len(fens) < count:
+        moves = position.generate_legal_moves()
+        if not moves or len(position.history) >= max_plies:
+            position = Bitboard(STARTING_FEN)
+            continue
+        position.make_move(rng.choice(moves))
+        fens.append(position.fen())
+
+    return fens
+
+
+def measure(build, fens):
+    """
+        Builds an object for every FEN-string and measures memory allocated while all of them are held.
+
+        Returns bytes per position
+    """
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build(fen) for fen in fens]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the list holding them is not part of a position
+    return (after - before - sys.getsizeof(objects)) / len(objects)
+
+
+def run_benchmark(count=2000):
+    """
+        Prints bytes per position held as a Chess object, a Bitboard object and a CompactPosition object.
+    """
+
+    # imported here, chess pulls in the terminal game
+    from chess import Chess
+    from game_io import ScriptedInput, NullOutput
+
+    def build_chess(fen):
+        chess = Chess(fen, input_source=ScriptedInput([]), output=NullOutput(), render=False, sound=False)
+        # the game and its helpers are not part of the position
+        chess.audio = chess.input_source = chess.output = None
+        return chess
+
+    fens = random_fens(count)
+    results = [
+        ("Chess", measure(build_chess, fens)),
+        ("Bitboard", measure(Bitboard, fens)),
+        ("CompactPosition", measure(CompactPosition.from_fen, fens)),
+    ]
+
+    for name, size in results:
+        print(f"{name:16} {size:8.0f} bytes/position")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure memory per position of each position representation.")
+    parser.add_argument("--positions", type=int, default=2000, help="number of positions to hold")
+    args = parser.parse_args()
+
+    run_benchmark(args.positions)
@@ -0,0 +1,226 @@
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+from bitboard import Bitboard, STARTING_FEN, SQUARE_NAMES, move_to_uci
+from renderer import format_board, square_symbols
+
+# moves in from-to notation, e.g. "e2e4" or "e7e8q"
+UCI_MOVE = re.compile(r"^[a-h][1-8][a-h][1-8][nbrq]?$")
+
+# commands timed by measure_startup, run from the directory of this module
+STARTUP_COMMANDS = [
+    ("python", ["-c", "pass"]),
+    ("import game", ["-c", "import game"]),
+    ("import chess", ["-c", "import chess"]),
+    ("one-shot game.py", ["game.py", "e4", "e5", "Nf3", "Nc6", "Bb5"]),
+]
+
+
+class Game:
+    """
+        Game of chess for use from other programs and tests, without a board to draw, sounds or a terminal to read from.
+        Holds a position and the moves made, moves are made in chess notation or from-to notation and taken back with pop.
+        The position is a Bitboard, available as game.position for everything else.
+    """
+
+    def __init__(self, fen=STARTING_FEN):
+        self.position = None
+        # moves made, in chess notation with check and checkmate suffixes
+        self.moves = []
+        self.set_fen(fen)
+
+    def __repr__(self):
+        """
+            Generates string representation of board.
+        """
+
+        return format_board(square_symbols(self.position.squares))
+
+    def set_fen(self, fen):
+        """
+            Sets up the position of a FEN-string and clears the moves made.
+            Raises ValueError if the FEN-string is invalid or the position cannot occur in a game.
+        """
+
+        position = Bitboard(fen)
+        position.validate()
+        self.position = position
+        self.moves = []
+
+    def fen(self):
+        """
+            Returns FEN-string of the current position
+        """
+
+        return self.position.fen()
+
+    def side_to_move(self):
+        """
+            Returns "w" or "b"
+        """
+
+        return self.position.side_to_move
+
+    def piece_at(self, square):
+        """
+            Finds the piece on a square in chess notation, e.g. "e4".
+
+            Returns piece letter as in FEN-strings, None for an empty square
+        """
+
+        return self.position.squares[SQUARE_NAMES.index(square)]
+
+    def legal_moves(self):
+        """
+            Returns list of legal moves in chess notation, with check and checkmate suffixes
+        """
+
+        position = self.position
+        return [position.san(move) for move in position.generate_legal_moves()]
+
+    def legal_moves_uci(self):
+        """
+            Returns list of legal moves in from-to notation
+        """
+
+        return [move_to_uci(move) for move in self.position.generate_legal_moves()]
+
+    def parse_move(self, notation):
+        """
+            Finds legal move in chess notation, e.g. "Nf3" or "exd8=Q+", or in from-to notation, e.g. "e2e4" or "e7e8q".
+            Raises ValueError if the move is not legal.
+
+            Returns encoded move
+        """
+
+        if UCI_MOVE.match(notation):
+            for move in self.position.generate_legal_moves():
+                if move_to_uci(move) == notation:
+                    return move
+            raise ValueError(f"illegal move '{notation}'")
+
+        return self.position.parse_san(notation)
+
+    def push(self, notation):
+        """
+            Makes a legal move in chess notation or from-to notation. Raises ValueError if the move is not legal.
+
+            Returns the move in chess notation
+        """
+
+        move = self.parse_move(notation)
+        san = self.position.san(move)
+        self.position.make_move(move)
+        self.moves.append(san)
+
+        return san
+
+    def pop(self):
+        """
+            Takes back the last move made. Raises IndexError if no moves were made.
+
+            Returns the move taken back in chess notation
+        """
+
+        if not self.moves:
+            raise IndexError("no moves to take back")
+        self.position.unmake_move()
+
+        return self.moves.pop()
+
+    def is_check(self):
+        """
+            Returns True if the side to move is in check, False if not
+        """
+
+        return self.position.in_check()
+
+    def is_checkmate(self):
+        """
+            Returns True if the side to move is checkmated, False if not
+        """
+
+        return self.position.in_check() and not self.position.generate_legal_moves()
+
+    def is_stalemate(self):
+        """
+            Returns True if the side to move has no legal moves and is not in check, False if not
+        """
+
+        return not self.position.in_check() and not self.position.generate_legal_moves()
+
+    def status(self):
+        """
+            Returns "", "check", "checkmate", "stalemate" or "fifty-move rule"
+        """
+
+        position = self.position
+        in_check = position.in_check()
+        if not position.generate_legal_moves():
+            return "checkmate" if in_check else "stalemate"
+        if position.halfmove_clock >= 100:
+            return "fifty-move rule"
+
+        return "check" if in_check else ""
+
+    def result(self):
+        """
+            Returns "1-0", "0-1" or "1/2-1/2" once the game is over, None while it goes on
+        """
+
+        status = self.status()
+        if status == "checkmate":
+            return "0-1" if self.position.side_to_move == "w" else "1-0"
+        if status in ("stalemate", "fifty-move rule"):
+            return "1/2-1/2"
+
+        return None
+
+
+def measure_startup(runs=10):
+    """
+        Times starting a new Python process for each of STARTUP_COMMANDS, from process start to exit,
+        and prints the fastest and median of the runs in milliseconds.
+
+        Returns dict {command name: (fastest, median) seconds}
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    timings = {}
+    for name, arguments in STARTUP_COMMANDS:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + arguments, cwd=directory, stdout=subprocess.DEVNULL, check=True)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        timings[name] = (times[0], times[len(times) // 2])
+        print(f"{name:20} fastest {times[0] * 1000:6.1f}ms, median {times[len(times) // 2] * 1000:6.1f}ms")
+
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play moves from a position and print the resulting FEN-string and legal moves.")
+    parser.add_argument("moves", nargs="*", help="moves in chess notation or from-to notation")
+    parser.add_argument("--fen", default=STARTING_FEN, help="start from FEN-string instead of the starting position")
+    parser.add_argument("--startup", type=int, default=0, metavar="RUNS",
+                        help="time process startup of the library and the command line instead, over this many runs")
+    args = parser.parse_args()
+
+    if args.startup:
+        measure_startup(args.startup)
+    else:
+        try:
+            game = Game(args.fen)
+            for notation in args.moves:
+                game.push(notation)
+        except ValueError as error:
+            sys.exit(f"error: {error}")
+
+        print(game.fen())
+        print(game.status() or "-")
+        print(" ".join(game.legal_moves()))
@@ -0,0 +1,97 @@
+import sys
+
+
+class ConsoleInput:
+    """
+        Reads moves typed by the player.
+    """
+
+    def __init__(self, prompt=":"):
+        self.prompt = prompt
+
+    def read_move(self):
+        """
+            Returns next line typed by the player, None at end of input
+        """
+
+        try:
+            return input(self.prompt)
+        except EOFError:
+            return None
+
+
+class ScriptedInput:
+    """
+        Reads moves from a list, or any iterable of moves in chess notation.
+    """
+
+    def __init__(self, moves):
+        self.moves = iter(moves)
+
+    def read_move(self):
+        """
+            Returns next move of the script, None when there are no more moves
+        """
+
+        return next(self.moves, None)
+
+
+class SocketInput:
+    """
+        Reads moves from a connected socket, one move per line.
+    """
+
+    def __init__(self, connection):
+        self.file = connection.makefile("r", encoding="utf-8", newline="\n")
+
+    def read_move(self):
+        """
+            Returns next line received without the line ending, None when the connection is closed
+        """
+
+        line = self.file.readline()
+        if not line:
+            return None
+        return line.rstrip("\r\n")
+
+
+class ConsoleOutput:
+    """
+        Writes to the terminal.
+    """
+
+    def write(self, text):
+        sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def isatty(self):
+        return sys.stdout.isatty()
+
+
+class NullOutput:
+    """
+        Discards everything written, for running games without any output.
+    """
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+class SocketOutput:
+    """
+        Writes to a connected socket.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def write(self, text):
+        self.connection.sendall(text.encode("utf-8"))
+
+    def flush(self):
+        pass
@@ -0,0 +1,318 @@
+import time
+import random
+import argparse
+from attacks import FULL, BETWEEN, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, PAWN_PUSHES, \
+    rook_attacks, bishop_attacks, queen_attacks
+from bitboard import Bitboard, STARTING_FEN, PAWN_START_RANK, CASTLING, iterate_bits, \
+    DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE, EN_PASSANT, PROMOTION
+from profiler import PROFILER
+
+SLIDERS = frozenset("BRQbrq")
+
+
+def piece_attacks(piece_type, square, occupied):
+    """
+        Returns bitboard of squares attacked by piece_type on square, with sliders blocked by the occupied squares
+    """
+
+    kind = piece_type.upper()
+    if kind == "P":
+        return PAWN_ATTACKS["w" if piece_type == "P" else "b"][square]
+    if kind == "N":
+        return KNIGHT_ATTACKS[square]
+    if kind == "K":
+        return KING_ATTACKS[square]
+    if kind == "B":
+        return bishop_attacks(square, occupied)
+    if kind == "R":
+        return rook_attacks(square, occupied)
+    return queen_attacks(square, occupied)
+
+
+class MoveTracker:
+    """
+        Keeps a position and the squares attacked by every piece of both sides from one move to the next.
+        After a move only the pieces it can affect are marked dirty and recomputed: the pieces on the squares
+        the move changed, and the sliders whose rays reach one of the squares that became empty or occupied.
+        Pawn, knight and king attacks only change when the piece itself moves.
+        Legal moves of the side to move are built from the kept attacks.
+    """
+
+    def __init__(self, position):
+        self.position = position
+        occupied = position.occupancy["w"] | position.occupancy["b"]
+
+        # attacked squares of the piece on every square, 0 for empty squares
+        self.attacks = [0 if piece_type is None else piece_attacks(piece_type, square, occupied)
+                        for square, piece_type in enumerate(position.squares)]
+
+        # pieces recomputed since the tracker was made, for measuring
+        self.recomputed = 0
+
+    def make_move(self, move):
+        """
+            Makes a legal encoded move and recomputes the attacks of the dirty pieces. The tracker only moves forward,
+            its attacks do not follow unmake_move, but the history of the position is kept for finding repetitions.
+        """
+
+        position = self.position
+        occupied_before = position.occupancy["w"] | position.occupancy["b"]
+        position.make_move(move)
+
+        squares = position.squares
+        occupied = position.occupancy["w"] | position.occupancy["b"]
+        attacks = self.attacks
+
+        # squares that became empty or occupied, and the destination, where a capture or promotion replaces the piece
+        changed = occupied_before ^ occupied
+        dirty = changed | (1 << ((move >> 6) & 63))
+
+        bitboards = position.bitboards
+        sliders = bitboards["B"] | bitboards["R"] | bitboards["Q"] | bitboards["b"] | bitboards["r"] | bitboards["q"]
+        for square in iterate_bits(sliders & ~dirty):
+            if attacks[square] & changed:
+                dirty |= 1 << square
+
+        for square in iterate_bits(dirty):
+            piece_type = squares[square]
+            attacks[square] = 0 if piece_type is None else piece_attacks(piece_type, square, occupied)
+            self.recomputed += 1
+
+    def attack_map(self, color):
+        """
+            Returns bitboard of squares attacked by the pieces of color
+        """
+
+        attacks = self.attacks
+        attack_map = 0
+        for square in iterate_bits(self.position.occupancy[color]):
+            attack_map |= attacks[square]
+        return attack_map
+
+    def generate_legal_moves(self):
+        """
+            Generates the legal moves of the side to move like Bitboard.generate_legal_moves, with checks, pins and
+            squares the king may not move to found from the kept attacks.
+
+            Returns list of encoded moves
+        """
+
+        position = self.position
+        squares = position.squares
+        bitboards = position.bitboards
+        attacks = self.attacks
+
+        color = position.side_to_move
+        opponent_color = "b" if color == "w" else "w"
+        own = position.occupancy[color]
+        opponent = position.occupancy[opponent_color]
+        occupied = own | opponent
+        empty = FULL ^ occupied
+        moves = []
+        append = moves.append
+
+        king_bitboard = bitboards["K" if color == "w" else "k"]
+        if king_bitboard & (king_bitboard - 1) or not king_bitboard:
+            return position.generate_legal_moves()
+        king_square = king_bitboard.bit_length() - 1
+
+        # squares the king may not move to, sliders giving check also attack the squares behind the king
+        danger = 0
+        checkers = 0
+        for square in iterate_bits(opponent):
+            square_attacks = attacks[square]
+            if square_attacks >> king_square & 1:
+                checkers |= 1 << square
+                if squares[square] in SLIDERS:
+                    square_attacks = piece_attacks(squares[square], square, occupied ^ king_bitboard)
+            danger |= square_attacks
+
+        for target in iterate_bits(KING_ATTACKS[king_square] & ~own & ~danger):
+            append(king_square | (target << 6))
+
+        if checkers & (checkers - 1):
+            return moves
+
+        if checkers:
+            check_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+
+        if color == "w":
+            diagonal_sliders = bitboards["b"] | bitboards["q"]
+            linear_sliders = bitboards["r"] | bitboards["q"]
+            pawn, knight, promotion_rank = "P", "N", 0xFF
+        else:
+            diagonal_sliders = bitboards["B"] | bitboards["Q"]
+            linear_sliders = bitboards["R"] | bitboards["Q"]
+            pawn, knight, promotion_rank = "p", "n", 0xFF << 56
+
+        pinned = 0
+        pin_rays = {}
+        snipers = (bishop_attacks(king_square, opponent) & diagonal_sliders) \
+            | (rook_attacks(king_square, opponent) & linear_sliders)
+        for sniper in iterate_bits(snipers):
+            between = BETWEEN[king_square][sniper]
+            blockers = between & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+                pin_rays[blockers.bit_length() - 1] = between | (1 << sniper)
+
+        not_own = (FULL ^ own) & check_mask
+        pawn_pushes = PAWN_PUSHES[color]
+        start_rank = PAWN_START_RANK[color]
+        en_passant = 0 if position.en_passant_square is None else 1 << position.en_passant_square
+
+        for square in iterate_bits(own ^ king_bitboard):
+            piece_type = squares[square]
+            pinned_here = pinned >> square & 1
+
+            if piece_type == pawn:
+                allowed = check_mask
+                if pinned_here:
+                    allowed &= pin_rays[square]
+
+                targets = attacks[square] & opponent
+                single = pawn_pushes[square] & empty
+                if single:
+                    targets |= single
+                    if (1 << square) & start_rank:
+                        double = pawn_pushes[single.bit_length() - 1] & empty & allowed
+                        if double:
+                            append(square | ((double.bit_length() - 1) << 6) | (DOUBLE_PUSH << 12))
+                targets &= allowed
+
+                if targets & promotion_rank:
+                    for target in iterate_bits(targets):
+                        for flag in (PROMOTION | 3, PROMOTION | 2, PROMOTION | 1, PROMOTION):
+                            append(square | (target << 6) | (flag << 12))
+                else:
+                    for target in iterate_bits(targets):
+                        append(square | (target << 6))
+
+                if attacks[square] & en_passant:
+                    move = square | (position.en_passant_square << 6) | (EN_PASSANT << 12)
+                    if position.is_legal(move):
+                        append(move)
+                continue
+
+            if piece_type == knight:
+                # pinned knights can never move along the pin
+                if pinned_here:
+                    continue
+                targets = attacks[square] & not_own
+            else:
+                targets = attacks[square] & not_own
+                if pinned_here:
+                    targets &= pin_rays[square]
+
+            for target in iterate_bits(targets):
+                append(square | (target << 6))
+
+        if position.castling and not checkers:
+            rook = "R" if color == "w" else "r"
+            for flag in (KING_CASTLE, QUEEN_CASTLE):
+                rights, king_from, king_to, rook_from, _, between, passing = CASTLING[flag][color]
+                if (position.castling & rights) and not (occupied & between) and king_square == king_from \
+                        and squares[rook_from] == rook:
+                    if not danger & passing:
+                        append(king_from | (king_to << 6) | (flag << 12))
+
+        return moves
+
+
+def compare_with_full_generation(games=200, max_plies=200, seed=0):
+    """
+        Plays random games with a tracker and checks after every move that its attacks and legal moves
+        equal those computed from scratch for the same position.
+
+        Returns number of positions compared
+    """
+
+    rng = random.Random(seed)
+    compared = 0
+    for _ in range(games):
+        tracker = MoveTracker(Bitboard(STARTING_FEN))
+        for _ in range(max_plies):
+            position = tracker.position
+            fresh = Bitboard(position.fen())
+            fresh_occupied = fresh.occupancy["w"] | fresh.occupancy["b"]
+            for square, piece_type in enumerate(fresh.squares):
+                expected = 0 if piece_type is None else piece_attacks(piece_type, square, fresh_occupied)
+                if tracker.attacks[square] != expected:
+                    raise AssertionError(f"attacks of square {square} differ in {position.fen()}")
+
+            moves = tracker.generate_legal_moves()
+            if sorted(moves) != sorted(fresh.generate_legal_moves()):
+                raise AssertionError(f"legal moves differ in {position.fen()}")
+            compared += 1
+
+            if not moves or position.halfmove_clock >= 100:
+                break
+            tracker.make_move(rng.choice(moves))
+
+    return compared
+
+
+def run_benchmark(games=20, max_plies=200, seed=0):
+    """
+        Replays random games and prints the time per move of regenerating the position and its legal moves
+        from scratch against keeping them with a tracker.
+    """
+
+    rng = random.Random(seed)
+    move_lists = []
+    for _ in range(games):
+        position = Bitboard(STARTING_FEN)
+        moves = []
+        while len(moves) < max_plies:
+            legal_moves = position.generate_legal_moves()
+            if not legal_moves or position.halfmove_clock >= 100:
+                break
+            moves.append(rng.choice(legal_moves))
+            position.make_move(moves[-1])
+        move_lists.append(moves)
+    plies = sum(len(moves) for moves in move_lists)
+
+    start = time.perf_counter()
+    for moves in move_lists:
+        position = Bitboard(STARTING_FEN)
+        for move in moves:
+            position.make_move(move)
+            # rebuild the position and both attack maps, then generate, as Chess did every move
+            fresh = Bitboard(position.fen())
+            fresh.attack_map("w")
+            fresh.attack_map("b")
+            fresh.generate_legal_moves()
+    full = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recomputed = 0
+    for moves in move_lists:
+        tracker = MoveTracker(Bitboard(STARTING_FEN))
+        for move in moves:
+            tracker.make_move(move)
+            tracker.attack_map("w")
+            tracker.attack_map("b")
+            tracker.generate_legal_moves()
+        recomputed += tracker.recomputed
+    incremental = time.perf_counter() - start
+
+    print(f"Plies: {plies}")
+    print(f"Full regeneration: {full / plies * 1e6:.1f}us/move")
+    print(f"Incremental: {incremental / plies * 1e6:.1f}us/move, {recomputed / plies:.1f} pieces recomputed/move")
+
+
+PROFILER.register("MoveTracker.make_move", MoveTracker, "make_move")
+PROFILER.register("MoveTracker.generate_legal_moves", MoveTracker, "generate_legal_moves")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark incremental legal move generation.")
+    parser.add_argument("--compare", type=int, default=0, metavar="GAMES",
+                        help="check against full generation over this many random games")
+    parser.add_argument("--games", type=int, default=20, help="random games replayed by the benchmark")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(f"{compare_with_full_generation(args.compare)} positions equal")
+    run_benchmark(args.games)
@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import resource
+import subprocess
+from bitboard import Bitboard, STARTING_FEN
+
+# connections opened at once, so the listen backlog is not overrun
+CONNECT_BATCH = 200
+
+
+def random_games(count, plies, seed=0):
+    """
+        Plays random legal games from the starting position, up to plies moves or until the game ends.
+
+        Returns list of games, each a list of moves in chess notation
+    """
+
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        position = Bitboard(STARTING_FEN)
+        moves = []
+        while len(moves) < plies:
+            legal_moves = position.generate_legal_moves()
+            if not legal_moves or position.halfmove_clock >= 99:
+                break
+            move = rng.choice(legal_moves)
+            moves.append(position.san(move))
+            position.make_move(move)
+        games.append(moves)
+
+    return games
+
+
+def server_memory(pid):
+    """
+        Returns resident memory of process pid in bytes, read from /proc
+    """
+
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def raise_file_limit(connections):
+    """
+        Raises the limit of open files of this process to fit the connections, as far as the hard limit allows.
+    """
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = connections + 64
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted if hard == resource.RLIM_INFINITY else min(wanted, hard), hard))
+
+
+class LoadTest:
+    """
+        Connects one client per game to a server, each creating a game and playing both sides of it.
+        All games are created before any move is sent, so every game is held by the server at once.
+    """
+
+    def __init__(self, host, port, games, send_fen=False):
+        self.host = host
+        self.port = port
+        self.games = games
+        self.send_fen = send_fen
+        self.latencies = []
+        self.errors = 0
+        self.connected = 0
+
+    async def connect(self, moves, connect_slots):
+        """
+            Connects a client and creates its game.
+
+            Returns (reader, writer, game id, moves)
+        """
+
+        async with connect_slots:
+            reader, writer = await asyncio.open_connection(self.host, self.port, limit=1 << 16)
+        if self.send_fen:
+            writer.write(b"mode fen\n")
+            await reader.readline()
+        writer.write(b"new wb\n")
+        reply = (await reader.readline()).split()
+        self.connected += 1
+        return reader, writer, int(reply[1]), moves
+
+    async def play(self, reader, writer, game_id, moves):
+        """
+            Sends the moves of a game one at a time, timing every reply.
+        """
+
+        for notation in moves:
+            start = time.perf_counter()
+            writer.write(f"move {game_id} {notation}\n".encode("utf-8"))
+            reply = await reader.readline()
+            self.latencies.append(time.perf_counter() - start)
+            if not reply.startswith(b"moved"):
+                self.errors += 1
+                break
+
+        writer.write(b"quit\n")
+        await writer.drain()
+        writer.close()
+
+    async def run(self, on_connected=None):
+        """
+            Connects all clients, then plays all games concurrently.
+
+            Returns seconds spent playing
+        """
+
+        connect_slots = asyncio.Semaphore(CONNECT_BATCH)
+        clients = await asyncio.gather(*(self.connect(moves, connect_slots) for moves in self.games))
+        if on_connected is not None:
+            on_connected()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(self.play(*client) for client in clients))
+        return time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    """
+        Returns value at fraction of the sorted values
+    """
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def run_load_test(games=1000, plies=40, send_fen=False, seed=0):
+    """
+        Starts server.py in a separate process, connects a client for every game and plays random games,
+        then prints the memory held by the server per game, move throughput and reply latency.
+        Clients run in this process, so on a single core they take part of the time measured.
+    """
+
+    raise_file_limit(games)
+    move_lists = random_games(games, plies, seed)
+
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"), "--port", "0"],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(server.stdout.readline().split()[-1])
+        idle_memory = server_memory(server.pid)
+
+        load_test = LoadTest("127.0.0.1", port, move_lists, send_fen)
+        memory = {}
+        elapsed = asyncio.run(load_test.run(lambda: memory.setdefault("held", server_memory(server.pid))))
+    finally:
+        server.terminate()
+        server.wait()
+
+    moves = len(load_test.latencies)
+    print(f"Games: {games} concurrent, {load_test.connected} connected")
+    print(f"Server memory: {(memory['held'] - idle_memory) / games:.0f} bytes/game, connection included")
+    print(f"Moves: {moves} in {elapsed:.2f}s, {int(moves / elapsed) if elapsed > 0 else 0} moves/second")
+    print(f"Latency: p50 {percentile(load_test.latencies, 0.5) * 1000:.1f}ms, "
+          f"p99 {percentile(load_test.latencies, 0.99) * 1000:.1f}ms")
+    print(f"Errors: {load_test.errors}")
+
+    return load_test
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test server.py with many concurrent games.")
+    parser.add_argument("--games", type=int, default=1000, help="concurrent games, one connection each")
+    parser.add_argument("--plies", type=int, default=40, help="moves played in every game")
+    parser.add_argument("--fen", action="store_true", help="receive FEN-strings instead of changed squares")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run_load_test(args.games, args.plies, args.fen, args.seed)
@@ -0,0 +1,194 @@
+import os
+import time
+import argparse
+from multiprocessing import Pool
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+from perft import perft
+from search import Search, MATE_SCORE, MATE_THRESHOLD, format_score
+from transposition import TranspositionTable
+
+
+def split_positions(position, split_depth):
+    """
+        Lists the positions after every sequence of split_depth legal moves from position, in move generation order.
+        Positions are sent to worker processes as FEN-strings.
+
+        Returns list of (list of encoded moves, FEN-string)
+    """
+
+    if split_depth == 0:
+        return [([], position.fen())]
+
+    positions = []
+    for move in position.generate_legal_moves():
+        position.make_move(move)
+        for moves, fen in split_positions(position, split_depth - 1):
+            positions.append(([move] + moves, fen))
+        position.unmake_move()
+
+    return positions
+
+
+def perft_task(arguments):
+    """
+        Counts leaf nodes below a FEN-string, run by the worker processes.
+
+        Returns number of leaf nodes
+    """
+
+    fen, depth, hash_mb = arguments
+    table = TranspositionTable(hash_mb) if hash_mb > 0 else None
+    return perft(Bitboard(fen), depth, table)
+
+
+def parallel_perft(position, depth, processes=None, split_depth=1, hash_mb=0):
+    """
+        Counts leaf nodes to depth by splitting the tree into the subtrees below split_depth plies,
+        counted in parallel by a pool of worker processes. Counts are merged in move generation order,
+        so the result does not depend on which worker finishes first.
+
+        Returns (number of leaf nodes, list of (root move in from-to notation, number of leaf nodes))
+    """
+
+    # the position itself is the only leaf, as in perft
+    if depth <= 0:
+        return 1, []
+
+    split_depth = max(1, min(split_depth, depth))
+    subtrees = split_positions(position, split_depth)
+    tasks = [(fen, depth - split_depth, hash_mb) for _, fen in subtrees]
+
+    with Pool(processes) as pool:
+        counts = pool.map(perft_task, tasks, chunksize=1)
+
+    divide = {}
+    for (moves, _), count in zip(subtrees, counts):
+        root_move = move_to_uci(moves[0])
+        divide[root_move] = divide.get(root_move, 0) + count
+
+    return sum(counts), list(divide.items())
+
+
+def analysis_task(arguments):
+    """
+        Searches the position after a root move to a fixed depth, run by the worker processes.
+
+        Returns (encoded move, score from the point of view of the side to move at the root, nodes searched)
+    """
+
+    fen, move, depth, hash_mb = arguments
+    position = Bitboard(fen)
+    position.make_move(move)
+
+    search = Search(hash_mb)
+    if search.search(position, max_depth=max(1, depth - 1)) is None:
+        # the move mates or stalemates
+        return move, MATE_SCORE - 1 if position.in_check() else 0, 1
+
+    score = -search.score
+    # mate distances are one ply longer seen from the root
+    if score >= MATE_THRESHOLD:
+        score -= 1
+    elif score <= -MATE_THRESHOLD:
+        score += 1
+
+    return move, score, search.nodes
+
+
+def parallel_analysis(position, depth, processes=None, hash_mb=16):
+    """
+        Scores every root move by searching the position after it to depth - 1 plies, one root move per task,
+        in parallel by a pool of worker processes. Equal scores keep move generation order.
+
+        Returns list of (encoded move, score, nodes searched), best move first
+    """
+
+    fen = position.fen()
+    tasks = [(fen, move, depth, hash_mb) for move in position.generate_legal_moves()]
+
+    if processes == 1:
+        results = [analysis_task(task) for task in tasks]
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(analysis_task, tasks, chunksize=1)
+
+    return sorted(results, key=lambda result: -result[1])
+
+
+def print_parallel_perft(position, depth, processes=None, split_depth=1, hash_mb=0, speedup=False):
+    """
+        Runs parallel perft and prints per root move counts, nodes, time and nodes/second,
+        and the speedup against a single process if speedup.
+
+        Returns number of leaf nodes
+    """
+
+    start = time.perf_counter()
+    nodes, divide = parallel_perft(position, depth, processes, split_depth, hash_mb)
+    elapsed = time.perf_counter() - start
+
+    for move, count in sorted(divide):
+        print(f"{move}: {count}")
+    print()
+    print(f"Depth: {depth}")
+    print(f"Nodes: {nodes}")
+    print(f"Processes: {processes or os.cpu_count()}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"Nodes/second: {int(nodes / elapsed) if elapsed > 0 else 0}")
+
+    if speedup:
+        table = TranspositionTable(hash_mb) if hash_mb > 0 else None
+        start = time.perf_counter()
+        single_nodes = perft(position, depth, table)
+        single_elapsed = time.perf_counter() - start
+        print(f"Single process: {single_elapsed:.3f}s, speedup {single_elapsed / elapsed:.2f}x"
+              f"{'' if single_nodes == nodes else ', COUNTS DIFFER'}")
+
+    return nodes
+
+
+def print_parallel_analysis(position, depth, processes=None, hash_mb=16, speedup=False):
+    """
+        Runs parallel root move analysis and prints every move with its score, time,
+        and the speedup against a single process if speedup.
+
+        Returns list of (encoded move, score, nodes searched), best move first
+    """
+
+    start = time.perf_counter()
+    results = parallel_analysis(position, depth, processes, hash_mb)
+    elapsed = time.perf_counter() - start
+
+    for move, score, nodes in results:
+        print(f"{position.san(move)}: {format_score(score)} ({nodes} nodes)")
+    print()
+    print(f"Depth: {depth}")
+    print(f"Processes: {processes or os.cpu_count()}")
+    print(f"Time: {elapsed:.3f}s")
+
+    if speedup:
+        start = time.perf_counter()
+        single_results = parallel_analysis(position, depth, 1, hash_mb)
+        single_elapsed = time.perf_counter() - start
+        print(f"Single process: {single_elapsed:.3f}s, speedup {single_elapsed / elapsed:.2f}x"
+              f"{'' if single_results == results else ', RESULTS DIFFER'}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split perft or root move analysis across worker processes.")
+    parser.add_argument("mode", choices=["perft", "analyse"])
+    parser.add_argument("depth", type=int)
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument("--split-depth", type=int, default=1, help="plies from the root the perft tree is split at")
+    parser.add_argument("--hash", type=float, default=None, help="transposition table size in MB per worker")
+    parser.add_argument("--speedup", action="store_true", help="also run in a single process and report the speedup")
+    args = parser.parse_args()
+
+    position = Bitboard(args.fen)
+    if args.mode == "perft":
+        print_parallel_perft(position, args.depth, args.processes, args.split_depth, args.hash or 0, args.speedup)
+    else:
+        print_parallel_analysis(position, args.depth, args.processes, 16 if args.hash is None else args.hash, args.speedup)
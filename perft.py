@@ -0,0 +1,183 @@
+import argparse
+import time
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+from transposition import TranspositionTable
+
+# standard perft positions with known leaf node counts, index 0 is depth 1
+PERFT_SUITE = [
+    ("start position", STARTING_FEN,
+        [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603, 193690690]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624, 11030083]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333, 15833292]),
+    ("position 4 mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+        [6, 264, 9467, 422333, 15833292]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487, 89941194]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594, 164075551]),
+]
+
+
+def perft(position, depth, table=None, generate=Bitboard.generate_legal_moves):
+    """
+        Counts leaf nodes of the legal move tree to the given depth.
+        The last ply is counted from the length of the move list instead of making every move.
+        If a transposition table is given, counts of subtrees are cached by position key and depth.
+        generate lists the legal moves of a position, e.g. Bitboard.generate_legal_moves_by_testing to check it against.
+
+        Returns number of leaf nodes
+    """
+
+    if depth <= 1:
+        return len(generate(position)) if depth == 1 else 1
+
+    if table is not None:
+        entry = table.probe(position.hash)
+        if entry is not None and entry[1] == depth:
+            return entry[2]
+
+    nodes = 0
+    for move in generate(position):
+        position.make_move(move)
+        nodes += perft(position, depth - 1, table, generate)
+        position.unmake_move()
+
+    if table is not None:
+        table.store(position.hash, depth, nodes)
+
+    return nodes
+
+
+def divide(position, depth, table=None):
+    """
+        Counts leaf nodes below every root move.
+
+        Returns list of (move in from-to notation, number of leaf nodes)
+    """
+
+    counts = []
+    for move in position.generate_legal_moves():
+        position.make_move(move)
+        counts.append((move_to_uci(move), perft(position, depth - 1, table)))
+        position.unmake_move()
+
+    return counts
+
+
+def print_perft(position, depth, show_divide=False, table=None):
+    """
+        Runs perft on position and prints nodes, time and nodes/second, with a per root move breakdown if show_divide.
+
+        Returns number of leaf nodes
+    """
+
+    start = time.perf_counter()
+    if show_divide:
+        counts = divide(position, depth, table)
+        nodes = sum(count for _, count in counts)
+    else:
+        nodes = perft(position, depth, table)
+    elapsed = time.perf_counter() - start
+
+    if show_divide:
+        for move, count in sorted(counts):
+            print(f"{move}: {count}")
+        print()
+
+    print(f"Depth: {depth}")
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"Nodes/second: {int(nodes / elapsed) if elapsed > 0 else 0}")
+
+    return nodes
+
+
+def run_suite(max_nodes=1000000, table=None):
+    """
+        Runs perft on every position in PERFT_SUITE, for every depth with at most max_nodes leaf nodes,
+        and compares the counts with the expected ones.
+
+        Returns True if all counts match, False if not
+    """
+
+    all_passed = True
+    total_nodes = 0
+    total_time = 0.0
+
+    for name, fen, expected_counts in PERFT_SUITE:
+        position = Bitboard(fen)
+        for depth, expected in enumerate(expected_counts, 1):
+            if expected > max_nodes:
+                break
+
+            start = time.perf_counter()
+            nodes = perft(position, depth, table)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+
+            passed = nodes == expected
+            all_passed = all_passed and passed
+            print(f"{'ok  ' if passed else 'FAIL'} {name}, depth {depth}: {nodes} nodes (expected {expected}), "
+                  f"{elapsed:.3f}s, {int(nodes / elapsed) if elapsed > 0 else 0} nodes/second")
+
+    print(f"\nTotal: {total_nodes} nodes, {total_time:.3f}s, {int(total_nodes / total_time) if total_time > 0 else 0} nodes/second")
+
+    return all_passed
+
+
+def compare_generators(max_nodes=100000):
+    """
+        Runs perft on every position in PERFT_SUITE, at the deepest depth with at most max_nodes leaf nodes,
+        with the legal move generator and with make-and-test filtering, and prints both times.
+
+        Returns True if both generators give the expected counts, False if not
+    """
+
+    all_passed = True
+    total = {"masks": 0.0, "make-and-test": 0.0}
+
+    for name, fen, expected_counts in PERFT_SUITE:
+        depth = max(depth for depth, expected in enumerate(expected_counts, 1) if expected <= max_nodes or depth == 1)
+        times = {}
+        for label, generate in (("masks", Bitboard.generate_legal_moves),
+                                ("make-and-test", Bitboard.generate_legal_moves_by_testing)):
+            start = time.perf_counter()
+            nodes = perft(Bitboard(fen), depth, generate=generate)
+            times[label] = time.perf_counter() - start
+            total[label] += times[label]
+            all_passed = all_passed and nodes == expected_counts[depth - 1]
+
+        print(f"{name}, depth {depth}: masks {times['masks']:.3f}s, make-and-test {times['make-and-test']:.3f}s, "
+              f"{times['make-and-test'] / times['masks']:.1f}x faster")
+
+    print(f"\nTotal: masks {total['masks']:.3f}s, make-and-test {total['make-and-test']:.3f}s, "
+          f"{total['make-and-test'] / total['masks']:.1f}x faster")
+
+    return all_passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count leaf nodes of the legal move tree.")
+    parser.add_argument("depth", type=int, nargs="?", default=3)
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move")
+    parser.add_argument("--suite", action="store_true", help="check the standard positions against known counts")
+    parser.add_argument("--compare", action="store_true", help="time the legal move generator against make-and-test filtering")
+    parser.add_argument("--max-nodes", type=int, default=1000000, help="largest expected count to run in --suite")
+    parser.add_argument("--hash", type=float, default=0, help="transposition table size in MB, 0 to disable")
+    args = parser.parse_args()
+
+    table = TranspositionTable(args.hash) if args.hash > 0 else None
+
+    if args.suite:
+        exit(0 if run_suite(args.max_nodes, table) else 1)
+
+    if args.compare:
+        exit(0 if compare_generators(args.max_nodes) else 1)
+
+    print_perft(Bitboard(args.fen), args.depth, args.divide, table)
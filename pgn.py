@@ -0,0 +1,366 @@
+import os
+import re
+import sys
+import time
+import argparse
+from collections import deque
+from multiprocessing import Pool
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+
+# file buffer size, and size in bytes of the pieces a file is split into for worker processes
+BUFFER_SIZE = 1 << 20
+CHUNK_SIZE = 4 << 20
+
+# chunks imported ahead of the one being yielded, per worker process, so a slow consumer bounds memory
+CHUNKS_IN_FLIGHT = 2
+
+# how often progress is reported, in games
+PROGRESS_INTERVAL = 10000
+
+TAG_PAIR = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# tag pairs every exported game starts with, in this order, "?" when unknown
+SEVEN_TAG_ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+PGN_LINE_LENGTH = 80
+
+
+def is_tag_line(line):
+    """
+        Returns True if line, in bytes, is a tag pair line like '[Event "x"]'
+    """
+
+    return line.lstrip().startswith(b"[")
+
+
+def split_games(lines, previous_is_tag=False):
+    """
+        Groups lines into games. A game starts at a tag pair line that does not follow another tag pair line,
+        lines before the first game are skipped.
+
+        Yields (byte offset of the game, list of lines)
+    """
+
+    game = None
+    game_offset = 0
+    for offset, line in lines:
+        is_tag = is_tag_line(line)
+        if is_tag and not previous_is_tag:
+            if game:
+                yield game_offset, game
+            game = []
+            game_offset = offset
+        if game is not None:
+            game.append(line)
+        previous_is_tag = is_tag
+
+    if game:
+        yield game_offset, game
+
+
+def line_before(f, offset):
+    """
+        Returns the line ending right before byte offset, which must be the start of a line.
+        Only the last few kilobytes are read, a longer line is cut, which is enough to tell a tag pair line.
+    """
+
+    begin = max(0, offset - 4096)
+    f.seek(begin)
+    data = f.read(offset - begin)
+    if data.endswith(b"\n"):
+        data = data[:-1]
+    return data.rsplit(b"\n", 1)[-1]
+
+
+def iterate_games(f, start=0, end=None):
+    """
+        Reads games lazily from a binary file object, every game starting at or after byte offset start
+        and before byte offset end. Adjacent byte ranges split the games of a file between them without overlap,
+        so a file can be imported in pieces by separate processes.
+
+        Yields (byte offset of the game, game text)
+    """
+
+    previous_is_tag = False
+    if start > 0:
+        # skip to the first line starting at or after start
+        f.seek(start - 1)
+        if f.read(1) != b"\n":
+            start += len(f.readline())
+        previous_is_tag = is_tag_line(line_before(f, start))
+
+    def lines(offset):
+        f.seek(offset)
+        for line in f:
+            yield offset, line
+            offset += len(line)
+
+    for game_offset, game in split_games(lines(start), previous_is_tag):
+        if end is not None and game_offset >= end:
+            return
+        yield game_offset, b"".join(game).decode("utf-8", "replace")
+
+
+def read_games(path):
+    """
+        Reads games lazily from a PGN file, "-" reads from stdin. Memory stays bounded by the longest game.
+
+        Yields game text
+    """
+
+    if path == "-":
+        for _, game in split_games((0, line) for line in sys.stdin.buffer):
+            yield b"".join(game).decode("utf-8", "replace")
+        return
+
+    with open(path, "rb", buffering=BUFFER_SIZE) as f:
+        for _, text in iterate_games(f):
+            yield text
+
+
+def parse_game(text):
+    """
+        Splits game text into tag pairs and the moves of the main line.
+        Comments, variations, numeric annotation glyphs, move numbers and the result are removed.
+
+        Returns (dict of tag pairs, list of moves in algebraic notation, result or None)
+    """
+
+    tags = {}
+    movetext = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        match = TAG_PAIR.match(stripped)
+        if match:
+            tags[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+        elif stripped.startswith("%"):
+            # escape line
+            continue
+        else:
+            movetext.append(line)
+
+    moves = []
+    result = None
+    text = "\n".join(movetext)
+    i = 0
+    depth = 0
+    length = len(text)
+
+    while i < length:
+        ch = text[i]
+        if ch == "{":
+            close = text.find("}", i)
+            i = length if close == -1 else close + 1
+        elif ch == ";":
+            close = text.find("\n", i)
+            i = length if close == -1 else close + 1
+        elif ch == "(":
+            depth += 1
+            i += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+            i += 1
+        elif ch.isspace():
+            i += 1
+        else:
+            j = i
+            while j < length and not text[j].isspace() and text[j] not in "{};()":
+                j += 1
+            token = text[i:j]
+            i = j
+
+            if depth > 0 or token.startswith("$"):
+                continue
+            if token in RESULTS:
+                result = token
+                continue
+
+            token = MOVE_NUMBER.sub("", token)
+            if token:
+                moves.append(token)
+
+    return tags, moves, result
+
+
+def replay_game(tags, moves):
+    """
+        Replays moves from the starting position, or from the FEN tag pair if set, validating every move.
+
+        Returns (list of moves in from-to notation, final FEN-string, error message or None)
+    """
+
+    try:
+        position = Bitboard(tags.get("FEN", STARTING_FEN))
+    except ValueError as error:
+        return [], tags.get("FEN", ""), f"invalid FEN tag: {error}"
+
+    played = []
+    for ply, notation in enumerate(moves, 1):
+        try:
+            move = position.parse_san(notation)
+        except ValueError as error:
+            return played, position.fen(), f"ply {ply}: {error}"
+        position.make_move(move)
+        played.append(move_to_uci(move))
+
+    return played, position.fen(), None
+
+
+def import_game(text):
+    """
+        Parses and replays a single game.
+
+        Returns (dict of tag pairs, result, list of moves in from-to notation, final FEN-string, error message or None)
+    """
+
+    tags, moves, result = parse_game(text)
+    played, fen, error = replay_game(tags, moves)
+    return tags, result or tags.get("Result", "*"), played, fen, error
+
+
+def import_chunk(arguments):
+    """
+        Imports every game starting inside a byte range of a file, run by the worker processes.
+
+        Returns list of import_game results
+    """
+
+    path, start, end = arguments
+    with open(path, "rb", buffering=BUFFER_SIZE) as f:
+        return [import_game(text) for _, text in iterate_games(f, start, end)]
+
+
+def import_games(path, processes=None, chunk_size=CHUNK_SIZE):
+    """
+        Imports every game of a PGN file. With more than one process the file is split into byte ranges
+        that are imported in parallel, results are still yielded in the order of the file.
+        Only a few chunks per process are imported ahead of the consumer.
+
+        Yields import_game results
+    """
+
+    if processes == 1 or path == "-":
+        for text in read_games(path):
+            yield import_game(text)
+        return
+
+    size = os.path.getsize(path)
+    ranges = ((path, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size))
+
+    with Pool(processes) as pool:
+        # at most CHUNKS_IN_FLIGHT chunks per process are submitted ahead, results are yielded in file order
+        # and the next chunk is submitted as each one is taken, so unread results never pile up
+        limit = CHUNKS_IN_FLIGHT * (processes or os.cpu_count() or 1)
+        pending = deque()
+        for arguments in ranges:
+            pending.append(pool.apply_async(import_chunk, (arguments,)))
+            if len(pending) >= limit:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def format_game(number, tags, result, moves, fen, error):
+    """
+        Returns a line of tab separated game number, players, result, status, final FEN-string and moves
+    """
+
+    players = f"{tags.get('White', '?')} - {tags.get('Black', '?')}"
+    status = "ok" if error is None else f"error: {error}"
+    return f"{number}\t{players}\t{result}\t{status}\t{fen}\t{' '.join(moves)}"
+
+
+def format_pgn(tags, moves, result="*"):
+    """
+        Formats a game as PGN text, the seven tag roster first, and movetext wrapped at 80 characters.
+        Move numbers start from the FEN tag pair if set.
+
+        Returns PGN text of the game, ending with an empty line
+    """
+
+    tags = dict(tags)
+    tags["Result"] = result
+    names = list(SEVEN_TAG_ROSTER) + [name for name in tags if name not in SEVEN_TAG_ROSTER]
+
+    lines = []
+    for name in names:
+        value = tags.get(name, "?").replace("\\", "\\\\").replace('"', '\\"')
+        lines.append(f'[{name} "{value}"]')
+    lines.append("")
+
+    fen_fields = tags.get("FEN", STARTING_FEN).split()
+    white_to_move = len(fen_fields) < 2 or fen_fields[1] == "w"
+    number = int(fen_fields[5]) if len(fen_fields) > 5 and fen_fields[5].isdigit() else 1
+
+    tokens = []
+    for notation in moves:
+        if white_to_move:
+            tokens.append(f"{number}.")
+        elif not tokens:
+            tokens.append(f"{number}...")
+        tokens.append(notation)
+        if not white_to_move:
+            number += 1
+        white_to_move = not white_to_move
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > PGN_LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+
+    return "\n".join(lines) + "\n"
+
+
+def run(input_path, output_path="-", processes=None, chunk_size=CHUNK_SIZE, quiet=False):
+    """
+        Imports every game in input_path and writes one line per game to output_path.
+
+        Returns (number of games, number of games with illegal moves, seconds elapsed)
+    """
+
+    output = sys.stdout if output_path == "-" else open(output_path, "w", buffering=BUFFER_SIZE)
+
+    count = 0
+    errors = 0
+    start = time.perf_counter()
+
+    try:
+        for tags, result, moves, fen, error in import_games(input_path, processes, chunk_size):
+            count += 1
+            if error is not None:
+                errors += 1
+            output.write(format_game(count, tags, result, moves, fen, error) + "\n")
+
+            if not quiet and count % PROGRESS_INTERVAL == 0:
+                elapsed = time.perf_counter() - start
+                sys.stderr.write(f"{count} games, {int(count / elapsed)} games/second\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+
+    elapsed = time.perf_counter() - start
+    if not quiet:
+        sys.stderr.write(f"{count} games ({errors} with errors) in {elapsed:.2f}s, "
+                         f"{int(count / elapsed) if elapsed > 0 else 0} games/second\n")
+
+    return count, errors, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a PGN file, replaying and validating every game.")
+    parser.add_argument("input", help="PGN file, - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="output file, - for stdout")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="bytes of the file per worker task")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress and throughput")
+    args = parser.parse_args()
+
+    run(args.input, args.output, args.processes, args.chunk_size, args.quiet)
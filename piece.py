@@ -1,5 +1,3 @@
-import numpy as np
-
 PIECE_REPR = {
     ("w", "P"): "\u265F",
     ("w", "R"): "\u265C",
@@ -19,6 +17,9 @@ FILES = ["a","b","c","d","e","f","g","h"]
 
 class Piece:
 
+    # fixed attributes instead of a __dict__ per piece
+    __slots__ = ("pos", "piece_type", "color", "piece_symbol", "initial_rank", "legal_moves")
+
     def __init__(self, pos, piece_type):
         self.pos = pos
         self.piece_type = piece_type
@@ -34,6 +35,9 @@ class Piece:
             self.initial_rank = True
         else:
             self.initial_rank = False
+
+        # target squares in chess notation, filled by generate_legal_moves
+        self.legal_moves = []
         
 
     def __repr__(self):
@@ -110,10 +114,10 @@ class Piece:
         if (i > -1 and i < 8) and (board[i][j] is None):
             legal_moves.append(self.indices_to_chess_notation((i, j)))
 
-        # checks if two squares above is empty and pawn can double push
+        # checks if the two squares above are empty and pawn can double push
         i = pos[0] + 2 * search_dir
         j = pos[1]
-        if (i > -1 and i < 8) and (board[i][j] is None) and self.initial_rank:
+        if (i > -1 and i < 8) and (board[i][j] is None) and (board[i - search_dir][j] is None) and self.initial_rank:
             legal_moves.append(self.indices_to_chess_notation((i, j)))
 
         # checks if there is an opponent piece diagonally to the left to capture
@@ -133,32 +137,32 @@ class Piece:
             Finds all legal linear movement. Searches horizontally and vertically from piece position.
         """
 
-        rank_left = np.arange(pos[1]-1, -1, -1)
-        rank_right = np.arange(pos[1]+1, 8)
-        file_up = np.arange(pos[0]-1, -1, -1)
-        file_down = np.arange(pos[0]+1, 8)
+        rank_left = range(pos[1]-1, -1, -1)
+        rank_right = range(pos[1]+1, 8)
+        file_up = range(pos[0]-1, -1, -1)
+        file_down = range(pos[0]+1, 8)
 
         # search rank left
-        self.iterate_moves(zip(np.full_like(rank_left, pos[0]), rank_left), board, legal_moves)
+        self.iterate_moves(zip([pos[0]] * len(rank_left), rank_left), board, legal_moves)
 
         # search rank right
-        self.iterate_moves(zip(np.full_like(rank_right, pos[0]), rank_right), board, legal_moves)
+        self.iterate_moves(zip([pos[0]] * len(rank_right), rank_right), board, legal_moves)
 
         # search file up
-        self.iterate_moves(zip(file_up, np.full_like(file_up, pos[1])), board, legal_moves)
+        self.iterate_moves(zip(file_up, [pos[1]] * len(file_up)), board, legal_moves)
 
         # search file down
-        self.iterate_moves(zip(file_down, np.full_like(file_down, pos[1])), board, legal_moves)
+        self.iterate_moves(zip(file_down, [pos[1]] * len(file_down)), board, legal_moves)
 
     def diagonal_movement(self, board, pos, legal_moves):
         """
             Finds all legal diagonal movement. Searches diagonally in X-pattern centered at piece position.
         """
 
-        rank_left = np.arange(pos[1]-1, -1, -1)
-        rank_right = np.arange(pos[1]+1, 8)
-        file_up = np.arange(pos[0]-1, -1, -1)
-        file_down = np.arange(pos[0]+1, 8)
+        rank_left = range(pos[1]-1, -1, -1)
+        rank_right = range(pos[1]+1, 8)
+        file_up = range(pos[0]-1, -1, -1)
+        file_down = range(pos[0]+1, 8)
 
         # search diagonally up and left
         self.iterate_moves(zip(file_up, rank_left), board, legal_moves)
@@ -187,7 +191,7 @@ class Piece:
                     else:
                         legal_moves.append(self.indices_to_chess_notation((i, j)))
 
-        indices = np.full(8, None)
+        indices = [None] * 8
 
         # upper left corner squares
         indices[0] = (pos[0]-1, pos[1]-2) #left
@@ -0,0 +1,120 @@
+import time
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+        Counts calls and time spent in registered functions. Disabled, the original functions are in place
+        and nothing is measured. Enabled, each one is replaced by a wrapper that times it, until disabled again.
+        Times include time spent in other registered functions called from inside.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # (class or module, attribute name, original function) by name
+        self.targets = {}
+        # [calls, seconds] by name
+        self.records = {}
+
+    def register(self, name, owner, attribute):
+        """
+            Registers function owner.attribute to be timed under name, wrapped at once if profiling is enabled.
+        """
+
+        self.targets[name] = (owner, attribute, getattr(owner, attribute))
+        self.records.setdefault(name, [0, 0.0])
+        if self.enabled:
+            setattr(owner, attribute, self.timed(name, self.targets[name][2]))
+
+    def timed(self, name, function):
+        """
+            Returns function wrapped to add its calls and time to the record of name
+        """
+
+        record = self.records[name]
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record[0] += 1
+                record[1] += perf_counter() - start
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    def enable(self):
+        """
+            Starts timing all registered functions.
+        """
+
+        if self.enabled:
+            return
+        self.enabled = True
+        for name, (owner, attribute, function) in self.targets.items():
+            setattr(owner, attribute, self.timed(name, function))
+
+    def disable(self):
+        """
+            Stops timing and puts the original functions back, the records are kept.
+        """
+
+        if not self.enabled:
+            return
+        self.enabled = False
+        for owner, attribute, function in self.targets.values():
+            setattr(owner, attribute, function)
+
+    def reset(self):
+        """
+            Clears the records.
+        """
+
+        for record in self.records.values():
+            record[0] = 0
+            record[1] = 0.0
+
+    def stats(self):
+        """
+            Returns dict {name: {"calls": calls, "seconds": total seconds, "mean_us": microseconds per call}}
+        """
+
+        return {name: {"calls": calls, "seconds": seconds, "mean_us": seconds / calls * 1e6 if calls else 0.0}
+                for name, (calls, seconds) in self.records.items()}
+
+    def summary(self):
+        """
+            Formats the records as a table, most time first, leaving out functions never called.
+
+            Returns summary string
+        """
+
+        lines = [f"{'Function':32} {'Calls':>9} {'Total (s)':>10} {'Mean (us)':>10}"]
+        for name, record in sorted(self.stats().items(), key=lambda item: -item[1]["seconds"]):
+            if record["calls"]:
+                lines.append(f"{name:32} {record['calls']:9} {record['seconds']:10.4f} {record['mean_us']:10.1f}")
+
+        return "\n".join(lines)
+
+
+# profiler of the program, functions on the hot paths register themselves where they are defined
+PROFILER = Profiler()
+
+
+@contextmanager
+def profiling(reset=True):
+    """
+        Times registered functions inside a with-block, for batch jobs, e.g.
+        with profiling(): run(...) and then PROFILER.stats().
+    """
+
+    if reset:
+        PROFILER.reset()
+    PROFILER.enable()
+    try:
+        yield PROFILER
+    finally:
+        PROFILER.disable()
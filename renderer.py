@@ -0,0 +1,134 @@
+import os
+import shutil
+from piece import PIECE_REPR
+from profiler import PROFILER
+
+CLEAR_SCREEN = "\x1b[H\x1b[2J"
+CLEAR_TO_END = "\x1b[J"
+
+# terminal row of rank 8 and column of the a-file, squares are two columns apart
+BOARD_ROW = 2
+BOARD_COLUMN = 5
+
+# lines taken by the board with its border and file letters, messages are written below
+BOARD_LINES = 11
+
+# more changed squares than this are drawn with a full redraw
+FULL_REDRAW_THRESHOLD = 32
+
+EMPTY_SQUARE = "\u26AC"
+
+# symbol of each piece by FEN letter, and of an empty square
+SYMBOLS = {piece_type: symbol for (_, piece_type), symbol in PIECE_REPR.items()}
+SYMBOLS[None] = EMPTY_SQUARE
+
+
+def square_symbols(squares):
+    """
+        Returns list of the symbols of 64 squares given by FEN letter, None for an empty square, a8 first
+    """
+
+    return [SYMBOLS[piece_type] for piece_type in squares]
+
+
+def format_board(cells):
+    """
+        Lays out the 64 square symbols, a8 first, as a board with border, ranks and files.
+
+        Returns board string
+    """
+
+    lines = ["  \u250F" + "\u2501"*17 + "\u2513"]
+    for i in range(8):
+        lines.append(str(8-i) + " \u2503 " + " ".join(cells[i*8:i*8 + 8]) + " \u2503")
+    lines.append("  \u2517" + "\u2501"*17 + "\u251B")
+    lines.append("    a b c d e f g h")
+
+    return "\n".join(lines)
+
+
+def move_cursor(row, column):
+    """
+        Returns ANSI escape sequence moving the cursor to row and column, counted from 1
+    """
+
+    return f"\x1b[{row};{column}H"
+
+
+def supports_ansi(output):
+    """
+        Returns True if output is a terminal that understands cursor addressing
+    """
+
+    isatty = getattr(output, "isatty", None)
+    return isatty is not None and isatty() and os.environ.get("TERM", "") != "dumb"
+
+
+class Renderer:
+    """
+        Draws the board, redrawing only changed squares with ANSI cursor addressing.
+        Falls back to full redraws when output is not a terminal, on the first frame, or when much of the board changed.
+    """
+
+    def __init__(self, output, ansi=None):
+        self.output = output
+        self.ansi = supports_ansi(output) if ansi is None else ansi
+
+        # symbols of the last frame drawn, None forces a full redraw
+        self.cells = None
+        self.lines_used = 0
+
+        self.frames = 0
+        self.full_redraws = 0
+        self.bytes_written = 0
+
+    def invalidate(self):
+        """
+            Forces a full redraw of the next frame, e.g. after something else wrote to the terminal.
+        """
+
+        self.cells = None
+
+    def draw(self, cells, messages=()):
+        """
+            Draws a frame of the 64 square symbols, a8 first, with message lines below the board.
+        """
+
+        message_lines = [line for message in messages for line in message.split("\n")]
+
+        changed = None
+        if self.ansi and self.cells is not None and self.lines_used < shutil.get_terminal_size().lines:
+            changed = [square for square in range(64) if cells[square] != self.cells[square]]
+            if len(changed) > FULL_REDRAW_THRESHOLD:
+                changed = None
+
+        if changed is None:
+            frame = self.full_frame(cells, message_lines)
+            self.full_redraws += 1
+        else:
+            parts = [move_cursor(BOARD_ROW + square // 8, BOARD_COLUMN + 2 * (square % 8)) + cells[square]
+                     for square in changed]
+            # messages and the prompt below the board are always rewritten
+            parts.append(move_cursor(BOARD_LINES + 1, 1) + CLEAR_TO_END)
+            parts.extend(line + "\n" for line in message_lines)
+            frame = "".join(parts)
+
+        self.cells = list(cells)
+        # board, messages and the line of the prompt
+        self.lines_used = BOARD_LINES + len(message_lines) + 1
+
+        self.output.write(frame)
+        self.output.flush()
+        self.frames += 1
+        self.bytes_written += len(frame.encode("utf-8"))
+
+    def full_frame(self, cells, message_lines):
+        """
+            Returns the whole frame, clearing the screen first, or pushing the last frame out of view without ANSI
+        """
+
+        clear = CLEAR_SCREEN if self.ansi else "\n"*50
+        return clear + format_board(cells) + "\n" + "".join(line + "\n" for line in message_lines)
+
+
+PROFILER.register("Renderer.draw", Renderer, "draw")
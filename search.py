@@ -0,0 +1,421 @@
+import time
+from bitboard import PROMOTION, EN_PASSANT, move_to_uci
+from evaluation import PIECE_VALUES, evaluate
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from tablebase import WIN, LOSS
+
+MATE_SCORE = 100000
+INFINITY = 1000000
+MAX_DEPTH = 64
+
+# mate scores within this range of MATE_SCORE are stored in the table relative to the node, not the root
+MATE_THRESHOLD = MATE_SCORE - 1000
+
+# how often, in nodes, the time and node budget are checked
+CHECK_INTERVAL = 1024
+
+# move ordering scores, table move first, then captures by most valuable victim and least valuable attacker,
+# then killer moves and finally quiet moves by history
+TABLE_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+KILLER_SCORE = 1 << 20
+
+PIECE_ORDER_VALUES = {piece_type: value for piece_type, value in PIECE_VALUES.items()}
+PIECE_ORDER_VALUES.update({piece_type.lower(): value for piece_type, value in PIECE_VALUES.items()})
+PIECE_ORDER_VALUES["K"] = PIECE_ORDER_VALUES["k"] = 1000
+
+
+class SearchAborted(Exception):
+    """
+        Raised inside the search when the time or node budget runs out.
+    """
+
+
+class Search:
+
+    def __init__(self, hash_mb=16, report=None, tablebase=None):
+        self.table = TranspositionTable(hash_mb)
+
+        # Tablebase object probed for exact results once few pieces are left, or None
+        self.tablebase = tablebase
+
+        # called with a dict after every completed iteration, e.g. for printing progress
+        self.report = report
+
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.depth = 0
+        self.score = 0
+        self.stopped = False
+
+        # (start time, seconds) given by set_time_budget, taken over by the search at its next check
+        self.time_budget = None
+
+    def stop(self):
+        """
+            Stops a running search as soon as possible, it returns the best move of the last completed iteration.
+            May be called from another thread, also just before the search starts. Cleared when the search returns.
+        """
+
+        self.stopped = True
+
+    def set_time_budget(self, max_time):
+        """
+            Gives the search a time budget in seconds counted from now, e.g. when a pondering search becomes the real
+            search. May be called from another thread, also just before the search starts, so the budget is kept
+            until the search takes it over instead of being overwritten by the start of the search.
+        """
+
+        self.time_budget = (time.perf_counter(), max_time)
+
+    def search(self, position, max_time=None, max_nodes=None, max_depth=MAX_DEPTH):
+        """
+            Searches position with iterative deepening negamax alpha-beta until the time budget in seconds,
+            the node budget or the depth is reached. The position is restored before returning.
+
+            Returns best encoded move, None if side to move has no legal moves
+        """
+
+        self.start_time = time.perf_counter()
+        # the time budget is counted from budget_start, which set_time_budget moves
+        self.budget_start = self.start_time
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.killers = [[0, 0] for _ in range(MAX_DEPTH + 64)]
+        self.history_scores = {}
+        self.table.new_search()
+        self.root_ply = len(position.history)
+
+        root_moves = position.generate_legal_moves()
+        if not root_moves:
+            self.elapsed = 0.0
+            self.stopped = False
+            self.time_budget = None
+            return None
+
+        best_move = root_moves[0]
+        self.depth = 0
+        self.score = 0
+
+        for depth in range(1, max_depth + 1):
+            self.root_best_move = None
+            try:
+                score = self.negamax(position, depth, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                # unwind moves made by the aborted iteration
+                while len(position.history) > self.root_ply:
+                    position.unmake_move()
+
+                # the previous best move is searched first, so a move found by the partial iteration is at least as good
+                if self.root_best_move is not None:
+                    best_move = self.root_best_move
+                    self.score = self.root_best_score
+                break
+
+            best_move = self.root_best_move
+            self.depth = depth
+            self.score = score
+            self.elapsed = time.perf_counter() - self.start_time
+
+            if self.report is not None:
+                self.report({
+                    "depth": depth,
+                    "score": score,
+                    "nodes": self.nodes,
+                    "nps": self.nodes_per_second(),
+                    "time": self.elapsed,
+                    "pv": [move_to_uci(move) for move in self.principal_variation(position, depth)],
+                })
+
+            # stop early on a forced mate, or when the next iteration would not finish in time
+            if abs(score) >= MATE_THRESHOLD:
+                break
+            # the time budget may be set while searching, e.g. when a pondering search becomes the real search
+            self.take_time_budget()
+            if self.max_time is not None and time.perf_counter() - self.budget_start > self.max_time / 2:
+                break
+            if self.stopped or len(root_moves) == 1:
+                break
+
+        self.elapsed = time.perf_counter() - self.start_time
+        self.stopped = False
+        self.time_budget = None
+        return best_move
+
+    def nodes_per_second(self):
+        """
+            Returns nodes searched per second in the last search.
+        """
+
+        elapsed = time.perf_counter() - self.start_time
+        return int(self.nodes / elapsed) if elapsed > 0 else 0
+
+    def take_time_budget(self):
+        """
+            Takes over a time budget given by set_time_budget since the last check.
+        """
+
+        time_budget = self.time_budget
+        if time_budget is not None:
+            self.time_budget = None
+            self.budget_start, self.max_time = time_budget
+
+    def check_limits(self):
+        """
+            Raises SearchAborted when the search is stopped or the time or node budget is used up.
+        """
+
+        self.take_time_budget()
+        if self.stopped:
+            raise SearchAborted()
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchAborted()
+        if self.max_time is not None and time.perf_counter() - self.budget_start >= self.max_time:
+            raise SearchAborted()
+
+    def negamax(self, position, depth, alpha, beta, ply):
+        """
+            Alpha-beta search to depth, extended by one ply when in check, dropping into quiescence search at depth 0.
+
+            Returns score from the point of view of the side to move
+        """
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        if ply > 0 and (position.halfmove_clock >= 100 or position.is_repetition()):
+            return 0
+
+        # exact result of positions in the tablebases, never at the root so a best move is always set
+        if ply > 0 and self.tablebase is not None:
+            result = self.tablebase.probe(position)
+            if result is not None:
+                return tablebase_score(result, ply)
+
+        # table cutoff, never at the root so a best move is always set
+        table_move = 0
+        entry = self.table.probe(position.hash)
+        if entry is not None:
+            table_move = entry[4]
+            if ply > 0 and entry[1] >= depth:
+                value = score_from_table(entry[2], ply)
+                bound = entry[3]
+                if bound == EXACT:
+                    return value
+                if bound == LOWER_BOUND and value >= beta:
+                    return value
+                if bound == UPPER_BOUND and value <= alpha:
+                    return value
+
+        in_check = position.in_check()
+        if in_check:
+            depth += 1
+
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, ply)
+
+        moves = position.generate_legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if in_check else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        for move in self.order_moves(position, moves, table_move, ply):
+            position.make_move(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self.root_best_move = move
+                    self.root_best_score = score
+
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if self.is_quiet(position, move):
+                            self.update_killers_and_history(move, depth, ply)
+                        break
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+        self.table.store(position.hash, depth, score_to_table(best_score, ply), bound, best_move)
+
+        return best_score
+
+    def quiescence(self, position, alpha, beta, ply):
+        """
+            Searches captures and promotions only, until the position is quiet, so the evaluation is not taken
+            in the middle of an exchange.
+
+            Returns score from the point of view of the side to move
+        """
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        stand_pat = evaluate(position)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        color = position.side_to_move
+        moves = position.generate_pseudo_legal_moves(captures_only=True)
+        for move in self.order_moves(position, moves, 0, ply):
+            position.make_move(move)
+            if position.in_check(color):
+                position.unmake_move()
+                continue
+            score = -self.quiescence(position, -beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def is_quiet(self, position, move):
+        """
+            Returns True if move is neither a capture nor a promotion.
+        """
+
+        flag = move >> 12
+        return position.squares[(move >> 6) & 63] is None and flag != EN_PASSANT and not (flag & PROMOTION)
+
+    def order_moves(self, position, moves, table_move, ply):
+        """
+            Sorts moves so the ones most likely to cause a cutoff are searched first.
+
+            Returns sorted list of encoded moves
+        """
+
+        squares = position.squares
+        killers = self.killers[ply] if ply < len(self.killers) else (0, 0)
+        history_scores = self.history_scores
+
+        def move_score(move):
+            if move == table_move:
+                return TABLE_MOVE_SCORE
+            victim = squares[(move >> 6) & 63]
+            flag = move >> 12
+            if victim is not None or flag == EN_PASSANT or flag & PROMOTION:
+                victim_value = PIECE_ORDER_VALUES[victim] if victim is not None else 100
+                if flag & PROMOTION:
+                    victim_value += 800
+                return CAPTURE_SCORE + victim_value * 16 - PIECE_ORDER_VALUES[squares[move & 63]] // 100
+            if move == killers[0] or move == killers[1]:
+                return KILLER_SCORE
+            return history_scores.get(move & 4095, 0)
+
+        return sorted(moves, key=move_score, reverse=True)
+
+    def update_killers_and_history(self, move, depth, ply):
+        """
+            Remembers a quiet move that caused a cutoff, for ordering moves in sibling nodes.
+        """
+
+        if ply >= len(self.killers):
+            return
+
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        key = move & 4095
+        self.history_scores[key] = min(self.history_scores.get(key, 0) + depth * depth, KILLER_SCORE - 1)
+
+    def principal_variation(self, position, depth):
+        """
+            Follows best moves stored in the table from position.
+
+            Returns list of encoded moves
+        """
+
+        moves = []
+        seen = set()
+        while len(moves) < depth:
+            entry = self.table.probe(position.hash)
+            if entry is None or not entry[4] or position.hash in seen:
+                break
+            seen.add(position.hash)
+            move = entry[4]
+            if move not in position.generate_legal_moves():
+                break
+            position.make_move(move)
+            moves.append(move)
+
+        for _ in moves:
+            position.unmake_move()
+
+        return moves
+
+
+def score_to_table(score, ply):
+    """
+        Mate scores are relative to the root during search, in the table they are stored relative to the node.
+
+        Returns score to store
+    """
+
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+        Converts a stored mate score back to be relative to the root.
+
+        Returns score
+    """
+
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def tablebase_score(result, ply):
+    """
+        Converts a tablebase result, win, draw or loss and plies to mate, to a mate score relative to the root.
+
+        Returns score
+    """
+
+    outcome, plies = result
+    if outcome == WIN:
+        return MATE_SCORE - ply - plies
+    if outcome == LOSS:
+        return -MATE_SCORE + ply + plies
+    return 0
+
+
+def format_score(score):
+    """
+        Formats score for printing, in pawns or as moves to mate, e.g. "0.35" or "#3".
+
+        Returns score string
+    """
+
+    if score >= MATE_THRESHOLD:
+        return f"#{(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_THRESHOLD:
+        return f"#-{(MATE_SCORE + score + 1) // 2}"
+    return f"{score / 100:.2f}"
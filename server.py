@@ -0,0 +1,351 @@
+import sys
+import time
+import array
+import asyncio
+import argparse
+from bitboard import STARTING_FEN, SQUARE_NAMES, move_to_uci
+from compact import CompactPosition, CODE_PIECES
+from archive import ArchiveWriter
+
+DEFAULT_PORT = 8765
+
+# longest command line accepted from a client
+MAX_LINE = 4096
+
+# bytes waiting to be sent to a client before it is dropped, a client that stops reading could otherwise
+# make the server buffer the moves of its games without limit
+MAX_WRITE_BUFFER = 1 << 20
+
+HELP = "commands: new [w|b|wb], join <game>, move <game> <move>, fen <game>, mode diff|fen, leave <game>, quit"
+
+
+class GameSession:
+    """
+        State of a single game held by the server. The position is a CompactPosition, about 200 bytes,
+        and is only expanded into a Bitboard while a move is made. The moves made are kept as 16-bit encoded moves
+        for archiving the game.
+    """
+
+    __slots__ = ("game_id", "start_fen", "position", "moves", "players", "observers", "plies", "result")
+
+    def __init__(self, game_id, fen=STARTING_FEN):
+        self.game_id = game_id
+        self.start_fen = fen
+        self.position = CompactPosition.from_fen(fen)
+        self.moves = array.array("H")
+        # connection playing each color, one connection may play both
+        self.players = {"w": None, "b": None}
+        self.observers = []
+        self.plies = 0
+        # "1-0", "0-1" or "1/2-1/2" once the game is over
+        self.result = None
+
+    def connections(self):
+        """
+            Returns list of connections receiving the moves of the game, players first
+        """
+
+        connections = []
+        for connection in [self.players["w"], self.players["b"]] + self.observers:
+            if connection is not None and connection not in connections:
+                connections.append(connection)
+        return connections
+
+    def make_move(self, notation):
+        """
+            Makes a move in chess notation. Raises ValueError if the move is not legal.
+
+            Returns (move in from-to notation, list of (square, piece letter or None) changed, status)
+            where status is "", "check", "checkmate", "stalemate" or "fifty-move rule"
+        """
+
+        position = self.position.to_bitboard()
+        move = position.parse_san(notation)
+        position.make_move(move)
+
+        after = CompactPosition.from_bitboard(position)
+        changed = [(square, CODE_PIECES[code]) for square, (code, previous) in enumerate(zip(after.board, self.position.board))
+                   if code != previous]
+        self.position = after
+        self.moves.append(move)
+        self.plies += 1
+
+        status = ""
+        in_check = position.in_check()
+        if not position.generate_legal_moves():
+            status = "checkmate" if in_check else "stalemate"
+            self.result = ("0-1" if position.side_to_move == "w" else "1-0") if in_check else "1/2-1/2"
+        elif position.halfmove_clock >= 100:
+            status = "fifty-move rule"
+            self.result = "1/2-1/2"
+        elif in_check:
+            status = "check"
+
+        return move_to_uci(move), changed, status
+
+
+def format_diff(changed):
+    """
+        Formats changed squares, e.g. "e2. e4P", a dot for an emptied square.
+
+        Returns diff string
+    """
+
+    return " ".join(SQUARE_NAMES[square] + (piece or ".") for square, piece in changed)
+
+
+class Connection:
+    """
+        A connected client, with the games it takes part in and how it wants moves sent.
+    """
+
+    __slots__ = ("writer", "games", "send_fen")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.games = set()
+        # moves are sent as changed squares, or as the FEN-string after the move
+        self.send_fen = False
+
+    def send(self, line):
+        """
+            Queues a line for the client. Only the client's own commands wait for it to be sent, so a client
+            with more than MAX_WRITE_BUFFER bytes not yet sent is disconnected, and leaves its games.
+        """
+
+        if self.writer.is_closing():
+            return
+        self.writer.write((line + "\n").encode("utf-8"))
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.writer.transport.abort()
+
+
+class ChessServer:
+    """
+        Hosts many games over TCP in a single asyncio event loop. Clients send one command per line
+        and the moves of a game are sent to its players and observers. Given an ArchiveWriter,
+        every game with moves is added to it when closed.
+    """
+
+    def __init__(self, archive=None):
+        self.archive = archive
+        self.games = {}
+        self.next_game_id = 1
+        self.connections = 0
+        self.moves_made = 0
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+            Starts listening, port 0 picks a free port.
+
+            Returns asyncio server
+        """
+
+        self.server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE, backlog=4096)
+        return self.server
+
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def handle_client(self, reader, writer):
+        """
+            Reads and handles the commands of a client until it quits or disconnects.
+        """
+
+        connection = Connection(writer)
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # line too long or connection reset
+                    break
+                if not line:
+                    break
+                if not self.handle(connection, line.decode("utf-8", "replace").split()):
+                    break
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in list(connection.games):
+                self.leave(connection, game_id)
+            self.connections -= 1
+            writer.close()
+
+    def handle(self, connection, tokens):
+        """
+            Handles a single command of a client.
+
+            Returns False after quit, True otherwise
+        """
+
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+
+        if command == "new":
+            sides = arguments[0] if arguments else "wb"
+            if sides not in ("w", "b", "wb"):
+                connection.send("error new sides must be w, b or wb")
+                return True
+            game = GameSession(self.next_game_id)
+            self.next_game_id += 1
+            self.games[game.game_id] = game
+            for color in sides:
+                game.players[color] = connection
+            connection.games.add(game.game_id)
+            connection.send(f"game {game.game_id} {sides} {game.position.fen()}")
+
+        elif command == "join":
+            game = self.find_game(connection, arguments)
+            if game is not None:
+                free = "".join(color for color in "wb" if game.players[color] is None)
+                for color in free:
+                    game.players[color] = connection
+                if not free:
+                    game.observers.append(connection)
+                connection.games.add(game.game_id)
+                connection.send(f"joined {game.game_id} {free or 'observer'} {game.position.fen()}")
+
+        elif command == "move":
+            game = self.find_game(connection, arguments)
+            if game is not None:
+                self.move(connection, game, " ".join(arguments[1:]))
+
+        elif command == "fen":
+            game = self.find_game(connection, arguments)
+            if game is not None:
+                connection.send(f"fen {game.game_id} {game.position.fen()}")
+
+        elif command == "mode":
+            if arguments in (["diff"], ["fen"]):
+                connection.send_fen = arguments[0] == "fen"
+                connection.send(f"mode {arguments[0]}")
+            else:
+                connection.send("error mode must be diff or fen")
+
+        elif command == "leave":
+            game = self.find_game(connection, arguments)
+            if game is not None:
+                self.leave(connection, game.game_id)
+                connection.send(f"left {game.game_id}")
+
+        elif command == "quit":
+            return False
+
+        else:
+            connection.send("error " + HELP)
+
+        return True
+
+    def find_game(self, connection, arguments):
+        """
+            Returns GameSession of the game id in arguments, None after sending an error
+        """
+
+        try:
+            game = self.games.get(int(arguments[0]))
+        except (IndexError, ValueError):
+            connection.send("error missing game id")
+            return None
+
+        if game is None:
+            connection.send(f"error {arguments[0]} no such game")
+        return game
+
+    def move(self, connection, game, notation):
+        """
+            Makes a move of a player and sends it to everyone in the game.
+        """
+
+        if game.result is not None:
+            connection.send(f"error {game.game_id} game is over {game.result}")
+            return
+        if game.players[game.position.side_to_move] is not connection:
+            connection.send(f"error {game.game_id} not your move")
+            return
+
+        try:
+            uci, changed, status = game.make_move(notation)
+        except ValueError as error:
+            connection.send(f"error {game.game_id} {error}")
+            return
+
+        self.moves_made += 1
+        diff = format_diff(changed)
+        fen = None
+        for receiver in game.connections():
+            if receiver.send_fen:
+                fen = fen or game.position.fen()
+                receiver.send(f"moved {game.game_id} {game.plies} {uci} {status or '-'} {fen}")
+            else:
+                receiver.send(f"moved {game.game_id} {game.plies} {uci} {status or '-'} {diff}")
+
+    def leave(self, connection, game_id):
+        """
+            Removes a connection from a game, the game is closed when nobody is left in it.
+        """
+
+        connection.games.discard(game_id)
+        game = self.games.get(game_id)
+        if game is None:
+            return
+
+        for color in "wb":
+            if game.players[color] is connection:
+                game.players[color] = None
+        if connection in game.observers:
+            game.observers.remove(connection)
+
+        if not game.connections():
+            del self.games[game_id]
+            self.archive_game(game)
+
+    def archive_game(self, game):
+        """
+            Adds a closed game to the archive, if there is one and the game has moves.
+        """
+
+        if self.archive is None or not game.moves:
+            return
+
+        tags = {"Site": "server.py", "Date": time.strftime("%Y.%m.%d"), "Round": str(game.game_id)}
+        if game.start_fen != STARTING_FEN:
+            tags["FEN"] = game.start_fen
+        self.archive.add_game(game.moves, game.result or "*", tags)
+        self.archive.flush()
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, archive_path=None):
+    """
+        Runs the server until interrupted. With archive_path games are appended to that archive,
+        games still open when the server stops are archived as unfinished.
+    """
+
+    archive = ArchiveWriter(archive_path, append=True) if archive_path is not None else None
+    server = ChessServer(archive)
+    try:
+        await server.start(host, port)
+        print(f"listening on {host} port {server.port()}", flush=True)
+        async with server.server:
+            await server.server.serve_forever()
+    finally:
+        if archive is not None:
+            for game in server.games.values():
+                server.archive_game(game)
+            archive.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host chess games for many clients over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on, 0 for any free port")
+    parser.add_argument("--archive", default=None, help="archive file every game is added to, see archive.py")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.archive))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,384 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+from attacks import KING_ATTACKS, PAWN_ATTACKS, rook_attacks, queen_attacks
+from bitboard import Bitboard
+
+# file header, magic and number of tables, followed by a directory of (name, offset, size) and the tables
+MAGIC = b"CTB1"
+HEADER = struct.Struct("<4sI")
+DIRECTORY_ENTRY = struct.Struct("<4sII")
+
+# tables by the piece of the side with more material, in the order they are generated,
+# KPK looks up KQK and KRK after promotions
+MATERIALS = {"KQK": "Q", "KRK": "R", "KPK": "P"}
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases.bin")
+
+# a table has one byte for every side to move, king and piece square of the stronger side and king square of the lone king.
+# 0 is a draw or an illegal position, v > 0 wins with mate in v plies and v < 0 loses, mated in -v - 1 plies
+TABLE_SIZE = 2 * 64 * 64 * 64
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+def table_index(stronger_to_move, king, lone_king, piece):
+    """
+        Returns index of a position in a table, squares counted from a8 as seen by the stronger side playing white
+    """
+
+    return (0 if stronger_to_move else 1) << 18 | king << 12 | lone_king << 6 | piece
+
+
+def piece_attacks(piece_type, square, occupied):
+    """
+        Returns bitboard of squares attacked by the queen, rook or white pawn on square
+    """
+
+    if piece_type == "Q":
+        return queen_attacks(square, occupied)
+    if piece_type == "R":
+        return rook_attacks(square, occupied)
+    return PAWN_ATTACKS["w"][square]
+
+
+def is_legal_position(piece_type, stronger_to_move, king, lone_king, piece):
+    """
+        Returns True if the pieces are on different squares, the kings are not next to each other, a pawn is not
+        on the first or last rank and the side not to move is not in check
+    """
+
+    if king == lone_king or king == piece or lone_king == piece:
+        return False
+    if KING_ATTACKS[king] >> lone_king & 1:
+        return False
+    if piece_type == "P" and piece // 8 in (0, 7):
+        return False
+    if stronger_to_move and piece_attacks(piece_type, piece, 1 << king | 1 << lone_king) >> lone_king & 1:
+        return False
+    return True
+
+
+def generate_table(piece_type, promotion_tables=None):
+    """
+        Generates a table by retrograde analysis. Positions with the lone king to move and no legal moves
+        are mated or stalemated, and results are propagated backwards through unmoves one ply at a time,
+        so every position is resolved at its shortest mate. A position of the lone king is lost once all of its
+        moves are lost, which is tracked by counting its remaining moves. Pawn promotions are looked up in
+        promotion_tables, the finished KQK and KRK tables, and promoting to a bishop or knight draws.
+
+        Returns bytearray of TABLE_SIZE signed bytes
+    """
+
+    legal = bytearray(TABLE_SIZE)
+    # moves of the lone king not yet known to lose
+    remaining = [0] * TABLE_SIZE
+    values = [0] * TABLE_SIZE
+    resolved = bytearray(TABLE_SIZE)
+    processed = bytearray(TABLE_SIZE)
+
+    # positions resolved at every distance to mate, in plies
+    levels = {0: []}
+
+    for king in range(64):
+        for lone_king in range(64):
+            for piece in range(64):
+                for stronger_to_move in (True, False):
+                    if not is_legal_position(piece_type, stronger_to_move, king, lone_king, piece):
+                        continue
+                    index = table_index(stronger_to_move, king, lone_king, piece)
+                    legal[index] = 1
+
+                    if stronger_to_move:
+                        if piece_type == "P" and piece // 8 == 1 and promotion_tables is not None:
+                            add_promotion(index, king, lone_king, piece, promotion_tables, levels)
+                        continue
+
+                    attacked = KING_ATTACKS[king] | piece_attacks(piece_type, piece, 1 << king | 1 << piece)
+                    moves = KING_ATTACKS[lone_king] & ~attacked
+                    remaining[index] = bin(moves).count("1")
+                    if not moves and attacked >> lone_king & 1:
+                        # mated
+                        values[index] = -1
+                        resolved[index] = 1
+                        levels[0].append(index)
+
+    distance = 0
+    while levels:
+        for index in levels.pop(distance, []):
+            # positions queued by a promotion may already be resolved at a shorter distance
+            if processed[index]:
+                continue
+            processed[index] = 1
+            resolved[index] = 1
+            values[index] = distance if distance % 2 else -distance - 1
+
+            king, lone_king, piece = index >> 12 & 63, index >> 6 & 63, index & 63
+            occupied = 1 << king | 1 << lone_king | 1 << piece
+
+            if index >> 18:
+                # the lone king to move loses, so the move of the stronger side leading here wins
+                for predecessor in unmoves_of_stronger_side(piece_type, king, lone_king, piece, occupied):
+                    if legal[predecessor] and not resolved[predecessor]:
+                        resolved[predecessor] = 1
+                        values[predecessor] = distance + 1
+                        levels.setdefault(distance + 1, []).append(predecessor)
+            else:
+                # the stronger side wins, one less move of the lone king left to escape
+                for square in iterate_bits(KING_ATTACKS[lone_king] & ~occupied):
+                    predecessor = table_index(False, king, square, piece)
+                    if legal[predecessor] and not resolved[predecessor]:
+                        remaining[predecessor] -= 1
+                        if remaining[predecessor] == 0:
+                            resolved[predecessor] = 1
+                            values[predecessor] = -distance - 2
+                            levels.setdefault(distance + 1, []).append(predecessor)
+        distance += 1
+
+    if max(values) > 127 or min(values) < -128:
+        raise ValueError("distance to mate does not fit in a byte")
+
+    return bytearray(value & 0xFF for value in values)
+
+
+def add_promotion(index, king, lone_king, piece, promotion_tables, levels):
+    """
+        Queues a pawn position of the stronger side at the shortest mate reached by promoting, if any.
+    """
+
+    square = piece - 8
+    if square == king or square == lone_king:
+        return
+
+    best = None
+    for table in promotion_tables:
+        value = decode(table[table_index(False, king, lone_king, square)])
+        if value < 0:
+            # mated in -value - 1 plies after the promotion
+            plies = -value
+            best = plies if best is None else min(best, plies)
+
+    if best is not None:
+        levels.setdefault(best, []).append(index)
+
+
+def unmoves_of_stronger_side(piece_type, king, lone_king, piece, occupied):
+    """
+        Returns list of indexes of positions, stronger side to move, that reach this position by a move of the stronger side
+    """
+
+    predecessors = [table_index(True, square, lone_king, piece) for square in iterate_bits(KING_ATTACKS[king] & ~occupied)]
+
+    if piece_type == "P":
+        # pawns move up the board, towards lower squares
+        behind = piece + 8
+        if behind < 56 and not occupied >> behind & 1:
+            predecessors.append(table_index(True, king, lone_king, behind))
+            if piece // 8 == 4 and not occupied >> (behind + 8) & 1:
+                predecessors.append(table_index(True, king, lone_king, behind + 8))
+    else:
+        for square in iterate_bits(piece_attacks(piece_type, piece, occupied) & ~occupied):
+            predecessors.append(table_index(True, king, lone_king, square))
+
+    return predecessors
+
+
+def iterate_bits(bitboard):
+    """
+        Yields square of every set bit.
+    """
+
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+def decode(byte):
+    """
+        Returns signed table value of a stored byte
+    """
+
+    return byte - 256 if byte > 127 else byte
+
+
+def generate_tablebases(path=DEFAULT_PATH, quiet=False):
+    """
+        Generates all tables and writes them to a single file, a header and directory followed by the tables.
+
+        Returns dict of table by name
+    """
+
+    tables = {}
+    for name, piece_type in MATERIALS.items():
+        start = time.perf_counter()
+        promotion_tables = [tables["KQK"], tables["KRK"]] if piece_type == "P" else None
+        tables[name] = generate_table(piece_type, promotion_tables)
+        if not quiet:
+            longest = max(decode(byte) for byte in tables[name])
+            sys.stderr.write(f"{name}: longest mate {longest} plies, {time.perf_counter() - start:.1f}s\n")
+
+    offset = HEADER.size + DIRECTORY_ENTRY.size * len(tables)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(tables)))
+        for name, table in tables.items():
+            f.write(DIRECTORY_ENTRY.pack(name.encode("ascii"), offset, len(table)))
+            offset += len(table)
+        for table in tables.values():
+            f.write(table)
+
+    return tables
+
+
+class Tablebase:
+    """
+        Win, draw or loss and distance to mate of positions of a king and a queen, rook or pawn against a lone king,
+        read from a file written by generate_tablebases. The file is opened with mmap and a probe reads a single byte.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a tablebase file")
+
+        # offset of every table by the piece of the stronger side
+        self.offsets = {}
+        for i in range(count):
+            name, offset, size = DIRECTORY_ENTRY.unpack_from(self.data, HEADER.size + i * DIRECTORY_ENTRY.size)
+            self.offsets[MATERIALS[name.rstrip(b"\0").decode("ascii")]] = offset
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+            Unmaps and closes the tablebase file.
+        """
+
+        self.data.close()
+        self.file.close()
+
+    def lookup(self, piece_type, stronger_color, side_to_move, king, lone_king, piece):
+        """
+            Reads the result of a position by its squares, counted from a8. Positions where black is
+            the stronger side are mirrored so the stronger side plays up the board.
+
+            Returns (WIN, DRAW or LOSS for the side to move, plies to mate, 0 for a draw), None if there is no table
+        """
+
+        offset = self.offsets.get(piece_type)
+        if offset is None:
+            return None
+
+        if stronger_color == "b":
+            king, lone_king, piece = king ^ 56, lone_king ^ 56, piece ^ 56
+
+        value = decode(self.data[offset + table_index(side_to_move == stronger_color, king, lone_king, piece)])
+        if value > 0:
+            return WIN, value
+        if value < 0:
+            return LOSS, -value - 1
+        return DRAW, 0
+
+    def probe_pieces(self, pieces, side_to_move, castling_ability="-"):
+        """
+            Probes the position of Chess.pieces, a list of Piece objects by color.
+
+            Returns (WIN, DRAW or LOSS for the side to move, plies to mate), None if the material has no table
+            or castling is still possible
+        """
+
+        if castling_ability != "-" or len(pieces["w"]) + len(pieces["b"]) != 3:
+            return None
+
+        stronger_color = "w" if len(pieces["w"]) == 2 else "b"
+        king = lone_king = piece = piece_type = None
+        for color, color_pieces in pieces.items():
+            for p in color_pieces:
+                square = p.pos[0] * 8 + p.pos[1]
+                if p.piece_type.upper() == "K":
+                    if color == stronger_color:
+                        king = square
+                    else:
+                        lone_king = square
+                else:
+                    piece, piece_type = square, p.piece_type.upper()
+
+        if king is None or lone_king is None or piece is None:
+            return None
+
+        return self.lookup(piece_type, stronger_color, side_to_move, king, lone_king, piece)
+
+    def probe(self, position):
+        """
+            Probes a Bitboard object.
+
+            Returns (WIN, DRAW or LOSS for the side to move, plies to mate), None if the material has no table
+            or castling is still possible
+        """
+
+        occupied = position.occupancy["w"] | position.occupancy["b"]
+        if position.castling or bin(occupied).count("1") != 3:
+            return None
+
+        bitboards = position.bitboards
+        for piece_type in self.offsets:
+            for stronger_color, own, lone in (("w", piece_type, "k"), ("b", piece_type.lower(), "K")):
+                if bitboards[own]:
+                    king = bitboards["K" if stronger_color == "w" else "k"]
+                    if not king or not bitboards[lone]:
+                        return None
+                    return self.lookup(piece_type, stronger_color, position.side_to_move, king.bit_length() - 1,
+                                       bitboards[lone].bit_length() - 1, bitboards[own].bit_length() - 1)
+
+        return None
+
+
+def format_result(result, side_to_move):
+    """
+        Formats a probe result, e.g. "White wins, mate in 5" or "Draw".
+
+        Returns result string
+    """
+
+    outcome, plies = result
+    if outcome == DRAW:
+        return "Draw"
+
+    winner = side_to_move if outcome == WIN else ("b" if side_to_move == "w" else "w")
+    return f"{'White' if winner == 'w' else 'Black'} wins, mate in {(plies + 1) // 2}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate KQK, KRK and KPK tablebases, or probe a position.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="generate the tables")
+    generate_parser.add_argument("-o", "--output", default=DEFAULT_PATH, help="tablebase file to write")
+
+    probe_parser = subparsers.add_parser("probe", help="probe a position")
+    probe_parser.add_argument("fen")
+    probe_parser.add_argument("--tablebase", default=DEFAULT_PATH, help="tablebase file")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate_tablebases(args.output)
+    else:
+        position = Bitboard(args.fen)
+        with Tablebase(args.tablebase) as tablebase:
+            result = tablebase.probe(position)
+            print("Not in the tablebases" if result is None else format_result(result, position.side_to_move))
@@ -0,0 +1,139 @@
+import pytest
+from bitboard import STARTING_FEN
+from game import Game
+from archive import ArchiveWriter, GameArchive, HEADER, MAGIC, OFFSET, import_pgn, replay_pgn_game
+
+ILLEGAL_GAME = """[Event "Illegal"]
+
+1. e4 e5 2. Nf3 Nc6 3. Bb5 Ke6 4. O-O *
+"""
+
+LEGAL_GAME = """[Event "Legal"]
+[Result "1-0"]
+
+1. e4 e5 2. Bc4 Nc6 3. Qh5 Nf6 4. Qxf7# 1-0
+"""
+
+
+def play(moves, fen=STARTING_FEN):
+    game = Game(fen)
+    for notation in moves:
+        game.push(notation)
+    return game
+
+
+def write_games(path, games):
+    with ArchiveWriter(path) as writer:
+        for moves, result, tags, _ in games:
+            writer.add_game(moves, result, tags)
+
+
+def archive_games():
+    games = [
+        (play(["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7"]), "1-0", {"White": "A", "Black": "B"}),
+        (play([]), "*", {}),
+        (play(["Kd5", "Ra5"], "8/8/8/4k3/8/8/8/R3K3 b - - 0 7"), "*", {"FEN": "8/8/8/4k3/8/8/8/R3K3 b - - 0 7"}),
+    ]
+    return [([record[0] for record in game.position.history], result, tags, game) for game, result, tags in games]
+
+
+def test_archive_round_trip(tmp_path):
+    path = str(tmp_path / "games.cga")
+    games = archive_games()
+    write_games(path, games)
+
+    with GameArchive(path) as archive:
+        assert len(archive) == len(games)
+        for number, (moves, result, tags, game) in enumerate(games):
+            assert list(archive.moves(number)) == moves
+            assert archive.result(number) == result
+            assert archive.tags(number) == tags
+            assert archive.position(number).fen() == game.fen()
+            for ply, move in enumerate(moves):
+                assert archive.move(number, ply) == move
+            assert f"{result}\n" in archive.pgn(number)
+
+        assert archive.position(0, 2).fen() == play(["e4", "e5"]).fen()
+        with pytest.raises(IndexError):
+            archive.position(0, len(games[0][0]) + 1)
+        with pytest.raises(IndexError):
+            archive.move(1, 0)
+        with pytest.raises(IndexError):
+            archive.moves(len(games))
+
+
+def test_archive_recovery(tmp_path):
+    path = str(tmp_path / "games.cga")
+    games = archive_games()
+    write_games(path, games)
+
+    # stopped after writing the index but before the header
+    with open(path, "r+b") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+    with pytest.raises(ValueError):
+        GameArchive(path)
+    with ArchiveWriter(path, append=True) as writer:
+        assert len(writer) == len(games)
+
+    # stopped after adding a game and part of another
+    writer = ArchiveWriter(path, append=True)
+    writer.add_game(games[0][0], "1-0")
+    writer.file.write(b"\x05\x00")
+    writer.file.flush()
+    with ArchiveWriter(path, append=True) as recovered:
+        assert len(recovered) == len(games) + 1
+    writer.file.close()
+
+    with GameArchive(path) as archive:
+        assert len(archive) == len(games) + 1
+        assert list(archive.moves(len(games))) == games[0][0]
+
+
+def test_recovery_after_index_cut_short(tmp_path):
+    path = str(tmp_path / "games.cga")
+    games = archive_games()
+    write_games(path, games)
+    with open(path, "rb") as f:
+        data = f.read()
+    index_offset = HEADER.unpack_from(data)[2]
+
+    # stopped while writing the index, so the header still marks the archive as not closed
+    for length in range(0, (len(games) + 1) * OFFSET.size, 3):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, 0, 0) + data[HEADER.size:index_offset + length])
+        with ArchiveWriter(path, append=True) as writer:
+            assert len(writer) == len(games)
+        with GameArchive(path) as archive:
+            assert [list(archive.moves(number)) for number in range(len(archive))] == [game[0] for game in games]
+
+
+def test_replay_stops_or_raises_at_an_illegal_move():
+    tags, moves, san_moves, result = replay_pgn_game(ILLEGAL_GAME)
+    assert tags == {"Event": "Illegal"} and result == "*"
+    assert san_moves == ["e4", "e5", "Nf3", "Nc6", "Bb5"] and len(moves) == 5
+
+    with pytest.raises(ValueError, match=r"move 3\.\.\. illegal move 'Ke6'"):
+        replay_pgn_game(ILLEGAL_GAME, strict=True)
+    with pytest.raises(ValueError, match="FEN tag"):
+        replay_pgn_game('[FEN "8/8/8 w - - 0 1"]\n\n1. e4 *\n', strict=True)
+
+
+def test_import_leaves_out_games_with_illegal_moves(tmp_path, capsys):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(LEGAL_GAME + "\n" + ILLEGAL_GAME + "\n" + LEGAL_GAME)
+    path = str(tmp_path / "games.cga")
+
+    assert import_pgn([str(pgn_path)], path) == (2, 1)
+    error = capsys.readouterr().err
+    assert f"{pgn_path}: game 2: move 3... illegal move 'Ke6', left out" in error
+    assert "2 games written" in error and "1 left out" in error
+
+    with GameArchive(path) as archive:
+        assert len(archive) == 2
+        assert archive.result(1) == "1-0" and archive.tags(1) == {"Event": "Legal"}
+        assert archive.position(1).fen() == play(["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7"]).fen()
+
+    assert import_pgn([str(pgn_path)], path, append=True, quiet=True) == (2, 1)
+    assert capsys.readouterr().err == ""
+    with GameArchive(path) as archive:
+        assert len(archive) == 4
@@ -0,0 +1,49 @@
+import random
+import pickle
+import attacks
+from attacks import (rook_attacks, bishop_attacks, queen_attacks, sliding_attacks, load_slider_tables, KNIGHT_ATTACKS,
+                     KING_ATTACKS, PAWN_ATTACKS, LINEAR_RAYS, DIAGONAL_RAYS, BETWEEN, CACHE_VERSION)
+from bitboard import SQUARE_NAMES
+
+
+def squares(*names):
+    return sum(1 << SQUARE_NAMES.index(name) for name in names)
+
+
+def test_step_attacks():
+    assert KNIGHT_ATTACKS[SQUARE_NAMES.index("a1")] == squares("b3", "c2")
+    assert KING_ATTACKS[SQUARE_NAMES.index("h8")] == squares("g8", "g7", "h7")
+    assert PAWN_ATTACKS["w"][SQUARE_NAMES.index("a2")] == squares("b3")
+    assert PAWN_ATTACKS["b"][SQUARE_NAMES.index("e7")] == squares("d6", "f6")
+    assert BETWEEN[SQUARE_NAMES.index("a1")][SQUARE_NAMES.index("d4")] == squares("b2", "c3")
+    assert BETWEEN[SQUARE_NAMES.index("a1")][SQUARE_NAMES.index("b3")] == 0
+
+
+def test_slider_tables_equal_ray_walks():
+    rng = random.Random(2)
+    for _ in range(2000):
+        square = rng.randrange(64)
+        occupied = rng.getrandbits(64) & rng.getrandbits(64)
+        rook = sliding_attacks(square, occupied, LINEAR_RAYS)
+        bishop = sliding_attacks(square, occupied, DIAGONAL_RAYS)
+        assert rook_attacks(square, occupied) == rook
+        assert bishop_attacks(square, occupied) == bishop
+        assert queen_attacks(square, occupied) == rook | bishop
+
+    assert rook_attacks(SQUARE_NAMES.index("d4"), squares("d6", "b4")) == \
+        squares("d5", "d6", "d3", "d2", "d1", "c4", "b4", "e4", "f4", "g4", "h4")
+
+
+def test_cache_is_written_and_reused(tmp_path):
+    path = str(tmp_path / "cache" / "tables.pickle")
+    tables = load_slider_tables(path)
+    with open(path, "rb") as f:
+        assert pickle.load(f)[0] == CACHE_VERSION
+    assert load_slider_tables(path)[1] == tables[1] == attacks.ROOK_TABLES
+
+    # a damaged or outdated cache is rebuilt
+    with open(path, "wb") as f:
+        f.write(b"damaged")
+    assert load_slider_tables(path)[3] == attacks.BISHOP_TABLES
+    with open(path, "rb") as f:
+        assert pickle.load(f)[0] == CACHE_VERSION
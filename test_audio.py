@@ -0,0 +1,75 @@
+import audio
+from audio import Audio
+
+
+class FakeMixer:
+    """
+        Stands in for pygame.mixer, counting how often sounds are decoded and played.
+    """
+
+    decoded = []
+    played = []
+
+    class Sound:
+        def __init__(self, path):
+            FakeMixer.decoded.append(path)
+            self.path = path
+
+        def play(self):
+            FakeMixer.played.append(self.path)
+
+        def get_length(self):
+            return 0.0
+
+
+def write_sounds(directory):
+    for name in ("move.mp3", "failed_move.mp3"):
+        (directory / name).write_bytes(b"ID3")
+    return str(directory)
+
+
+def finish(sounds):
+    worker = sounds.worker
+    sounds.queue.put(None)
+    worker.join(5)
+    assert not worker.is_alive()
+
+
+def test_sounds_are_decoded_once_and_played_from_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "load_mixer", lambda: FakeMixer)
+    FakeMixer.decoded, FakeMixer.played = [], []
+    sounds = Audio(directory=write_sounds(tmp_path))
+    for name in ("move", "failed_move", "move"):
+        sounds.play(name)
+    finish(sounds)
+
+    assert sorted(FakeMixer.decoded) == sorted(str(tmp_path / name) for name in ("move.mp3", "failed_move.mp3"))
+    assert len(FakeMixer.played) + sounds.dropped == 3 and sounds.enabled
+
+
+def test_playsound_fallback_and_errors_turn_sound_off(tmp_path, monkeypatch):
+    played = []
+
+    def failing_playsound(path):
+        played.append(path)
+        raise OSError("no audio device")
+
+    monkeypatch.setattr(audio, "load_mixer", lambda: None)
+    monkeypatch.setattr(audio, "load_playsound", lambda: failing_playsound)
+    sounds = Audio(directory=write_sounds(tmp_path))
+    sounds.play("move")
+    sounds.worker.join(5)
+    assert played == [str(tmp_path / "move.mp3")] and not sounds.enabled
+
+    # after turning off, sounds are skipped and close does not block
+    sounds.play("move")
+    sounds.close()
+
+
+def test_disabled_or_missing_sounds_are_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio, "load_mixer", lambda: FakeMixer)
+    assert not Audio(enabled=False).enabled
+    sounds = Audio(directory=str(tmp_path))
+    sounds.play("move")
+    assert sounds.worker is None
+    sounds.close()
@@ -0,0 +1,61 @@
+import pytest
+from bitboard import STARTING_FEN
+from batch import split_record, parse_positions, format_results, run
+
+EPD_LINE = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - bm e4; id "start";'
+KINGS_FEN = "4k3/8/8/8/8/8/8/4K3 w - - 0 1"
+
+
+class RejectedPosition:
+    """
+        Position that fails while formatting, like a record the generator cannot handle.
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+    def fen(self):
+        raise self.error
+
+
+def test_split_record():
+    assert split_record(STARTING_FEN) == (STARTING_FEN, "")
+    assert split_record(EPD_LINE) == ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq -", 'bm e4; id "start";')
+    assert split_record(KINGS_FEN + ' c0 "x";') == (KINGS_FEN, 'c0 "x";')
+    assert split_record("8/8/8/8/8/8/8/8 w - -") == ("8/8/8/8/8/8/8/8 w - -", "")
+
+
+def test_format_results():
+    lines = [(1, EPD_LINE), (2, KINGS_FEN), (3, "8/8/8/8 w - - 0 1")]
+    results = list(format_results(parse_positions(lines), normalize=True, moves=True, san=True))
+
+    assert results[0][1].startswith(STARTING_FEN + ' bm e4; id "start";\t20\t')
+    line_number, output, error = results[1]
+    assert output.split("\t")[:2] == [KINGS_FEN, "5"] and error is None
+    assert sorted(output.split("\t")[2].split()) == ["Kd1", "Kd2", "Ke2", "Kf1", "Kf2"]
+    assert results[2][0] == 3 and results[2][1] is None and results[2][2].startswith("line 3: ")
+
+
+def test_format_errors_are_reported_and_bugs_propagate():
+    records = [(1, "x", RejectedPosition(ValueError("bad")), "", None), (2, KINGS_FEN, None, "", "kept going")]
+    results = list(format_results(records, normalize=True))
+    assert results[0] == (1, None, "line 1: ValueError: bad: x")
+    assert results[1] == (2, None, f"line 2: kept going: {KINGS_FEN}")
+
+    with pytest.raises(AttributeError):
+        list(format_results([(1, "x", RejectedPosition(AttributeError("bug")), "", None)], normalize=True))
+
+
+def test_run_streams_files(tmp_path):
+    source = tmp_path / "positions.epd"
+    source.write_text(f"# comment\n{EPD_LINE}\n\nnot a position\n{KINGS_FEN}\n")
+    output = tmp_path / "out.txt"
+    errors = tmp_path / "errors.txt"
+
+    assert run(str(source), str(output), str(errors), moves=True, quiet=True)[:2] == (3, 1)
+    lines = output.read_text().splitlines()
+    assert lines[0].startswith(EPD_LINE + "\t20\t") and lines[1] == "invalid" and lines[2].startswith(KINGS_FEN + "\t5\t")
+    assert errors.read_text().startswith("line 4: ")
+
+    run(str(source), str(output), str(errors), skip_invalid=True, quiet=True)
+    assert output.read_text().splitlines() == [EPD_LINE, KINGS_FEN]
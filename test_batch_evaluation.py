@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bitboard import Bitboard
+from compact import CompactPosition, random_fens
+from evaluation import evaluate
+from batch_evaluation import (evaluate_batch, evaluate_boards, evaluate_planes, boards_from_fens, boards_to_planes,
+                              placement_error, run)
+
+INVALID_FENS = {
+    "8/8/8/8 w - - 0 1": "does not have 8 ranks",
+    "4k3/8/8/8/8/8/8/4K2x w - - 0 1": "has invalid character 'x'",
+    "4k3/8/8/8/8/8/8/4K4 w - - 0 1": "has rank '4K4' without 8 squares",
+    "4k3/8/8/8/8/8/8/4K.2 w - - 0 1": "has invalid character '.'",
+}
+
+
+def test_batch_scores_equal_evaluate():
+    fens = random_fens(500, seed=23)
+    expected = [evaluate(Bitboard(fen)) for fen in fens]
+    assert evaluate_batch(fens).tolist() == expected
+    assert evaluate_batch([Bitboard(fen) for fen in fens[:50]]).tolist() == expected[:50]
+    assert evaluate_batch([CompactPosition.from_fen(fen) for fen in fens[:50]]).tolist() == expected[:50]
+
+    boards, white_to_move = boards_from_fens(fens)
+    assert evaluate_planes(boards_to_planes(boards), white_to_move).tolist() == expected
+    assert evaluate_boards(boards.reshape(-1, 8, 8), white_to_move).tolist() == expected
+
+
+def test_invalid_placements_are_named():
+    for fen, error in INVALID_FENS.items():
+        assert placement_error(fen) == error
+        with pytest.raises(ValueError, match=error.replace("'", ".")):
+            boards_from_fens(["4k3/8/8/8/8/8/8/4K3 w - - 0 1", fen])
+    assert placement_error("4k3/8/8/8/8/8/8/4K3 w - - 0 1") is None
+
+
+def test_run_skips_blank_lines_and_reports_invalid_ones(tmp_path, capsys):
+    fens = random_fens(20, seed=29)
+    lines = fens[:5] + ["", "   "] + list(INVALID_FENS) + fens[5:]
+    source = tmp_path / "positions.fen"
+    source.write_text("\n".join(lines) + "\n")
+    output = tmp_path / "scores.txt"
+
+    count, invalid, _ = run(str(source), str(output), chunk_size=7, quiet=True)
+    assert (count, invalid) == (len(fens) + len(INVALID_FENS), len(INVALID_FENS))
+    scores = output.read_text().splitlines()
+    assert scores.count("invalid") == len(INVALID_FENS)
+    assert [int(score) for score in scores if score != "invalid"] == [evaluate(Bitboard(fen)) for fen in fens]
+    assert "line 8: FEN does not have 8 ranks" in capsys.readouterr().err
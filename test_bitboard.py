@@ -0,0 +1,170 @@
+import pytest
+from bitboard import Bitboard, SquareSet, STARTING_FEN, normalize_san, move_to_uci
+from chess import Chess
+from compact import random_fens
+from game_io import NullOutput
+
+# three white knights can reach d3, two of them d5
+DISAMBIGUATION_FEN = "4k3/8/8/8/1N3N2/8/1N6/R3K2R w - - 0 1"
+PROMOTION_FEN = "1n2k3/P7/8/8/8/8/8/4K3 w - - 0 1"
+KIWIPETE_FEN = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+EN_PASSANT_FEN = "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"
+
+
+def test_normalize_san():
+    assert normalize_san("0-0+") == "O-O"
+    assert normalize_san("0-0-0#") == "O-O-O"
+    assert normalize_san("e8Q") == "e8=Q"
+    assert normalize_san("Nf3!?") == "Nf3"
+    assert normalize_san("Rd1") == "Rd1"
+
+
+def test_san_index_matches_san_and_parse_san():
+    for fen in random_fens(200, seed=7) + [DISAMBIGUATION_FEN, PROMOTION_FEN]:
+        position = Bitboard(fen)
+        index = position.san_index()
+        legal_moves = position.generate_legal_moves()
+        assert sorted(index.values()) == sorted(legal_moves)
+        for notation, move in index.items():
+            assert position.san(move).rstrip("+#") == notation
+            assert position.parse_san(notation) == move
+            assert position.resolve_san(notation + "+", index) == move
+
+
+def test_disambiguation_and_promotion():
+    position = Bitboard(DISAMBIGUATION_FEN)
+    index = position.san_index()
+    assert {"N2d3", "Nbd5", "Nfd5", "Nb4d3", "Nfd3"} <= set(index)
+
+    # needless disambiguation is valid notation, resolved by parsing
+    assert move_to_uci(position.resolve_san("Nfe2", index)) == "f4e2"
+    assert position.resolve_san("Nd3", index) is None
+    with pytest.raises(ValueError):
+        position.parse_san("Nd3")
+
+    position = Bitboard(PROMOTION_FEN)
+    index = position.san_index()
+    assert {"a8=Q", "a8=N", "axb8=R"} <= set(index)
+    assert move_to_uci(position.resolve_san("a8Q", index)) == "a7a8q"
+    assert move_to_uci(position.resolve_san("axb8N", index)) == "a7b8n"
+    assert position.resolve_san("a8", index) is None
+
+
+def test_repetition():
+    position = Bitboard(STARTING_FEN)
+    for notation in ["Nf3", "Nf6", "Ng1", "Ng8"]:
+        assert not position.is_repetition()
+        position.make_move(position.parse_san(notation))
+    assert position.is_repetition()
+
+
+def test_generate_moves_equals_piece_movement():
+    for fen in random_fens(100, seed=11):
+        chess = Chess(fen, use_bitboards=False, output=NullOutput(), render=False, sound=False, start=False)
+        position = Bitboard(fen)
+        for color in ("w", "b"):
+            targets = position.generate_moves(color)
+            for piece in chess.pieces[color]:
+                piece.generate_legal_moves(chess.board)
+                assert sorted(piece.legal_moves) == sorted(SquareSet(targets[piece.pos[0] * 8 + piece.pos[1]])), fen
+
+
+def test_square_set():
+    squares = SquareSet(Bitboard(STARTING_FEN).generate_moves("w")[57])
+    assert "c3" in squares and "d2" not in squares and len(squares) == 2 and sorted(squares) == ["a3", "c3"]
+
+
+def snapshot(position):
+    return (dict(position.bitboards), dict(position.occupancy), list(position.squares), position.fen(), position.hash)
+
+
+def test_unmake_move_restores_every_move():
+    for fen in [KIWIPETE_FEN, PROMOTION_FEN, EN_PASSANT_FEN] + random_fens(30, seed=13):
+        position = Bitboard(fen)
+        before = snapshot(position)
+        for move in position.generate_legal_moves():
+            position.make_move(move)
+            assert position.unmake_move() == move
+            assert snapshot(position) == before
+
+
+def test_special_moves():
+    position = Bitboard(KIWIPETE_FEN)
+    position.make_move(position.parse_san("O-O-O"))
+    assert position.fen() == "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/2KR3R b kq - 1 1"
+    position.make_move(position.parse_san("Bxe2"))
+    assert position.fen().split()[2] == "kq"
+
+    position = Bitboard(EN_PASSANT_FEN)
+    position.make_move(position.parse_san("exf6"))
+    assert position.fen() == "rnbqkbnr/ppp1p1pp/5P2/3p4/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 3"
+
+    position = Bitboard(PROMOTION_FEN)
+    position.make_move(position.parse_san("axb8=N"))
+    assert position.fen() == "1N2k3/8/8/8/8/8/8/4K3 b - - 0 1"
+
+    # a captured rook takes its castling right with it
+    position = Bitboard("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    position.make_move(position.parse_san("Rxa8+"))
+    assert position.fen().split()[2] == "Kk"
+
+
+def test_validate():
+    for fen in ["4k3/8/8/8/8/8/8/8 w - - 0 1", "4k3/8/8/8/8/8/8/P3K3 w - - 0 1", "4k3/4Q3/8/8/8/8/8/4K3 w - - 0 1",
+                "4k3/8/8/8/8/8/8/4K3 w K - 0 1", "4k3/8/8/8/8/8/8/4K3 w - e6 0 1"]:
+        with pytest.raises(ValueError):
+            Bitboard(fen).validate()
+    Bitboard(EN_PASSANT_FEN).validate()
+
+
+def test_attack_maps_are_cached_per_position():
+    for fen in [KIWIPETE_FEN] + random_fens(30, seed=17):
+        position = Bitboard(fen)
+        for color in ("w", "b"):
+            expected = [square for square in range(64) if position.is_square_attacked(square, color)]
+            attack_map = position.attack_map(color)
+            assert [square for square in range(64) if attack_map >> square & 1] == expected
+            assert position.attack_maps[color] == attack_map
+
+    position = Bitboard(KIWIPETE_FEN)
+    move = position.parse_san("Qxf6")
+    attack_map = position.attack_map("w")
+    position.make_move(move)
+    assert position.attack_maps == {}
+    assert position.attack_map("w") != attack_map
+    position.unmake_move()
+    assert position.attack_maps["w"] == attack_map
+
+
+def test_castling_through_attacked_squares():
+    # the black rook on f8 covers f1, the king may castle queenside but not kingside
+    position = Bitboard("4kr2/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    assert [position.san(move) for move in position.generate_legal_moves() if move >> 12 in (2, 3)] == ["O-O-O"]
+    # a rook on b1 attacked is no reason not to castle queenside
+    position = Bitboard("1r2k3/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    assert sorted(position.san(move) for move in position.generate_legal_moves() if move >> 12 in (2, 3)) == ["O-O", "O-O-O"]
+    # in check the king may not castle
+    position = Bitboard("4r1k1/8/8/8/8/8/8/R3K2R w KQ - 0 1")
+    assert not [move for move in position.generate_legal_moves() if move >> 12 in (2, 3)]
+
+
+def test_legal_moves_equal_make_and_test():
+    fens = [KIWIPETE_FEN, EN_PASSANT_FEN, PROMOTION_FEN] + random_fens(400, seed=19)
+    for fen in fens:
+        position = Bitboard(fen)
+        assert sorted(position.generate_legal_moves()) == sorted(position.generate_legal_moves_by_testing()), fen
+
+
+def test_pins_checks_and_en_passant():
+    # the bishop is pinned along the file by the rook and cannot move
+    position = Bitboard("4r1k1/8/8/8/8/8/4B3/4K3 w - - 0 1")
+    assert not [move for move in position.generate_legal_moves() if move & 63 == 52]
+    # double check, only the king moves
+    position = Bitboard("4k3/8/8/8/8/5n2/8/r3K2R w K - 0 1")
+    assert {move & 63 for move in position.generate_legal_moves()} == {60}
+    # a knight check is answered by capturing the knight or moving the king
+    position = Bitboard("4k3/8/8/8/8/3n4/8/R3K3 w - - 0 1")
+    assert {position.san(move) for move in position.generate_legal_moves()} == {"Kd1", "Kd2", "Ke2", "Kf1"}
+    # en passant would uncover the rook on the rank of both pawns
+    position = Bitboard("8/8/8/K2pP2r/8/8/8/7k w - d6 0 1")
+    assert "exd6" not in [position.san(move) for move in position.generate_legal_moves()]
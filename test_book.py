@@ -0,0 +1,85 @@
+import random
+import pytest
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+from book import OpeningBook, build_book, write_book, ENTRY
+from zobrist import compute_hash
+
+GAMES = """[Result "1-0"]
+
+1. d4 Nf6 2. c4 e6 1-0
+
+[Result "0-1"]
+
+1. c4 Nf6 2. d4 g6 0-1
+
+[Result "1/2-1/2"]
+
+1. e4 e5 1/2-1/2
+
+[Result "1-0"]
+
+1. e4 c5 2. Nf3 1-0
+"""
+
+
+def position_after(moves, fen=STARTING_FEN):
+    position = Bitboard(fen)
+    for notation in moves:
+        position.make_move(position.parse_san(notation))
+    return position
+
+
+def build(tmp_path):
+    source = tmp_path / "games.pgn"
+    source.write_text(GAMES)
+    path = str(tmp_path / "games.bin")
+    assert build_book([str(source)], path, quiet=True)[0] == 4
+    return path
+
+
+def test_book_moves_by_position(tmp_path):
+    with OpeningBook(build(tmp_path)) as book:
+        assert [(move_to_uci(move), weight) for move, weight in book.moves(Bitboard(STARTING_FEN))] == \
+            [("e2e4", 3), ("d2d4", 2)]
+        # both move orders reach the same position and share its entries, e6 lost and is left out with weight 0
+        assert [move_to_uci(move) for move, _ in book.moves(position_after(["d4", "Nf6", "c4"]))] == ["g7g6"]
+        assert book.moves(position_after(["c4", "Nf6", "d4"])) == book.moves(position_after(["d4", "Nf6", "c4"]))
+        assert book.moves(position_after(["a3"])) == []
+        assert book.choose(position_after(["a3"])) is None
+        assert move_to_uci(book.choose(Bitboard(STARTING_FEN), random.Random(1))) in ("e2e4", "d2d4")
+
+
+def test_binary_search_finds_every_key(tmp_path):
+    rng = random.Random(3)
+    keys = sorted({rng.getrandbits(64) | 1 for _ in range(300)} - {(1 << 64) - 1})
+    counts = {(key, move): 1 + move for key in keys for move in range(1 + key % 3)}
+    path = str(tmp_path / "keys.bin")
+    assert write_book(counts, path) == len(counts)
+
+    with OpeningBook(path) as book:
+        assert len(book) == len(counts)
+        for key in keys:
+            assert book.entries(key) == [(move, 1 + move) for move in reversed(range(1 + key % 3))]
+        assert book.entries(keys[0] - 1) == [] and book.first_entry(keys[-1] + 1) == len(book)
+
+
+def test_invalid_and_empty_books(tmp_path):
+    path = tmp_path / "broken.bin"
+    path.write_bytes(b"\x00" * (ENTRY.size + 1))
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
+
+    path.write_bytes(b"")
+    with OpeningBook(str(path)) as book:
+        assert len(book) == 0 and book.moves(Bitboard(STARTING_FEN)) == []
+
+
+def test_en_passant_file_only_hashed_when_capturable():
+    # no black pawn can take on e3, the key equals the position without an en passant square
+    position = position_after(["e4"])
+    assert position.hash == compute_hash(position) == Bitboard(position.fen().replace(" e3 ", " - ")).hash
+
+    # the pawn on e5 can take on d6
+    position = position_after(["e4", "Nf6", "e5", "d5"])
+    assert position.fen().split()[3] == "d6"
+    assert position.hash == compute_hash(position) != Bitboard(position.fen().replace(" d6 ", " - ")).hash
@@ -0,0 +1,45 @@
+import io
+from chess import Chess
+from game_io import ScriptedInput, NullOutput
+
+SCHOLARS_MATE = ["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6", "Qxf7#"]
+
+
+def play(moves, fen=None, use_bitboards=True, render=False):
+    output = io.StringIO()
+    game = Chess(fen, use_bitboards=use_bitboards, input_source=ScriptedInput(moves), output=output,
+                 render=render, sound=False)
+    return game, output.getvalue()
+
+
+def test_scripted_game_until_checkmate():
+    for use_bitboards in (True, False):
+        game, text = play(SCHOLARS_MATE + ["q"], use_bitboards=use_bitboards)
+        assert game.fen() == "r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4"
+        # the move generator of the pieces does not look for checkmate
+        assert ("Checkmate\n" if use_bitboards else "Check\n") in text
+        assert text.endswith("FEN: " + game.fen() + "\n")
+
+
+def test_illegal_moves_are_reported_and_skipped():
+    game, text = play(["e5", "e4", "Ke2", "O-O", "e5"])
+    assert "Move 'e5' is not legal" in text and "Move 'O-O' is not legal" in text
+    assert game.fen() == "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2"
+
+
+def test_long_script_runs_without_recursion():
+    # far more moves than the recursion limit, the loop ends when the script runs out
+    game, _ = play(["Nf3", "Nf6", "Ng1", "Ng8"] * 400)
+    assert game.fen().startswith("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 1600 ")
+
+
+def test_setup_without_starting_the_loop():
+    game = Chess("4k3/8/8/8/8/8/8/R3K3 w Q - 0 1", output=NullOutput(), render=False, sound=False, start=False)
+    game.input_source = ScriptedInput(["O-O-O", "Kf7"])
+    game.game_loop()
+    assert game.fen() == "8/5k2/8/8/8/8/8/2KR4 w - - 2 2"
+
+
+def test_rendered_game_draws_the_board():
+    _, text = play(["e4"], render=True)
+    assert "♟" in text or "♙" in text
@@ -0,0 +1,35 @@
+import pytest
+from bitboard import Bitboard
+from chess import Chess
+from compact import CompactPosition, random_fens, NO_SQUARE
+from game_io import ScriptedInput, NullOutput
+
+EN_PASSANT_FEN = "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w Kq f6 0 3"
+
+
+def test_round_trip_of_fen_strings():
+    for fen in random_fens(300, seed=3) + [EN_PASSANT_FEN]:
+        compact = CompactPosition.from_fen(fen)
+        assert len(compact.board) == 64
+        assert compact.fen() == fen
+        position = compact.to_bitboard()
+        assert position.hash == Bitboard(fen).hash
+        assert sorted(position.generate_legal_moves()) == sorted(Bitboard(fen).generate_legal_moves())
+
+
+def test_fields_and_equality():
+    compact = CompactPosition.from_fen(EN_PASSANT_FEN)
+    assert compact.en_passant_square == 21 and CompactPosition.from_fen("8/8/8/8/8/8/8/K6k w - - 0 1").en_passant_square == NO_SQUARE
+    assert compact == CompactPosition.from_fen(EN_PASSANT_FEN) and len({compact, CompactPosition.from_fen(EN_PASSANT_FEN)}) == 1
+    assert compact != CompactPosition.from_fen(EN_PASSANT_FEN.replace(" 0 3", " 0 4"))
+
+
+def test_array_shares_the_board():
+    pytest.importorskip("numpy")
+    board = CompactPosition.from_fen(EN_PASSANT_FEN).array()
+    assert board.shape == (8, 8) and board[0, 4] == -6 and board[7, 4] == 6 and board[3, 4] == 1
+
+
+def test_from_chess_equals_from_fen():
+    chess = Chess(EN_PASSANT_FEN, input_source=ScriptedInput([]), output=NullOutput(), render=False, sound=False)
+    assert CompactPosition.from_chess(chess) == CompactPosition.from_fen(EN_PASSANT_FEN)
@@ -0,0 +1,90 @@
+import pytest
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+from game import Game
+from chess import Chess
+from game_io import ScriptedInput, NullOutput
+from perft import perft
+from incremental import MoveTracker
+
+# castling rights left in the FEN-string after the rook is gone
+STALE_CASTLING_FEN = "4k3/8/8/8/8/8/8/4K3 w K - 0 1"
+
+
+def play(moves, fen=STARTING_FEN):
+    game = Game(fen)
+    for notation in moves:
+        game.push(notation)
+    return game
+
+
+def test_push_pop_and_fen():
+    game = play(["e4", "e7e5", "Nf3"])
+    assert game.fen() == "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2"
+    assert game.moves == ["e4", "e5", "Nf3"]
+    assert game.piece_at("f3") == "N"
+
+    assert game.pop() == "Nf3"
+    assert game.pop() == "e5"
+    assert game.pop() == "e4"
+    assert game.fen() == STARTING_FEN
+    with pytest.raises(IndexError):
+        game.pop()
+
+
+def test_illegal_moves_raise_value_error():
+    game = Game()
+    for notation in ("e5", "Nf6", "e2e5", "O-O", "x9"):
+        with pytest.raises(ValueError):
+            game.push(notation)
+    assert game.fen() == STARTING_FEN
+
+    with pytest.raises(ValueError):
+        Game("8/8/8/8 w - - 0 1")
+
+
+def test_status_check_checkmate_and_stalemate():
+    game = play(["e4", "e5", "Bc4", "Nc6", "Qh5", "Nf6"])
+    assert game.status() == ""
+    assert game.push("Qxf7") == "Qxf7#"
+    assert game.is_checkmate() and game.status() == "checkmate" and game.result() == "1-0"
+    assert game.legal_moves() == []
+
+    game = play(["f3", "e5", "g4"])
+    assert game.push("Qh4") == "Qh4#"
+    assert game.result() == "0-1"
+
+    game = Game("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+    assert game.is_stalemate() and game.status() == "stalemate" and game.result() == "1/2-1/2"
+
+    game = Game("4k3/8/8/8/8/8/8/R3K3 w - - 0 1")
+    game.push("Ra8")
+    assert game.is_check() and game.status() == "check" and game.result() is None
+
+
+def test_stale_castling_rights():
+    with pytest.raises(ValueError):
+        Game(STALE_CASTLING_FEN)
+
+    position = Bitboard(STALE_CASTLING_FEN)
+    assert sorted(position.generate_legal_moves()) == sorted(MoveTracker(position).generate_legal_moves())
+    assert "e1g1" not in [move_to_uci(move) for move in position.generate_legal_moves()]
+    assert perft(position, 2) == 25
+    with pytest.raises(ValueError):
+        position.parse_san("O-O")
+
+
+def test_transpositions_share_keys():
+    assert play(["d4", "Nf6", "c4"]).position.hash == play(["c4", "Nf6", "d4"]).position.hash
+    # a pawn can capture en passant, so the en passant square is part of the key
+    game = play(["e4", "d5", "e5", "f5"])
+    assert game.position.hash != Bitboard("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq - 0 3").hash
+
+
+def test_repr_matches_the_terminal_board():
+    moves = ["e4", "d5", "exd5", "Qxd5", "Nc3"]
+    game = play(moves)
+    terminal = Chess(input_source=ScriptedInput(moves), output=NullOutput(), render=False, sound=False)
+    assert repr(game) == repr(terminal)
+    lines = repr(game).splitlines()
+    assert lines[4] == "5 ┃ ⚬ ⚬ ⚬ ♕ ⚬ ⚬ ⚬ ⚬ ┃"
+    assert lines[-1] == "    a b c d e f g h"
@@ -0,0 +1,29 @@
+from bitboard import Bitboard, STARTING_FEN
+from chess import Chess
+from game_io import ScriptedInput, NullOutput
+from incremental import MoveTracker, compare_with_full_generation
+
+KNIGHTS_OUT_AND_BACK = ["Nf3", "Nf6", "Ng1", "Ng8"]
+
+
+def test_move_tracker_equals_full_generation():
+    assert compare_with_full_generation(games=10, max_plies=120, seed=1) > 0
+
+
+def test_tracker_keeps_the_history():
+    position = Bitboard(STARTING_FEN)
+    tracker = MoveTracker(position)
+    for notation in KNIGHTS_OUT_AND_BACK:
+        tracker.make_move(position.parse_san(notation))
+
+    assert len(position.history) == 4 and position.is_repetition()
+    # moves made after the tracker was created can be taken back on the position
+    position.unmake_move()
+    assert position.fen() == "rnbqkb1r/pppppppp/5n2/8/8/8/PPPPPPPP/RNBQKBNR b KQkq - 3 2"
+    assert not position.is_repetition()
+
+
+def test_repetition_found_through_the_game():
+    game = Chess(input_source=ScriptedInput(KNIGHTS_OUT_AND_BACK), output=NullOutput(), render=False, sound=False)
+    assert game.position.fen() == Bitboard(STARTING_FEN).fen().replace(" 0 1", " 4 3")
+    assert game.position.is_repetition()
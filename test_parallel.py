@@ -0,0 +1,32 @@
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+from parallel import parallel_perft, parallel_analysis, split_positions
+from perft import perft, divide, PERFT_SUITE
+from search import MATE_SCORE
+
+KIWIPETE_FEN = PERFT_SUITE[1][1]
+MATE_IN_ONE_FEN = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
+CHECKMATED_FEN = "r1bqkb1r/pppp1Qpp/2n2n2/4p3/2B1P3/8/PPPP1PPP/RNB1K1NR b KQkq - 0 4"
+
+
+def test_parallel_perft_equals_perft():
+    position = Bitboard(KIWIPETE_FEN)
+    for depth in range(4):
+        assert parallel_perft(position, depth, processes=2)[0] == perft(position, depth)
+
+    nodes, counts = parallel_perft(position, 3, processes=2, split_depth=2, hash_mb=1)
+    assert nodes == 97862 and sorted(counts) == sorted(divide(position, 3))
+    assert position.fen() == KIWIPETE_FEN
+
+
+def test_parallel_perft_edge_depths():
+    assert parallel_perft(Bitboard(STARTING_FEN), 0, processes=2) == (1, [])
+    assert parallel_perft(Bitboard(CHECKMATED_FEN), 2, processes=2) == (0, [])
+    assert len(split_positions(Bitboard(STARTING_FEN), 2)) == 400
+
+
+def test_parallel_analysis_ranks_the_mate_first():
+    results = parallel_analysis(Bitboard(MATE_IN_ONE_FEN), 2, processes=2, hash_mb=1)
+    assert move_to_uci(results[0][0]) == "h5f7" and results[0][1] == MATE_SCORE - 1
+    assert len(results) == len(Bitboard(MATE_IN_ONE_FEN).generate_legal_moves())
+    assert [result[:2] for result in parallel_analysis(Bitboard(MATE_IN_ONE_FEN), 2, processes=1, hash_mb=1)] == \
+        [result[:2] for result in results]
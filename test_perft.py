@@ -0,0 +1,45 @@
+from bitboard import Bitboard, STARTING_FEN
+from perft import perft, divide, PERFT_SUITE
+from transposition import TranspositionTable
+
+# perft depths with at most this many leaf nodes are run
+MAX_PERFT_NODES = 100000
+
+KIWIPETE_FEN = PERFT_SUITE[1][1]
+
+
+def suite_depths():
+    for name, fen, expected_counts in PERFT_SUITE:
+        for depth, expected in enumerate(expected_counts, 1):
+            if expected <= MAX_PERFT_NODES:
+                yield name, fen, depth, expected
+
+
+def test_perft_suite():
+    for name, fen, depth, expected in suite_depths():
+        assert perft(Bitboard(fen), depth) == expected, f"{name} depth {depth}"
+
+
+def test_perft_by_testing_equals_masks():
+    for name, fen, depth, expected in suite_depths():
+        if depth <= 2:
+            assert perft(Bitboard(fen), depth, generate=Bitboard.generate_legal_moves_by_testing) == expected, name
+
+
+def test_perft_with_table():
+    table = TranspositionTable(1)
+    position = Bitboard(KIWIPETE_FEN)
+    assert perft(position, 3, table) == 97862
+    # the second run is answered from the table
+    assert perft(position, 3, table) == 97862
+    assert position.fen() == KIWIPETE_FEN
+
+
+def test_divide_sums_to_perft():
+    position = Bitboard(STARTING_FEN)
+    counts = dict(divide(position, 3))
+    assert len(counts) == 20
+    assert counts["e2e4"] == 600
+    assert sum(counts.values()) == 8902
+    assert position.fen() == STARTING_FEN
+    assert perft(position, 0) == 1
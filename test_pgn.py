@@ -0,0 +1,118 @@
+import pgn
+from bitboard import STARTING_FEN
+from pgn import parse_game, import_game, import_games, iterate_games, format_pgn
+
+GAME = """[Event "Test \\"quoted\\""]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 {best by test} e5 2. Nf3 (2. f4 exf4) Nc6 $1 3. Bb5 ; Spanish
+a6 1-0
+"""
+
+ILLEGAL_GAME = """[White "C"]
+[Black "D"]
+
+1. e4 e5 2. Ke3 *
+"""
+
+FEN_GAME = """[FEN "4k3/8/8/8/8/8/8/R3K3 b Q - 0 7"]
+[SetUp "1"]
+
+7... Kd7 8. O-O-O+ *
+"""
+
+
+def test_parse_game_strips_comments_and_variations():
+    tags, moves, result = parse_game(GAME)
+    assert tags == {"Event": 'Test "quoted"', "White": "A", "Black": "B", "Result": "1-0"}
+    assert moves == ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"]
+    assert result == "1-0"
+
+
+def test_import_game_reports_first_illegal_move():
+    tags, result, moves, fen, error = import_game(GAME)
+    assert moves == ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"] and error is None
+
+    tags, result, moves, fen, error = import_game(ILLEGAL_GAME)
+    assert result == "*" and moves == ["e2e4", "e7e5"] and error.startswith("ply 3: ")
+
+    tags, result, moves, fen, error = import_game(FEN_GAME)
+    assert moves == ["e8d7", "e1c1"] and fen == "8/3k4/8/8/8/8/8/2KR4 b - - 2 8"
+
+
+def test_format_pgn_round_trip():
+    tags, moves, result = parse_game(FEN_GAME)
+    text = format_pgn(tags, moves, result)
+    assert text.startswith('[Event "?"]\n[Site "?"]')
+    assert "\n7... Kd7 8. O-O-O+ *\n" in text
+    assert parse_game(text) == ({**dict.fromkeys(pgn.SEVEN_TAG_ROSTER, "?"), **tags, "Result": "*"}, moves, result)
+
+    long_game = format_pgn({}, ["Nf3", "Nf6", "Ng1", "Ng8"] * 20)
+    assert max(len(line) for line in long_game.splitlines()) <= pgn.PGN_LINE_LENGTH
+
+
+def write_games(path, count):
+    games = [GAME, ILLEGAL_GAME, FEN_GAME]
+    with open(path, "w") as f:
+        for number in range(count):
+            f.write(games[number % len(games)] + "\n")
+
+
+def test_byte_ranges_split_games_without_overlap(tmp_path):
+    path = tmp_path / "games.pgn"
+    write_games(path, 30)
+    with open(path, "rb") as f:
+        whole = [offset for offset, _ in iterate_games(f)]
+        pieces = []
+        for start in range(0, path.stat().st_size, 100):
+            pieces += [offset for offset, _ in iterate_games(f, start, start + 100)]
+    assert len(whole) == 30 and pieces == whole
+
+
+def test_parallel_import_equals_sequential(tmp_path):
+    path = str(tmp_path / "games.pgn")
+    write_games(path, 60)
+    sequential = list(import_games(path, processes=1))
+    assert len(sequential) == 60 and sum(error is not None for *_, error in sequential) == 20
+    assert list(import_games(path, processes=2, chunk_size=500)) == sequential
+
+
+class RecordingPool:
+    """
+        Pool that imports chunks right away in this process and records how many were submitted.
+    """
+
+    submitted = 0
+
+    class Result:
+        def __init__(self, value):
+            self.value = value
+
+        def get(self):
+            return self.value
+
+    def __init__(self, processes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def apply_async(self, function, arguments):
+        RecordingPool.submitted += 1
+        return self.Result(function(*arguments))
+
+
+def test_chunks_in_flight_are_bounded(tmp_path, monkeypatch):
+    path = str(tmp_path / "games.pgn")
+    write_games(path, 90)
+    monkeypatch.setattr(pgn, "Pool", RecordingPool)
+
+    games = import_games(path, processes=2, chunk_size=200)
+    next(games)
+    assert RecordingPool.submitted == pgn.CHUNKS_IN_FLIGHT * 2
+    assert len(list(games)) == 89
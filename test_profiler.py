@@ -0,0 +1,82 @@
+import sys
+import subprocess
+from profiler import Profiler, PROFILER, profiling
+from bitboard import Bitboard, STARTING_FEN
+from chess import Chess
+from game_io import ScriptedInput, NullOutput
+
+
+class Counter:
+    def step(self, n):
+        return n + 1
+
+    def unused(self):
+        pass
+
+
+def test_register_enable_and_disable():
+    profiler = Profiler()
+    original = Counter.step
+    profiler.register("Counter.step", Counter, "step")
+    assert Counter.step is original
+
+    profiler.enable()
+    try:
+        assert Counter().step(1) == 2 and Counter().step(2) == 3
+    finally:
+        profiler.disable()
+    assert Counter.step is original
+    Counter().step(3)
+
+    stats = profiler.stats()["Counter.step"]
+    assert stats["calls"] == 2 and stats["seconds"] >= 0.0
+    profiler.reset()
+    assert profiler.stats()["Counter.step"]["calls"] == 0
+
+
+def test_summary_leaves_out_functions_never_called():
+    profiler = Profiler()
+    profiler.register("Counter.step", Counter, "step")
+    profiler.register("Counter.unused", Counter, "unused")
+    profiler.enable()
+    try:
+        Counter().step(0)
+    finally:
+        profiler.disable()
+
+    lines = profiler.summary().splitlines()
+    assert lines[0].split() == ["Function", "Calls", "Total", "(s)", "Mean", "(us)"]
+    assert len(lines) == 2 and lines[1].split()[:2] == ["Counter.step", "1"]
+
+
+def test_move_generation_counted_only_while_profiling():
+    position = Bitboard(STARTING_FEN)
+    with profiling():
+        for move in position.generate_legal_moves():
+            position.make_move(move)
+            position.generate_legal_moves()
+            position.unmake_move()
+    position.generate_legal_moves()
+    # one generation at the root and one after each of its 20 moves
+    assert PROFILER.stats()["Bitboard.generate_legal_moves"]["calls"] == 21
+    assert not PROFILER.enabled
+
+
+def test_game_times_the_functions_it_calls():
+    with profiling():
+        game = Chess(input_source=ScriptedInput(["e4", "e5", "Nf3"]), output=NullOutput(), render=False, sound=False)
+    stats = PROFILER.stats()
+    assert game.fen().startswith("rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b ")
+    for name in ("Chess.move", "Chess.make_encoded_move", "MoveTracker.make_move", "Bitboard.resolve_san"):
+        assert stats[name]["calls"] == 3, name
+    assert stats["MoveTracker.generate_legal_moves"]["calls"] >= 3
+    assert "Chess.castle_threatened" not in stats
+
+
+def test_summary_printed_when_script_runs_out(tmp_path):
+    script = tmp_path / "moves.txt"
+    script.write_text("e4 e5")
+    result = subprocess.run([sys.executable, "chess.py", "--profile", "--no-render", "--no-sound",
+                             "--script", str(script)], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0
+    assert "Function" in result.stdout and "Chess.move" in result.stdout
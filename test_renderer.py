@@ -0,0 +1,51 @@
+import io
+from renderer import Renderer, format_board, move_cursor, CLEAR_SCREEN, BOARD_ROW, BOARD_COLUMN
+
+EMPTY = "."
+
+
+def starting_cells():
+    return list("rnbqkbnr" + "p" * 8) + [EMPTY] * 32 + list("P" * 8 + "RNBQKBNR")
+
+
+def test_format_board():
+    lines = format_board(starting_cells()).split("\n")
+    assert len(lines) == 11
+    assert lines[1] == "8 ┃ r n b q k b n r ┃"
+    assert lines[8] == "1 ┃ R N B Q K B N R ┃"
+    assert lines[10] == "    a b c d e f g h"
+
+
+def test_only_changed_squares_are_redrawn():
+    output = io.StringIO()
+    renderer = Renderer(output, ansi=True)
+    cells = starting_cells()
+    renderer.draw(cells)
+    assert output.getvalue().startswith(CLEAR_SCREEN)
+
+    # e2e4 changes two squares
+    cells[52], cells[36] = EMPTY, "P"
+    output.seek(0)
+    output.truncate()
+    renderer.draw(cells, ["Check\n"])
+    frame = output.getvalue()
+    assert CLEAR_SCREEN not in frame
+    assert move_cursor(BOARD_ROW + 6, BOARD_COLUMN + 8) + EMPTY in frame
+    assert move_cursor(BOARD_ROW + 4, BOARD_COLUMN + 8) + "P" in frame
+    assert frame.count("\x1b[") == 3 + 1 and frame.endswith("Check\n\n")
+    assert renderer.frames == 2 and renderer.full_redraws == 1
+
+    # most of the board changed, or the frame was invalidated
+    renderer.draw(["x"] * 64)
+    renderer.invalidate()
+    renderer.draw(["x"] * 64)
+    assert renderer.full_redraws == 3
+
+
+def test_full_redraw_without_ansi():
+    output = io.StringIO()
+    renderer = Renderer(output)
+    renderer.draw(starting_cells())
+    renderer.draw(starting_cells())
+    assert renderer.full_redraws == 2 and "\x1b[" not in output.getvalue()
+    assert output.getvalue().count(format_board(starting_cells())) == 2
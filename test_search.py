@@ -0,0 +1,41 @@
+from bitboard import Bitboard, move_to_uci
+from search import Search, MATE_SCORE, CHECK_INTERVAL, format_score
+
+MATE_IN_ONE_FEN = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
+HANGING_QUEEN_FEN = "4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1"
+STALEMATE_FEN = "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1"
+
+
+def test_finds_mate_in_one():
+    position = Bitboard(MATE_IN_ONE_FEN)
+    search = Search(hash_mb=1)
+    assert move_to_uci(search.search(position, max_depth=3)) == "h5f7"
+    assert search.score == MATE_SCORE - 1 and format_score(search.score) == "#1"
+    assert position.fen() == MATE_IN_ONE_FEN
+
+
+def test_wins_material_within_node_budget():
+    position = Bitboard(HANGING_QUEEN_FEN)
+    search = Search(hash_mb=1)
+    assert move_to_uci(search.search(position, max_nodes=20000)) == "d1d5"
+    assert search.nodes < 20000 + CHECK_INTERVAL
+    assert position.fen() == HANGING_QUEEN_FEN
+
+
+def test_no_legal_moves_and_early_stop():
+    search = Search(hash_mb=1)
+    assert search.search(Bitboard(STALEMATE_FEN)) is None
+
+    # stopped before it starts, the first legal move is returned and the flag is cleared
+    position = Bitboard(HANGING_QUEEN_FEN)
+    search.stop()
+    assert search.search(position) in position.generate_legal_moves()
+    assert not search.stopped
+    assert position.fen() == HANGING_QUEEN_FEN
+
+
+def test_reports_every_iteration():
+    reports = []
+    Search(hash_mb=1, report=reports.append).search(Bitboard(HANGING_QUEEN_FEN), max_depth=3)
+    assert [report["depth"] for report in reports] == [1, 2, 3]
+    assert all(report["pv"] and report["pv"][0] == "d1d5" for report in reports)
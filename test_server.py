@@ -0,0 +1,139 @@
+import asyncio
+import server
+from server import GameSession, ChessServer, Connection, format_diff
+from archive import ArchiveWriter, GameArchive
+
+
+class FakeTransport:
+    def __init__(self):
+        self.buffered = 0
+        self.aborted = False
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def abort(self):
+        self.aborted = True
+
+
+class FakeWriter:
+    """
+        Collects the lines sent to a client, the client never reads them so they stay buffered.
+    """
+
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data.decode("utf-8").rstrip("\n"))
+        self.transport.buffered += len(data)
+
+    def is_closing(self):
+        return self.transport.aborted
+
+
+def connect():
+    return Connection(FakeWriter())
+
+
+def test_game_session_moves():
+    game = GameSession(1)
+    assert game.make_move("e4") == ("e2e4", [(36, "P"), (52, None)], "")
+    assert format_diff(game.make_move("f5")[1]) == "f7. f5p"
+    assert game.make_move("Qh5")[2] == "check"
+    try:
+        game.make_move("Nf6")
+    except ValueError:
+        pass
+    assert game.make_move("g6")[2] == ""
+    assert game.make_move("Qxg6+")[2] == "check"
+    assert game.make_move("hxg6")[0] == "h7g6"
+    assert game.result is None and game.plies == len(game.moves) == 6
+    assert game.position.fen() == "rnbqkbnr/ppppp3/6p1/5p2/4P3/8/PPPP1PPP/RNB1KBNR w KQkq - 0 4"
+
+
+def test_commands_and_broadcast(tmp_path):
+    path = str(tmp_path / "games.cga")
+    archive = ArchiveWriter(path)
+    chess_server = ChessServer(archive)
+    white, black, observer = connect(), connect(), connect()
+
+    chess_server.handle(white, ["new", "w"])
+    assert white.writer.lines[-1].startswith("game 1 w rnbqkbnr/")
+    chess_server.handle(black, ["join", "1"])
+    assert black.writer.lines[-1].startswith("joined 1 b ")
+    chess_server.handle(observer, ["join", "1"])
+    assert observer.writer.lines[-1].startswith("joined 1 observer ")
+    chess_server.handle(observer, ["mode", "fen"])
+
+    chess_server.handle(black, ["move", "1", "e5"])
+    assert black.writer.lines[-1] == "error 1 not your move"
+    chess_server.handle(white, ["move", "1", "e5"])
+    assert white.writer.lines[-1].startswith("error 1 illegal move")
+
+    for connection, notation in [(white, "f3"), (black, "e5"), (white, "g4"), (black, "Qh4#")]:
+        chess_server.handle(connection, ["move", "1", notation])
+    assert white.writer.lines[-1] == black.writer.lines[-1] == "moved 1 4 d8h4 checkmate d8. h4q"
+    assert observer.writer.lines[-1].startswith("moved 1 4 d8h4 checkmate rnb1kbnr/")
+    chess_server.handle(white, ["move", "1", "Kf2"])
+    assert white.writer.lines[-1] == "error 1 game is over 0-1"
+
+    # the game is archived once everyone left
+    for connection in (white, black, observer):
+        chess_server.handle(connection, ["leave", "1"])
+    assert chess_server.games == {}
+    chess_server.handle(white, ["fen", "1"])
+    assert white.writer.lines[-1] == "error 1 no such game"
+    assert chess_server.handle(white, ["quit"]) is False
+
+    archive.close()
+    with GameArchive(path) as games:
+        assert len(games) == 1 and games.result(0) == "0-1" and games.plies(0) == 4
+
+
+def test_clients_that_stop_reading_are_dropped(monkeypatch):
+    monkeypatch.setattr(server, "MAX_WRITE_BUFFER", 200)
+    chess_server = ChessServer()
+    player, slow = connect(), connect()
+    chess_server.handle(player, ["new", "wb"])
+    chess_server.handle(slow, ["join", "1"])
+
+    for notation in ["Nf3", "Nf6", "Ng1", "Ng8"] * 2:
+        chess_server.handle(player, ["move", "1", notation])
+        # the player's own commands wait until its lines are sent
+        player.writer.transport.buffered = 0
+    assert slow.writer.transport.aborted and not player.writer.transport.aborted
+    # nothing more is buffered for the dropped client
+    assert slow.writer.transport.buffered < 200 + 100
+    assert len(player.writer.lines) == 9
+
+
+def test_clients_over_tcp():
+    async def session():
+        chess_server = ChessServer()
+        await chess_server.start("127.0.0.1", 0)
+        async with chess_server.server:
+            white_reader, white_writer = await asyncio.open_connection("127.0.0.1", chess_server.port())
+            black_reader, black_writer = await asyncio.open_connection("127.0.0.1", chess_server.port())
+
+            white_writer.write(b"new w\n")
+            assert (await white_reader.readline()).startswith(b"game 1 w ")
+            black_writer.write(b"join 1\n")
+            assert (await black_reader.readline()).startswith(b"joined 1 b ")
+            white_writer.write(b"move 1 e4\n")
+            assert await white_reader.readline() == await black_reader.readline() == b"moved 1 1 e2e4 - e4P e2.\n"
+
+            # a client that disconnects leaves its games
+            black_writer.close()
+            await black_writer.wait_closed()
+            for _ in range(100):
+                if chess_server.games[1].players["b"] is None:
+                    break
+                await asyncio.sleep(0.01)
+            assert chess_server.games[1].players["b"] is None
+            white_writer.write(b"quit\n")
+            assert await white_reader.readline() == b""
+            white_writer.close()
+
+    asyncio.run(session())
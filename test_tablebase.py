@@ -0,0 +1,84 @@
+import random
+import pytest
+from bitboard import Bitboard
+from chess import Chess
+from game_io import NullOutput
+from search import Search, MATE_SCORE
+from tablebase import Tablebase, generate_tablebases, format_result, decode, WIN, DRAW, LOSS
+
+MATE_IN_ONE_FEN = "k7/8/1K6/8/8/8/7Q/8 w - - 0 1"
+STALEMATE_FEN = "k7/2Q5/1K6/8/8/8/8/8 b - - 0 1"
+
+
+@pytest.fixture(scope="module")
+def tablebase(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tablebases") / "tablebases.bin")
+    tables = generate_tablebases(path, quiet=True)
+    # longest mates with the queen and the rook, in plies
+    assert max(map(decode, tables["KQK"])) == 19 and max(map(decode, tables["KRK"])) == 31
+    with Tablebase(path) as tablebase:
+        yield tablebase
+
+
+def test_probe_known_positions(tablebase):
+    assert tablebase.probe(Bitboard(MATE_IN_ONE_FEN)) == (WIN, 1)
+    assert tablebase.probe(Bitboard(STALEMATE_FEN)) == (DRAW, 0)
+    # the same positions with colors swapped
+    assert tablebase.probe(Bitboard("8/7q/8/8/8/1k6/8/K7 b - - 0 1")) == (WIN, 1)
+    assert tablebase.probe(Bitboard("8/8/8/8/8/1k6/2q5/K7 w - - 0 1")) == (DRAW, 0)
+    # a rook pawn with the lone king in front of it is a draw
+    assert tablebase.probe(Bitboard("k7/8/8/8/8/8/P7/K7 w - - 0 1")) == (DRAW, 0)
+    assert tablebase.probe(Bitboard("4k3/8/8/8/8/8/8/R3K3 w Q - 0 1")) is None
+    assert tablebase.probe(Bitboard("4k3/8/8/8/8/8/8/RR2K3 w - - 0 1")) is None
+    assert format_result((WIN, 1), "w") == "White wins, mate in 1"
+    assert format_result((LOSS, 2), "w") == "Black wins, mate in 1"
+
+
+def test_results_follow_from_the_moves(tablebase):
+    # a win has a move to a loss one ply shorter, a loss only has moves to wins
+    rng = random.Random(31)
+    checked = 0
+    while checked < 300:
+        squares = rng.sample(range(64), 3)
+        piece = rng.choice("QRP")
+        board = [None] * 64
+        board[squares[0]], board[squares[1]], board[squares[2]] = "K", "k", piece
+        rows = []
+        for row in range(8):
+            rows.append("".join(board[row * 8 + column] or "1" for column in range(8)))
+        fen = "/".join(rows) + f" {rng.choice('wb')} - - 0 1"
+        position = Bitboard(fen)
+        try:
+            position.validate()
+        except ValueError:
+            continue
+
+        outcome, plies = tablebase.probe(position)
+        results = []
+        for move in position.generate_legal_moves():
+            position.make_move(move)
+            # promotions leave the tables, except to a queen or rook
+            results.append(tablebase.probe(position) if len(position.generate_legal_moves()) else
+                           (LOSS, 0) if position.in_check() else (DRAW, 0))
+            position.unmake_move()
+        if any(result is None for result in results):
+            continue
+
+        if outcome == WIN:
+            assert (LOSS, plies - 1) in results, fen
+        elif outcome == LOSS:
+            assert all(result[0] == WIN and result[1] <= plies - 1 for result in results), fen
+            assert (WIN, plies - 1) in results or not results, fen
+        else:
+            assert all(result[0] != LOSS for result in results), fen
+        checked += 1
+
+
+def test_game_and_search_use_the_tablebase(tablebase):
+    game = Chess(MATE_IN_ONE_FEN, output=NullOutput(), render=False, sound=False, start=False)
+    assert game.tablebase is None
+    assert tablebase.probe_pieces(game.pieces, "w", game.castling_ability) == (WIN, 1)
+
+    search = Search(hash_mb=1, tablebase=tablebase)
+    search.search(Bitboard("8/8/8/4k3/8/8/8/R3K3 w - - 0 1"), max_depth=2)
+    assert search.score > 0 and MATE_SCORE - search.score == tablebase.probe(Bitboard("8/8/8/4k3/8/8/8/R3K3 w - - 0 1"))[1]
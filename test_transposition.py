@@ -0,0 +1,71 @@
+import random
+from bitboard import Bitboard, STARTING_FEN
+from transposition import TranspositionTable, EXACT, LOWER_BOUND
+from zobrist import compute_hash
+
+
+def test_probe_and_store():
+    table = TranspositionTable(1)
+    key = 0x123456789ABCDEF0
+    assert table.probe(key) is None
+    table.store(key, 3, 25, EXACT, 7)
+    assert table.probe(key)[:5] == (key, 3, 25, EXACT, 7)
+    assert table.stored == 1 and table.hits == 1 and table.probes == 2
+
+    # a shallower bound of the same search does not replace a deeper result
+    table.store(key, 1, 40, LOWER_BOUND)
+    assert table.probe(key)[1:3] == (3, 25)
+    table.store(key, 1, 40, EXACT)
+    assert table.probe(key)[1:3] == (1, 40)
+    assert table.stored == 1
+
+
+def test_store_finds_key_in_either_slot():
+    table = TranspositionTable(1)
+    key = table.size * 4
+    other = key + table.size
+    table.store(other, 1, 0)
+    table.store(key, 1, 10)
+    index = key & table.mask
+    assert table.entries[index ^ 1][0] == key
+
+    # the same key is overwritten in the second slot, not stored again in an empty first slot
+    table.entries[index] = None
+    table.store(key, 2, 20)
+    assert table.entries[index] is None
+    assert table.entries[index ^ 1][:3] == (key, 2, 20)
+
+
+def test_replacement_prefers_old_then_shallow_entries():
+    table = TranspositionTable(1)
+    key = table.size * 8
+    table.store(key, 5, 0)
+    table.store(key + table.size, 1, 0)
+    table.store(key + 2 * table.size, 3, 0)
+    # the shallower entry was replaced
+    assert table.probe(key) is not None and table.probe(key + table.size) is None
+
+    table.new_search()
+    table.store(key + 3 * table.size, 1, 0)
+    table.store(key + 4 * table.size, 9, 0)
+    # entries of this search are kept over entries of the last one
+    assert table.probe(key + 3 * table.size) is not None and table.probe(key + 4 * table.size) is not None
+
+
+def test_incremental_key_equals_computed_key():
+    rng = random.Random(5)
+    for _ in range(10):
+        position = Bitboard(STARTING_FEN)
+        keys = [position.hash]
+        for _ in range(150):
+            moves = position.generate_legal_moves()
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+            assert position.hash == compute_hash(position)
+            keys.append(position.hash)
+        while position.history:
+            keys.pop()
+            position.unmake_move()
+            assert position.hash == keys[-1]
+        assert position.fen() == STARTING_FEN
@@ -0,0 +1,88 @@
+import io
+import time
+from uci import UCIEngine, parse_go, time_budget, format_uci_score
+from search import MATE_SCORE
+
+MATE_IN_ONE_FEN = "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4"
+
+
+class Engine:
+    """
+        UCIEngine fed one command at a time, with its output kept for checking.
+    """
+
+    def __init__(self):
+        self.output = io.StringIO()
+        self.engine = UCIEngine(input_stream=[], output=self.output)
+
+    def send(self, *lines):
+        for line in lines:
+            self.engine.handle(line)
+
+    def wait(self, timeout):
+        thread = self.engine.thread
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def lines(self):
+        return self.output.getvalue().splitlines()
+
+    def best_moves(self):
+        return [line for line in self.lines() if line.startswith("bestmove")]
+
+
+def test_parse_go_and_budget():
+    arguments = parse_go("wtime 60000 btime 30000 winc 1000 movestogo 20 ponder".split())
+    assert arguments == {"wtime": 60000, "btime": 30000, "winc": 1000, "movestogo": 20, "ponder": True}
+    assert abs(time_budget(arguments, "w") - 3.45) < 1e-9
+    assert abs(time_budget(arguments, "b") - 1.45) < 1e-9
+    assert time_budget({"depth": 3}, "w") is None
+    assert format_uci_score(MATE_SCORE - 3) == "mate 2" and format_uci_score(-MATE_SCORE + 2) == "mate -1"
+    assert format_uci_score(35) == "cp 35"
+
+
+def test_handshake_position_and_search():
+    engine = Engine()
+    engine.send("uci", "isready", f"position fen {MATE_IN_ONE_FEN}", "go depth 3")
+    assert engine.wait(10)
+    lines = engine.lines()
+    assert lines[0].startswith("id name ") and "uciok" in lines and "readyok" in lines
+    assert any(line.startswith("info depth 1 score ") for line in lines)
+    assert engine.best_moves() == ["bestmove h5f7"]
+
+    engine.send("position startpos moves e2e4 e7e5 e1e3", "go depth 1")
+    assert engine.wait(10)
+    assert "info string illegal move: e1e3" in engine.lines()
+    assert engine.best_moves()[-1].split()[1][:2] in {"a2", "b1", "b2", "c2", "d1", "d2", "e1", "f1", "f2", "g1", "g2", "h2"}
+
+
+def test_infinite_search_waits_for_stop():
+    engine = Engine()
+    engine.send("position startpos", "go infinite")
+    assert not engine.wait(0.3) and engine.best_moves() == []
+    engine.send("stop")
+    assert engine.engine.thread is None and len(engine.best_moves()) == 1
+
+
+def test_immediate_ponderhit_gives_the_time_budget():
+    engine = Engine()
+    search = engine.engine.search
+    start_search = search.search
+
+    def delayed_search(*args, **kwargs):
+        # the search thread is slow to start, ponderhit arrives before the search begins
+        time.sleep(0.2)
+        return start_search(*args, **kwargs)
+
+    search.search = delayed_search
+    start = time.perf_counter()
+    engine.send("position startpos moves e2e4", "go ponder movetime 300", "ponderhit")
+    assert engine.wait(5), "the search ran on without the time budget of ponderhit"
+    assert time.perf_counter() - start < 1
+    assert len(engine.best_moves()) == 1
+
+    # the budget is not left behind for the next search
+    engine.send("go ponder movetime 300")
+    assert not engine.wait(0.8)
+    engine.send("stop")
+    assert len(engine.best_moves()) == 2
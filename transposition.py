@@ -0,0 +1,120 @@
+import sys
+
+# bound types of stored search values
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# approximate memory per entry: the entry tuple, its 64-bit key and the list slot pointing at it
+ENTRY_BYTES = sys.getsizeof((2**63, 0, 0, 0, 0, 0)) + sys.getsizeof(2**63) + 8
+
+
+class TranspositionTable:
+
+    def __init__(self, size_mb=16):
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        """
+            Allocates the table for the given memory budget in megabytes and clears it.
+            The number of slots is rounded down to a power of two so the index is a mask of the key.
+        """
+
+        slots = max(2, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.size = 1 << (slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        """
+            Empties all slots and resets statistics.
+        """
+
+        # entries are (key, depth, value, bound, move, age)
+        self.entries = [None] * self.size
+        self.age = 0
+        self.stored = 0
+        self.hits = 0
+        self.probes = 0
+
+    def new_search(self):
+        """
+            Marks the start of a new search, entries from older searches are replaced first.
+        """
+
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key):
+        """
+            Looks up key in its bucket of two slots.
+
+            Returns entry (key, depth, value, bound, move, age), None if key is not stored
+        """
+
+        self.probes += 1
+        index = key & self.mask
+        entries = self.entries
+
+        entry = entries[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        entry = entries[index ^ 1]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        return None
+
+    def store(self, key, depth, value, bound=EXACT, move=0):
+        """
+            Stores a result for key. Each key maps to a bucket of two slots. An entry with the same key is
+            overwritten, otherwise an empty slot is used, then an entry from an older search, then the shallower entry.
+        """
+
+        index = key & self.mask
+        entries = self.entries
+        first = entries[index]
+        second = entries[index ^ 1]
+
+        if first is not None and first[0] == key:
+            slot = index
+        elif second is not None and second[0] == key:
+            slot = index ^ 1
+        elif first is None:
+            slot = index
+        elif second is None:
+            slot = index ^ 1
+        elif (first[5] != self.age) != (second[5] != self.age):
+            slot = index if first[5] != self.age else index ^ 1
+        else:
+            slot = index if first[1] <= second[1] else index ^ 1
+
+        existing = entries[slot]
+        if existing is None:
+            self.stored += 1
+        elif existing[0] == key and existing[5] == self.age and existing[1] > depth and bound != EXACT:
+            # keep the deeper result of this search for the same position
+            return
+
+        entries[slot] = (key, depth, value, bound, move, self.age)
+
+    def usage(self):
+        """
+            Estimates how full the table is, from a sample of the first slots.
+
+            Returns filled slots per thousand
+        """
+
+        sample = self.entries[:min(self.size, 1000)]
+        return sum(1 for entry in sample if entry is not None) * 1000 // len(sample)
+
+    def memory_bytes(self):
+        """
+            Estimates memory used by the table when it is full.
+
+            Returns size in bytes
+        """
+
+        return sys.getsizeof(self.entries) + self.size * (ENTRY_BYTES - 8)
@@ -0,0 +1,344 @@
+import sys
+import threading
+from bitboard import Bitboard, STARTING_FEN, move_to_uci
+from search import Search, MATE_SCORE, MATE_THRESHOLD
+from book import OpeningBook
+from tablebase import Tablebase
+
+ENGINE_NAME = "command-line-chess"
+ENGINE_AUTHOR = "dreilstad"
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+
+# moves assumed left in the game when the GUI does not send movestogo
+DEFAULT_MOVES_TO_GO = 30
+
+# seconds kept back from every move for reading and writing commands
+MOVE_OVERHEAD = 0.05
+
+
+def format_uci_score(score):
+    """
+        Formats score for an info line, "cp 35" or "mate 3", mate counted in moves and negative when mated.
+
+        Returns score string
+    """
+
+    if score >= MATE_THRESHOLD:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_THRESHOLD:
+        return f"mate -{(MATE_SCORE + score + 1) // 2}"
+    return f"cp {score}"
+
+
+def parse_go(tokens):
+    """
+        Parses the arguments of a go command, e.g. ["wtime", "60000", "btime", "60000", "ponder"].
+
+        Returns dict of argument by name, numbers as ints and flags as True
+    """
+
+    flags = ("infinite", "ponder")
+    arguments = {}
+    i = 0
+    while i < len(tokens):
+        name = tokens[i]
+        if name in flags:
+            arguments[name] = True
+            i += 1
+        elif name == "searchmoves":
+            # the remaining tokens are moves
+            arguments[name] = tokens[i + 1:]
+            break
+        else:
+            if i + 1 < len(tokens):
+                try:
+                    arguments[name] = int(tokens[i + 1])
+                except ValueError:
+                    pass
+            i += 2
+
+    return arguments
+
+
+def time_budget(arguments, side_to_move):
+    """
+        Splits the remaining clock time between the moves left, plus half the increment.
+
+        Returns seconds for the move, None for no time limit
+    """
+
+    if "movetime" in arguments:
+        return max(0.01, arguments["movetime"] / 1000 - MOVE_OVERHEAD)
+
+    remaining = arguments.get("wtime" if side_to_move == "w" else "btime")
+    if remaining is None:
+        return None
+
+    increment = arguments.get("winc" if side_to_move == "w" else "binc", 0)
+    moves_to_go = arguments.get("movestogo", DEFAULT_MOVES_TO_GO)
+    budget = remaining / max(1, moves_to_go) + increment / 2
+    return max(0.01, min(budget, remaining / 2) / 1000 - MOVE_OVERHEAD)
+
+
+class UCIEngine:
+    """
+        Speaks the UCI protocol. Commands are read on the calling thread while searches run on a worker thread,
+        so stop, isready and ponderhit are answered while a search is running.
+    """
+
+    def __init__(self, input_stream=None, output=None, book=None, tablebase=None):
+        self.input_stream = input_stream if input_stream is not None else sys.stdin
+        self.output = output if output is not None else sys.stdout
+        # replies of the command thread and info lines of the search thread are written whole
+        self.output_lock = threading.Lock()
+
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self.tablebase = Tablebase(tablebase) if isinstance(tablebase, str) else tablebase
+        self.hash_mb = DEFAULT_HASH_MB
+        self.search = Search(self.hash_mb, report=self.report, tablebase=self.tablebase)
+        self.position = Bitboard(STARTING_FEN)
+
+        self.thread = None
+        # guards starting and stopping a search against each other
+        self.search_lock = threading.Lock()
+        self.searching = False
+        self.stop_requested = False
+        # set when the best move may be sent, a pondering or infinite search waits for stop or ponderhit
+        self.release = threading.Event()
+        self.pondering = False
+        self.ponder_budget = None
+
+    def send(self, line):
+        """
+            Writes a line to the GUI.
+        """
+
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self):
+        """
+            Reads and handles commands until quit or end of input.
+        """
+
+        for line in self.input_stream:
+            if not self.handle(line):
+                break
+
+        self.stop_search()
+
+    def handle(self, line):
+        """
+            Handles a single command line, unknown commands are ignored.
+
+            Returns False after quit, True otherwise
+        """
+
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.wait_for_search()
+            self.set_option(arguments)
+        elif command == "ucinewgame":
+            self.wait_for_search()
+            self.search = Search(self.hash_mb, report=self.report, tablebase=self.tablebase)
+        elif command == "position":
+            self.wait_for_search()
+            self.set_position(arguments)
+        elif command == "go":
+            self.wait_for_search()
+            self.go(parse_go(arguments))
+        elif command == "stop":
+            self.stop_search()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            return False
+
+        return True
+
+    def set_option(self, arguments):
+        """
+            Handles setoption name <name> value <value>.
+        """
+
+        if "name" not in arguments:
+            return
+        value_index = arguments.index("value") if "value" in arguments else len(arguments)
+        name = " ".join(arguments[arguments.index("name") + 1:value_index]).lower()
+        value = " ".join(arguments[value_index + 1:])
+
+        if name == "hash":
+            try:
+                self.hash_mb = max(1, min(MAX_HASH_MB, int(value)))
+            except ValueError:
+                return
+            self.search = Search(self.hash_mb, report=self.report, tablebase=self.tablebase)
+
+    def set_position(self, arguments):
+        """
+            Handles position startpos|fen <FEN> [moves <move> ...]. Moves are in from-to notation, e.g. e2e4 or e7e8q.
+            An invalid FEN or illegal move keeps the position up to it.
+        """
+
+        moves = []
+        if "moves" in arguments:
+            moves = arguments[arguments.index("moves") + 1:]
+            arguments = arguments[:arguments.index("moves")]
+
+        if arguments[:1] == ["startpos"]:
+            fen = STARTING_FEN
+        elif arguments[:1] == ["fen"]:
+            fen = " ".join(arguments[1:])
+        else:
+            return
+
+        try:
+            self.position = Bitboard(fen)
+        except ValueError as error:
+            self.send(f"info string invalid FEN: {error}")
+            return
+
+        for notation in moves:
+            legal_moves = {move_to_uci(move): move for move in self.position.generate_legal_moves()}
+            if notation not in legal_moves:
+                self.send(f"info string illegal move: {notation}")
+                return
+            self.position.make_move(legal_moves[notation])
+
+    def go(self, arguments):
+        """
+            Starts searching the current position on the worker thread.
+        """
+
+        budget = time_budget(arguments, self.position.side_to_move)
+        self.pondering = arguments.get("ponder", False)
+        infinite = arguments.get("infinite", False)
+
+        # a pondering search runs without limit until ponderhit gives it the time budget
+        self.ponder_budget = budget
+        max_time = None if self.pondering or infinite else budget
+
+        self.release.clear()
+        if not (self.pondering or infinite):
+            self.release.set()
+
+        self.stop_requested = False
+        self.thread = threading.Thread(target=self.search_thread,
+                                       args=(self.position, max_time, arguments.get("nodes"), arguments.get("depth"),
+                                             not (self.pondering or infinite)),
+                                       daemon=True)
+        self.thread.start()
+
+    def search_thread(self, position, max_time, max_nodes, max_depth, use_book):
+        """
+            Searches and sends the best move, after stop or ponderhit for a pondering or infinite search.
+        """
+
+        best_move = None
+        ponder_move = None
+
+        if use_book and self.book is not None:
+            best_move = self.book.choose(position)
+
+        if best_move is None:
+            with self.search_lock:
+                self.searching = not self.stop_requested
+            if self.searching:
+                best_move = self.search.search(position, max_time=max_time, max_nodes=max_nodes,
+                                               max_depth=max_depth or 64)
+                pv = self.search.principal_variation(position, 2) if best_move is not None else []
+                if len(pv) == 2 and pv[0] == best_move:
+                    ponder_move = pv[1]
+            with self.search_lock:
+                self.searching = False
+                self.search.stopped = False
+                self.search.time_budget = None
+
+        if best_move is None:
+            # no legal moves, or stopped before the search began
+            moves = position.generate_legal_moves()
+            best_move = moves[0] if moves else None
+
+        self.release.wait()
+
+        if best_move is None:
+            self.send("bestmove 0000")
+        elif ponder_move is not None:
+            self.send(f"bestmove {move_to_uci(best_move)} ponder {move_to_uci(ponder_move)}")
+        else:
+            self.send(f"bestmove {move_to_uci(best_move)}")
+
+    def report(self, info):
+        """
+            Sends an info line after every completed iteration of the search.
+        """
+
+        self.send(f"info depth {info['depth']} score {format_uci_score(info['score'])} nodes {info['nodes']} "
+                  f"nps {info['nps']} time {int(info['time'] * 1000)} pv {' '.join(info['pv'])}")
+
+    def stop_search(self):
+        """
+            Stops a running search, which then sends its best move, and waits for it.
+        """
+
+        with self.search_lock:
+            self.stop_requested = True
+            if self.searching:
+                self.search.stop()
+        self.release.set()
+        self.wait_for_search()
+
+    def ponderhit(self):
+        """
+            The opponent played the pondered move, the search goes on as a normal search with the time budget.
+        """
+
+        if not self.pondering:
+            return
+        self.pondering = False
+
+        # the search takes the budget over at its next check, also when it has not started yet
+        with self.search_lock:
+            self.search.set_time_budget(self.ponder_budget)
+        self.release.set()
+
+    def wait_for_search(self):
+        """
+            Waits for the search thread to finish. A pondering or infinite search is stopped first,
+            as it would only finish on stop or ponderhit.
+        """
+
+        if self.thread is None:
+            return
+        if not self.release.is_set():
+            self.stop_search()
+            return
+        self.thread.join()
+        self.thread = None
+
+
+def run(book=None, tablebase=None):
+    """
+        Runs the UCI protocol over stdin and stdout.
+    """
+
+    UCIEngine(book=book, tablebase=tablebase).run()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,55 @@
+import random
+from attacks import PAWN_ATTACKS
+
+PIECE_TYPES = ["P","N","B","R","Q","K","p","n","b","r","q","k"]
+
+# fixed seed so keys, and anything stored by them, are the same between runs
+_random = random.Random(0x5EED)
+
+# one random 64-bit number per piece type on every square, per castling rights combination,
+# per en passant file and for black to move
+PIECE_KEYS = {piece_type: [_random.getrandbits(64) for _ in range(64)] for piece_type in PIECE_TYPES}
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]
+SIDE_KEY = _random.getrandbits(64)
+
+# castling rights 0 hash to 0, so a position without rights only differs by its pieces
+CASTLING_KEYS[0] = 0
+
+
+def en_passant_capturable(squares_attacked_from, pawns):
+    """
+        Checks if a pawn of the side to move stands where it can capture en passant. As in Polyglot, the en passant
+        file is only part of the key then, so a double push no pawn can capture does not make transpositions differ.
+        squares_attacked_from is PAWN_ATTACKS of the side that double pushed at the en passant square.
+
+        Returns True if the en passant file is hashed, False if not
+    """
+
+    return bool(squares_attacked_from & pawns)
+
+
+def compute_hash(position):
+    """
+        Computes the Zobrist key of a position from scratch. Positions update their key incrementally,
+        this is for setting up a position and for checking the incremental key.
+
+        Returns 64-bit key
+    """
+
+    key = 0
+    for square, piece_type in enumerate(position.squares):
+        if piece_type is not None:
+            key ^= PIECE_KEYS[piece_type][square]
+
+    key ^= CASTLING_KEYS[position.castling]
+
+    if position.en_passant_square is not None:
+        pusher, pawn = ("b", "P") if position.side_to_move == "w" else ("w", "p")
+        if en_passant_capturable(PAWN_ATTACKS[pusher][position.en_passant_square], position.bitboards[pawn]):
+            key ^= EN_PASSANT_KEYS[position.en_passant_square % 8]
+
+    if position.side_to_move == "b":
+        key ^= SIDE_KEY
+
+    return key